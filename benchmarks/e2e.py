@@ -0,0 +1,286 @@
+"""
+End-to-end benchmark of the pipeline against the local stand-in server.
+
+Every scale runs in a fresh child process with its own working directory, so caches,
+checkpoints, token files and the database never leak between runs or into the
+project. The stock list is served by the stand-in server, the IDX scrape needs a
+browser and is not part of the measurement.
+
+Usage:
+    python -m benchmarks.e2e --scales 10 100 1000 --latency-ms 5 --output e2e.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Batched price endpoint of the stand-in server
+BULK_PRICE_PATH = "/company-price-feed/v2/orderbook/companies?symbols={tickers}"
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark")
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 5000],
+        help="Numbers of tickers to run the pipeline with",
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=5.0, help="Base latency of every response"
+    )
+    parser.add_argument(
+        "--jitter-ms", type=float, default=5.0, help="Random latency added on top"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Share of data requests answered with a 503",
+    )
+    parser.add_argument(
+        "--posts-per-ticker",
+        type=int,
+        default=50,
+        help="Number of stream posts served per ticker",
+    )
+    parser.add_argument(
+        "--fixtures-dir", help="Directory of recorded responses to replay"
+    )
+    parser.add_argument(
+        "--bulk-price-chunk",
+        type=int,
+        help="Fetch prices through the batched price endpoint, this many tickers per request",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    parser.add_argument("--run-scale", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--server-url", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def _percentile(values: [float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, round(percentile / 100 * (len(values) - 1)))
+    return values[index]
+
+
+def _peak_rss_mb() -> float:
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_scale(scale: int, server_url: str) -> dict:
+    """
+    Runs the pipeline for `scale` tickers, in the current process.
+
+    Must run in a fresh process: the project modules are only imported once the
+    working directory and the environment point at the scratch space.
+
+    Args:
+        scale (int): Number of tickers.
+        server_url (str): Base URL of the stand-in server.
+
+    Returns:
+        dict: Timings, request latencies, errors and peak memory of the run.
+    """
+    workdir = tempfile.mkdtemp(prefix=f"bench-e2e-{scale}-")
+    os.chdir(workdir)
+    tempfile.tempdir = workdir
+    sys.path.insert(0, PROJECT_ROOT)
+
+    import requests
+    from loguru import logger
+
+    from builders.analysers import Analyser
+    from builders.database_builder import DatabaseBuilder
+    from db import database
+    from db import session as db_session
+    from providers.stockbit import StockBit
+    from schemas.stock import Stock
+    from services.price_store import PriceStore
+
+    # Per-request debug logs and SQL echo would dominate the measurement
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    database.engine.echo = False
+    db_session.engine.echo = False
+
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    send = requests.Session.send
+
+    def timed_send(session, request, **kwargs):
+        started = time.perf_counter()
+        response = send(session, request, **kwargs)
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        return response
+
+    requests.Session.send = timed_send
+
+    stage_seconds = {}
+    failed_stages = {}
+
+    def timed(name, function):
+        # A failing stage is reported instead of aborting the run, injected errors
+        # leave stocks without data and later stages have to cope with that
+        started = time.perf_counter()
+        try:
+            function()
+        except Exception as e:
+            failed_stages[name] = repr(e)
+        stage_seconds[name] = time.perf_counter() - started
+
+    started = time.perf_counter()
+
+    listing = requests.get(f"{server_url}/idx/stocks", params={"count": scale}).json()
+    stocks = [Stock(**item) for item in listing["data"]]
+
+    price_store = PriceStore()
+    stockbit = StockBit(stocks=stocks, price_store=price_store)
+    timed("stock_price", stockbit.with_stock_price)
+    timed("fundamental", stockbit.with_fundamental)
+    timed("stream", stockbit.with_stream_data)
+    timed("analyse", lambda: Analyser(stocks=stocks, price_store=price_store))
+
+    def populate_database():
+        database.setup_db(is_drop_table=True, keep_tables=("sentiments",))
+        database_builder = DatabaseBuilder(stocks=stocks)
+        database_builder.insert_stock()
+        database_builder.insert_key_statistic()
+        database_builder.insert_key_analysis()
+        database_builder.insert_stock_price()
+        database_builder.insert_sentiment()
+        stockbit.save_stream_cursors()
+
+    timed("database", populate_database)
+
+    total_seconds = time.perf_counter() - started
+    return {
+        "scale": scale,
+        "total_seconds": round(total_seconds, 3),
+        "tickers_per_second": round(scale / total_seconds, 2),
+        "stage_seconds": {name: round(s, 3) for name, s in stage_seconds.items()},
+        "requests": len(latencies),
+        "errors": sum(count for code, count in statuses.items() if code >= 400),
+        "latency_p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+        "latency_p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+        "db_write_seconds": round(stage_seconds["database"], 3),
+        "failed_stages": failed_stages,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def spawn_scale(scale: int, server_url: str, bulk_price_chunk: int = None) -> dict:
+    env = dict(
+        os.environ,
+        STOCKBIT_BASE_URL=server_url,
+        STOCKBIT_LOGIN_URL=server_url,
+        STOCKBIT_USERNAME="benchmark",
+        STOCKBIT_PASSWORD="benchmark",
+        STOCKBIT_REQUEST_DELAY="0",
+        DATABASE_PATH=os.path.join(tempfile.mkdtemp(prefix="bench-db-"), "bench.db"),
+    )
+    if bulk_price_chunk:
+        env["STOCKBIT_BULK_PRICE_PATH"] = BULK_PRICE_PATH
+        env["STOCKBIT_BULK_PRICE_CHUNK"] = str(bulk_price_chunk)
+
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.e2e",
+            "--run-scale",
+            str(scale),
+            "--server-url",
+            server_url,
+        ],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Scale {scale} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def print_table(results: [dict]):
+    columns = (
+        ("scale", "tickers"),
+        ("total_seconds", "total s"),
+        ("tickers_per_second", "tickers/s"),
+        ("latency_p50_ms", "p50 ms"),
+        ("latency_p99_ms", "p99 ms"),
+        ("errors", "errors"),
+        ("db_write_seconds", "db s"),
+        ("peak_rss_mb", "rss MB"),
+    )
+    print("  ".join(f"{title:>10}" for _, title in columns))
+    for result in results:
+        print("  ".join(f"{result[key]:>10}" for key, _ in columns))
+        for name, error in result["failed_stages"].items():
+            print(f"{'':>10}  stage {name} failed: {error}")
+
+
+def main():
+    args = parse_arguments()
+
+    if args.run_scale:
+        print(json.dumps(run_scale(args.run_scale, args.server_url)))
+        return
+
+    from benchmarks.mock_server import MockServer
+
+    server = MockServer(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        posts_per_ticker=args.posts_per_ticker,
+        fixtures_dir=args.fixtures_dir,
+        seed=args.seed,
+    ).start()
+
+    results = []
+    try:
+        for scale in args.scales:
+            print(f"Running {scale} tickers...", file=sys.stderr)
+            results.append(spawn_scale(scale, server.url, args.bulk_price_chunk))
+    finally:
+        server.stop()
+
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "latency_ms": args.latency_ms,
+                    "jitter_ms": args.jitter_ms,
+                    "error_rate": args.error_rate,
+                    "posts_per_ticker": args.posts_per_ticker,
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Synthetic Stockbit and IDX payloads in the shape the providers parse.
+
+Payloads are deterministic per ticker, so runs at the same scale do the same work.
+Recorded responses can be dropped in a fixtures directory instead (see
+`RecordedFixtures`), they are replayed with the ticker swapped in.
+"""
+
+import json
+import os
+import random
+import string
+from datetime import datetime, timedelta
+
+from schemas.fundamental import (
+    BalanceSheet,
+    CashFlowStatement,
+    CurrentValuation,
+    Dividend,
+    Growth,
+    IncomeStatement,
+    ManagementEffectiveness,
+    MarketRank,
+    PerShare,
+    PricePerformance,
+    Profitability,
+    Solvency,
+)
+
+# Order of `closure_fin_items_results` as read by StockBit._fundamental
+KEY_STATISTIC_GROUPS = (
+    CurrentValuation,
+    PerShare,
+    Solvency,
+    ManagementEffectiveness,
+    Profitability,
+    Growth,
+    Dividend,
+    MarketRank,
+    IncomeStatement,
+    BalanceSheet,
+    CashFlowStatement,
+    PricePerformance,
+)
+
+WORDS = (
+    "naik turun bullish bearish cuan rugi akumulasi distribusi breakout koreksi "
+    "dividen laba target support resistance hold beli jual saham emiten market "
+    "volume asing net buy sell sideways rebound ara arb tidak bukan"
+).split()
+
+
+def tickers(count: int) -> [str]:
+    """
+    Returns `count` distinct four-letter tickers.
+    """
+    letters = string.ascii_uppercase
+    return [
+        "".join(letters[(i // 26**power) % 26] for power in (3, 2, 1, 0))
+        for i in range(count)
+    ]
+
+
+def _rng(ticker: str, salt: str = "") -> random.Random:
+    return random.Random(f"{ticker}{salt}")
+
+
+def _fin_value(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.05:
+        return "-"
+    if kind < 0.35:
+        return f"{rng.uniform(-50, 80):,.2f}%"
+    if kind < 0.6:
+        return f"{rng.uniform(1, 900):,.2f} B"
+    if kind < 0.7:
+        return f"({rng.uniform(1, 900):,.2f} M)"
+    return f"{rng.uniform(0, 5000):,.2f}"
+
+
+def idx_stocks(count: int) -> [dict]:
+    """
+    Returns the listing of `count` stocks, as scraped from IDX.
+    """
+    return [
+        {
+            "ticker": ticker,
+            "name": f"PT {ticker} Tbk",
+            "ipo_date": f"{2000 + i % 24}-0{1 + i % 9}-1{i % 10}",
+            "market_cap": float(_rng(ticker).randint(10**9, 10**14)),
+            "note": "",
+        }
+        for i, ticker in enumerate(tickers(count))
+    ]
+
+
+def keystats(ticker: str) -> dict:
+    rng = _rng(ticker, "keystats")
+    groups = []
+    for group in KEY_STATISTIC_GROUPS:
+        items = []
+        for field_name in group.field_names():
+            name = field_name.replace("_", " ").title()
+            value = _fin_value(rng)
+            if field_name == "latest_dividend_ex_date":
+                name = "Latest Dividend Ex-Date"
+                value = f"{rng.randint(1, 28):02d} Jun 24"
+            items.append(
+                {"fitem": {"id": rng.randint(1, 9999), "name": name, "value": value}}
+            )
+        groups.append({"keystats_name": group.__name__, "fin_name_results": items})
+
+    return {
+        "message": "Successfully retrieved company key stats",
+        "data": {
+            "stats": {
+                "current_share_outstanding": f"{rng.uniform(1, 90):,.2f} B",
+                "market_cap": f"{rng.uniform(1, 900):,.2f} B",
+                "enterprise_value": f"{rng.uniform(1, 900):,.2f} B",
+            },
+            "closure_fin_items_results": groups,
+        },
+    }
+
+
+def orderbook(ticker: str) -> dict:
+    rng = _rng(ticker, "orderbook")
+    close = round(rng.uniform(50, 10_000), 0)
+    last_price = round(close * rng.uniform(0.9, 1.1), 0)
+    return {
+        "message": "Successfully retrieved orderbook",
+        "data": {
+            "symbol": ticker,
+            "lastprice": last_price,
+            "change": last_price - close,
+            "percentage_change": round((last_price / close - 1) * 100, 2),
+            "volume": rng.randint(0, 10**8),
+            "average": round((last_price + close) / 2, 2),
+            "close": close,
+            "high": max(close, last_price) * 1.02,
+            "low": min(close, last_price) * 0.98,
+            "open": close,
+            "ara": {"value": f"{close * 1.25:,.0f}"},
+            "arb": {"value": f"{close * 0.75:,.0f}"},
+            "frequency": rng.randint(0, 50_000),
+            "fbuy": rng.randint(0, 25_000),
+            "fsell": rng.randint(0, 25_000),
+        },
+    }
+
+
+def _post(ticker: str, stream_id: int) -> dict:
+    rng = _rng(ticker, str(stream_id))
+    created_at = datetime(2024, 1, 1) + timedelta(minutes=stream_id % 500_000)
+    return {
+        "stream_id": stream_id,
+        "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 60)))
+        + f" ${ticker}",
+        "created_at": created_at.isoformat(),
+    }
+
+
+def _newest_stream_id(ticker: str) -> int:
+    return 10_000_000 + _rng(ticker, "stream").randint(0, 1_000_000)
+
+
+def stream_pinned(ticker: str) -> dict:
+    return {"message": "OK", "data": _post(ticker, _newest_stream_id(ticker) + 1)}
+
+
+def stream_page(
+    ticker: str, last_stream_id: int, limit: int, posts_per_ticker: int
+) -> dict:
+    """
+    Returns the page of posts older than `last_stream_id`, newest first.
+    """
+    newest = _newest_stream_id(ticker)
+    oldest = newest - posts_per_ticker + 1
+    start = newest if last_stream_id == 0 else min(newest, last_stream_id - 1)
+    stream_ids = range(start, max(oldest, start - limit + 1) - 1, -1)
+    return {
+        "message": "OK",
+        "data": {"stream": [_post(ticker, stream_id) for stream_id in stream_ids]},
+    }
+
+
+class RecordedFixtures:
+    """
+    Replays recorded responses, e.g. copied from `stockbit_cache`, for every ticker.
+
+    The directory may hold `keystats.json`, `orderbook.json`, `stream_pinned.json` and
+    `stream.json`. The recorded ticker is replaced with the requested one.
+    """
+
+    NAMES = ("keystats", "orderbook", "stream_pinned", "stream")
+
+    def __init__(self, directory: str = None):
+        self.templates = {}
+        for name in self.NAMES:
+            path = os.path.join(directory or "", f"{name}.json")
+            if directory and os.path.exists(path):
+                with open(path, "r") as file:
+                    template = json.load(file)
+                self.templates[name] = (json.dumps(template), self._ticker(template))
+
+    @staticmethod
+    def _ticker(template: dict) -> str:
+        data = template.get("data") or {}
+        return data.get("symbol") or data.get("symbol_2") or ""
+
+    def get(self, name: str, ticker: str) -> dict | None:
+        if name not in self.templates:
+            return None
+        body, recorded_ticker = self.templates[name]
+        if recorded_ticker:
+            body = body.replace(recorded_ticker, ticker)
+        return json.loads(body)
@@ -0,0 +1,117 @@
+"""
+Import-time budget of the entry points.
+
+Every entry point is imported in a fresh interpreter with `-X importtime`. The check
+fails when an import takes longer than its budget, or when it pulls in a heavy
+library that should only be imported where it is used.
+
+Usage:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --top 20
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries only needed by one output or provider
+HEAVY_MODULES = (
+    "black",
+    "googleapiclient",
+    "openpyxl",
+    "pandas",
+    "pyarrow",
+    "selenium",
+)
+
+# Entry point to (budget in ms, modules it must not import)
+ENTRY_POINTS = {
+    "main": (800, (*HEAVY_MODULES, "sqlalchemy")),
+    "controllers.stock_controller": (800, HEAVY_MODULES),
+}
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Import-time budget check")
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=3,
+        help="Imports per entry point, the fastest one is checked",
+    )
+    parser.add_argument(
+        "--top", type=int, default=10, help="Number of slowest modules to list"
+    )
+    return parser.parse_args()
+
+
+def import_times(module: str) -> dict:
+    """
+    Imports a module in a fresh interpreter.
+
+    Args:
+        module (str): Dotted module name.
+
+    Returns:
+        dict: Imported module name to (self, cumulative) import time in microseconds.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr}")
+
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if self_us.strip().isdigit():
+            times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def check(module: str, budget_ms: float, forbidden: tuple, repeat: int, top: int):
+    runs = [import_times(module) for _ in range(repeat)]
+    times = min(runs, key=lambda run: run[module][1])
+    total_ms = times[module][1] / 1000
+
+    problems = []
+    if total_ms > budget_ms:
+        problems.append(f"took {total_ms:.0f} ms, budget is {budget_ms:.0f} ms")
+    for name in forbidden:
+        if name in times:
+            problems.append(f"imports {name} ({times[name][1] / 1000:.0f} ms)")
+
+    print(f"{module}: {total_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+    slowest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (self_us, cumulative_us) in slowest[:top]:
+        print(
+            f"  {self_us / 1000:>8.1f} ms self {cumulative_us / 1000:>8.1f} ms  {name}"
+        )
+    for problem in problems:
+        print(f"  FAIL {problem}")
+
+    return not problems
+
+
+def main():
+    args = parse_arguments()
+
+    is_ok = True
+    for module, (budget_ms, forbidden) in ENTRY_POINTS.items():
+        is_ok &= check(module, budget_ms, forbidden, args.repeat, args.top)
+
+    if not is_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""
+Micro-benchmarks of the CPU hot paths, parsing and analytics on cached responses.
+
+Payloads come from `benchmarks.fixtures`, so a run at the same size always times the
+same work. Results are written as JSON and can be compared with an earlier run:
+
+    python -m benchmarks.micro -o baseline.json
+    python -m benchmarks.micro --compare baseline.json
+
+Loguru is set to WARNING for the run, so the debug calls in the parsers are timed
+but not written out.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from loguru import logger
+
+from benchmarks import fixtures
+from builders.analysers.fundamental_analyser import FundamentalAnalyser
+from builders.analysers.key_analysis_analyser import KeyAnalysisAnalyser
+from providers.stockbit import StockBit
+from schemas.stock import Stock
+from schemas.stock_price import StockPrice
+from utils.helpers import (
+    parse_currency_to_float,
+    parse_key_statistic_results_item_value,
+)
+
+# Relative change of the fastest run above which a benchmark is flagged
+REGRESSION_THRESHOLD = 0.10
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the hot paths")
+    parser.add_argument(
+        "-t",
+        "--tickers",
+        type=int,
+        default=900,
+        help="Size of the synthetic universe, IDX lists about 900 stocks",
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=7, help="Timed repetitions per benchmark"
+    )
+    parser.add_argument(
+        "-b", "--benchmarks", nargs="+", help="Run only the benchmarks with these names"
+    )
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    parser.add_argument(
+        "--compare", help="Compare with the results of an earlier run (JSON file)"
+    )
+    return parser.parse_args()
+
+
+def _stock_price(orderbook: dict) -> StockPrice:
+    data = orderbook["data"]
+    return StockPrice(
+        price=data["lastprice"],
+        change=data["change"],
+        volume=data["volume"],
+        percentage_change=data["percentage_change"],
+        average=data["average"],
+        close=data["close"],
+        high=data["high"],
+        low=data["low"],
+        open=data["open"],
+    )
+
+
+class Universe:
+    """
+    Synthetic stocks with parsed fundamentals and prices, and their raw payloads.
+    """
+
+    def __init__(self, count: int):
+        self.stocks = [Stock(**item) for item in fixtures.idx_stocks(count)]
+        self.keystats = {
+            stock.ticker: fixtures.keystats(stock.ticker) for stock in self.stocks
+        }
+
+        # `_fundamental` only reads the response from the provider, the API client
+        # and its login are not needed
+        self.stockbit = StockBit.__new__(StockBit)
+        for stock in self.stocks:
+            self.stockbit.key_statistic = self.keystats[stock.ticker]
+            stock.fundamental = self.stockbit._fundamental(stock)
+            stock.stock_price = _stock_price(fixtures.orderbook(stock.ticker))
+
+        self.fin_name_results = [
+            group["fin_name_results"]
+            for payload in self.keystats.values()
+            for group in payload["data"]["closure_fin_items_results"]
+        ]
+        self.currencies = [
+            value
+            for payload in self.keystats.values()
+            for value in payload["data"]["stats"].values()
+        ]
+
+
+def bench_parse_key_statistic_value(universe: Universe) -> int:
+    count = 0
+    for fin_name_results in universe.fin_name_results:
+        for index in range(len(fin_name_results)):
+            parse_key_statistic_results_item_value(fin_name_results, index)
+            count += 1
+    return count
+
+
+def bench_parse_currency_to_float(universe: Universe) -> int:
+    for currency in universe.currencies:
+        parse_currency_to_float(currency)
+    return len(universe.currencies)
+
+
+def bench_stockbit_fundamental(universe: Universe) -> int:
+    stockbit = universe.stockbit
+    for stock in universe.stocks:
+        stockbit.key_statistic = universe.keystats[stock.ticker]
+        stockbit._fundamental(stock)
+    return len(universe.stocks)
+
+
+def bench_key_analysis_calculate(universe: Universe) -> int:
+    analyser = KeyAnalysisAnalyser.__new__(KeyAnalysisAnalyser)
+    analyser.stocks = universe.stocks
+    analyser._calculate()
+    return len(universe.stocks)
+
+
+def bench_key_statistics_sheet(universe: Universe) -> int:
+    return len(FundamentalAnalyser(stocks=universe.stocks).key_statistics_sheet()) - 1
+
+
+# Name to benchmark, each returns the number of items it processed
+BENCHMARKS = {
+    "parse_key_statistic_value": bench_parse_key_statistic_value,
+    "parse_currency_to_float": bench_parse_currency_to_float,
+    "stockbit_fundamental": bench_stockbit_fundamental,
+    "key_analysis_calculate": bench_key_analysis_calculate,
+    "key_statistics_sheet": bench_key_statistics_sheet,
+}
+
+
+def run_benchmark(benchmark, universe: Universe, repeat: int) -> dict:
+    """
+    Times a benchmark `repeat` times after one warm-up run.
+
+    Args:
+        benchmark (Callable): The benchmark, returns the number of items processed.
+        universe (Universe): The payloads to run it on.
+        repeat (int): Number of timed runs.
+
+    Returns:
+        dict: Items per run, min and median seconds per run and per item.
+    """
+    items = benchmark(universe)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        benchmark(universe)
+        timings.append(time.perf_counter() - started)
+
+    median = statistics.median(timings)
+    return {
+        "items": items,
+        "min_seconds": min(timings),
+        "median_seconds": median,
+        "min_us_per_item": min(timings) / items * 1_000_000 if items else 0.0,
+        "median_us_per_item": median / items * 1_000_000 if items else 0.0,
+        "items_per_second": items / median if median else 0.0,
+    }
+
+
+def compare(results: dict, baseline: dict) -> bool:
+    """
+    Prints the change of every benchmark against a baseline. The fastest runs are
+    compared, they are the least disturbed by other load on the machine.
+
+    Args:
+        results (dict): Benchmark name to result of this run.
+        baseline (dict): Benchmark name to result of the earlier run.
+
+    Returns:
+        bool: True if no benchmark got slower than the regression threshold.
+    """
+    is_ok = True
+    print(f"\n{'benchmark':<28} {'baseline us':>12} {'now us':>12} {'change':>8}")
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["min_us_per_item"]
+        now = result["min_us_per_item"]
+        change = now / before - 1 if before else 0.0
+        flag = ""
+        if change > REGRESSION_THRESHOLD:
+            flag = "  slower"
+            is_ok = False
+        elif change < -REGRESSION_THRESHOLD:
+            flag = "  faster"
+        print(f"{name:<28} {before:>12.2f} {now:>12.2f} {change:>+8.1%}{flag}")
+    return is_ok
+
+
+def main():
+    args = parse_arguments()
+
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    names = args.benchmarks or list(BENCHMARKS)
+    unknown = set(names) - BENCHMARKS.keys()
+    if unknown:
+        raise SystemExit(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    universe = Universe(args.tickers)
+
+    results = {}
+    print(f"{'benchmark':<28} {'items':>8} {'median ms':>10} {'us/item':>10}")
+    for name in names:
+        result = run_benchmark(BENCHMARKS[name], universe, args.repeat)
+        results[name] = result
+        print(
+            f"{name:<28} {result['items']:>8} {result['median_seconds'] * 1000:>10.2f} "
+            f"{result['median_us_per_item']:>10.2f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(
+                {
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "tickers": args.tickers,
+                    "repeat": args.repeat,
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            baseline = json.load(file)
+        if baseline.get("tickers") != args.tickers:
+            logger.warning(
+                f"Baseline ran with {baseline.get('tickers')} tickers, "
+                f"this run with {args.tickers}"
+            )
+        if not compare(results, baseline["results"]):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Local stand-in for the Stockbit and IDX endpoints used by the providers.
+
+Every response is delayed by `latency_ms` plus up to `jitter_ms`, and a share
+`error_rate` of the data requests fails with a 503, so the benchmarks see realistic
+network behaviour without talking to live hosts.
+"""
+
+import base64
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from benchmarks import fixtures
+
+ROUTES = (
+    ("GET", re.compile(r"^/keystats/ratio/v1/(?P<ticker>[^/]+)$"), "keystats"),
+    (
+        "GET",
+        re.compile(r"^/company-price-feed/v2/orderbook/companies/(?P<ticker>[^/]+)$"),
+        "orderbook",
+    ),
+    # Batched prices, `?symbols=AAAA,AAAB`
+    ("GET", re.compile(r"^/company-price-feed/v2/orderbook/companies$"), "orderbooks"),
+    (
+        "GET",
+        re.compile(r"^/stream/v3/symbol/(?P<ticker>[^/]+)/pinned$"),
+        "stream_pinned",
+    ),
+    ("POST", re.compile(r"^/stream/v3/symbol/(?P<ticker>[^/]+)$"), "stream"),
+    ("GET", re.compile(r"^/idx/stocks$"), "idx_stocks"),
+    ("POST", re.compile(r"^/v2.5/login$"), "login"),
+    ("POST", re.compile(r"^/login/refresh$"), "refresh"),
+    ("GET", re.compile(r"^/research/indicator/new$"), "challenge"),
+)
+
+# Requests that never fail on purpose, so a run always gets authenticated
+AUTH_ROUTES = {"login", "refresh", "challenge"}
+
+
+def _token(kind: str, ttl: float) -> str:
+    """
+    Returns an unsigned JWT expiring in `ttl` seconds, like the tokens Stockbit issues.
+    """
+
+    def encode(part: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).decode().rstrip("=")
+
+    claims = {"kind": kind, "exp": int(time.time() + ttl)}
+    return f"{encode({'alg': 'none', 'typ': 'JWT'})}.{encode(claims)}.bench"
+
+
+class MockServer:
+    """
+    Threaded HTTP server answering with fixtures.
+
+    Attributes:
+        url (str): Base URL of the running server.
+        requests (dict): Route name to the number of requests served.
+        errors (int): Number of injected errors.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 5.0,
+        jitter_ms: float = 5.0,
+        error_rate: float = 0.0,
+        posts_per_ticker: int = 50,
+        fixtures_dir: str = None,
+        seed: int = 0,
+    ):
+        """
+        Initializes the server, `start` binds it to a free local port.
+
+        Args:
+            latency_ms (float): Base delay of every response.
+            jitter_ms (float): Maximum random delay added to the base delay.
+            error_rate (float): Share of data requests answered with a 503.
+            posts_per_ticker (int): Number of stream posts of every ticker.
+            fixtures_dir (str): Directory of recorded responses to replay.
+            seed (int): Seed of the latency and error draws.
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.posts_per_ticker = posts_per_ticker
+        self.recorded = fixtures.RecordedFixtures(fixtures_dir)
+        self.random = random.Random(seed)
+        self.requests = {}
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server._handle(self, "GET")
+
+            def do_POST(self):
+                server._handle(self, "POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _draw(self) -> tuple[float, bool]:
+        with self._lock:
+            delay = (self.latency_ms + self.random.uniform(0, self.jitter_ms)) / 1000
+            return delay, self.random.random() < self.error_rate
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str):
+        parsed = urlparse(handler.path)
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+
+        for route_method, pattern, name in ROUTES:
+            match = pattern.match(parsed.path)
+            if route_method == method and match:
+                break
+        else:
+            self._send(handler, 404, {"message": "Not found"})
+            return
+
+        delay, is_error = self._draw()
+        time.sleep(delay)
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+            if is_error and name not in AUTH_ROUTES:
+                self.errors += 1
+
+        if is_error and name not in AUTH_ROUTES:
+            self._send(handler, 503, {"message": "Service unavailable"})
+            return
+
+        ticker = match.groupdict().get("ticker")
+        self._send(handler, 200, self._payload(name, ticker, parsed, body))
+
+    def _payload(self, name: str, ticker: str, parsed, body: bytes) -> dict:
+        recorded = self.recorded.get(name, ticker) if ticker else None
+        if recorded is not None:
+            return recorded
+
+        if name == "keystats":
+            return fixtures.keystats(ticker)
+        if name == "orderbook":
+            return fixtures.orderbook(ticker)
+        if name == "orderbooks":
+            symbols = parse_qs(parsed.query).get("symbols", [""])[0].split(",")
+            return {
+                "data": [
+                    fixtures.orderbook(symbol)["data"] for symbol in symbols if symbol
+                ]
+            }
+        if name == "stream_pinned":
+            return fixtures.stream_pinned(ticker)
+        if name == "stream":
+            payload = json.loads(body or b"{}")
+            return fixtures.stream_page(
+                ticker,
+                int(payload.get("last_stream_id", 0)),
+                int(payload.get("limit", 20)),
+                self.posts_per_ticker,
+            )
+        if name == "idx_stocks":
+            count = int(parse_qs(parsed.query).get("count", ["10"])[0])
+            return {"data": fixtures.idx_stocks(count)}
+        if name == "login":
+            return {
+                "data": {
+                    "access_token": _token("access", 24 * 60 * 60),
+                    "refresh_token": _token("refresh", 30 * 24 * 60 * 60),
+                }
+            }
+        if name == "refresh":
+            return {
+                "data": {
+                    "access": {"token": _token("access", 24 * 60 * 60)},
+                    "refresh": {"token": _token("refresh", 30 * 24 * 60 * 60)},
+                }
+            }
+        return {"message": "OK"}
+
+    @staticmethod
+    def _send(handler: BaseHTTPRequestHandler, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
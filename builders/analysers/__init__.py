@@ -2,34 +2,55 @@ from builders.analysers.fundamental_analyser import FundamentalAnalyser
 from builders.analysers.key_analysis_analyser import KeyAnalysisAnalyser
 from builders.analysers.sentiment_analyser import SentimentAnalyser
 from builders.analysers.stock_price_analyser import StockPriceAnalyser
-from builders.excel import Excel
-from builders.spreadsheet import Spreadsheet
 from schemas.stock import Stock
+from services.indicator_engine import IndicatorEngine
+from services.price_store import PriceStore
+from utils.metrics import metrics
 
 
 class Analyser:
-    def __init__(self, stocks: [Stock]):
+    def __init__(self, stocks: [Stock], price_store: PriceStore = None):
         self.stocks = stocks
-        self.fundamental_analyser = FundamentalAnalyser(stocks=stocks)
-        self.sentiment_analyser = SentimentAnalyser(stocks=stocks)
-        self.key_analysis_analyser = KeyAnalysisAnalyser(stocks=stocks)
-        self.stock_price_analyser = StockPriceAnalyser(stocks=stocks)
+        with metrics.timer("analyser_seconds", analyser="fundamental"):
+            self.fundamental_analyser = FundamentalAnalyser(stocks=stocks)
+        with metrics.timer("analyser_seconds", analyser="sentiment"):
+            self.sentiment_analyser = SentimentAnalyser(stocks=stocks)
+        with metrics.timer("analyser_seconds", analyser="key_analysis"):
+            self.key_analysis_analyser = KeyAnalysisAnalyser(
+                stocks=stocks, sentiment_analyser=self.sentiment_analyser
+            )
+        with metrics.timer("analyser_seconds", analyser="stock_price"):
+            self.stock_price_analyser = StockPriceAnalyser(
+                stocks=stocks,
+                indicator_engine=IndicatorEngine(price_store) if price_store else None,
+            )
 
-    def build(self, output: str, title: str):
+    def build(self, output: str, title: str, spreadsheet_id: str = None):
+        # Each output pulls in its own client library (openpyxl, googleapiclient,
+        # pyarrow), only the requested one is imported
         if output == "excel":
+            from builders.excel import Excel
+
             self._build_output(Excel, title)
         elif output == "spreadsheet":
-            self._build_output(Spreadsheet, title)
+            from builders.spreadsheet import Spreadsheet
+
+            self._build_output(Spreadsheet, title, spreadsheet_id=spreadsheet_id)
+        elif output == "parquet":
+            from builders.parquet import Parquet
+
+            self._build_output(Parquet, title)
         else:
             raise ValueError("Unsupported output method")
 
-    def _build_output(self, builder_class, title):
+    def _build_output(self, builder_class, title, **options):
         builder = builder_class(
             title=title,
             fundamental_analyser=self.fundamental_analyser,
             sentiment_analyser=self.sentiment_analyser,
             key_analysis_analyser=self.key_analysis_analyser,
             stock_price_analyser=self.stock_price_analyser,
+            **options,
         )
         builder.insert_key_analysis()
         builder.insert_stock()
@@ -37,5 +58,6 @@ class Analyser:
         builder.insert_key_statistic()
         builder.insert_sentiment()
 
-        if isinstance(builder, Excel):
+        # Parquet files are complete once written, the other outputs are saved at once
+        if hasattr(builder, "save"):
             builder.save()
@@ -18,15 +18,23 @@ class FundamentalAnalyser:
         """
         self.stocks = stocks
 
-    def stocks_sheet(self) -> []:
+    def stocks_header(self) -> []:
         """
-        Generates a sheet of basic stock information.
+        Returns the header row of the stocks sheet.
 
         Returns:
-        - list of list: A list of rows, each containing basic stock information.
+        - list: The column titles.
         """
         header = ["Ticker", "Name", "IPO Date", "Market Cap", "Note"]
-        sheet_values = [header]
+        return header
+
+    def stocks_rows(self):
+        """
+        Yields the rows of the stocks sheet without the header.
+
+        Yields:
+        - list: A row with the basic stock information.
+        """
         for stock in self.stocks:
             row = [
                 stock.fundamental.stock.ticker,
@@ -35,16 +43,23 @@ class FundamentalAnalyser:
                 stock.fundamental.stock.market_cap,
                 stock.fundamental.stock.note,
             ]
-            sheet_values.append(row)
+            yield row
 
-        return sheet_values
+    def stocks_sheet(self) -> []:
+        """
+        Generates a sheet of basic stock information.
 
-    def key_statistics_sheet(self) -> []:
+        Returns:
+        - list of list: A list of rows, each containing basic stock information.
         """
-        Generates a sheet of key statistics for each stock.
+        return [self.stocks_header(), *self.stocks_rows()]
+
+    def key_statistics_header(self) -> []:
+        """
+        Returns the header row of the key statistics sheet.
 
         Returns:
-        - list of list: A list of rows, each containing key statistics for a stock.
+        - list: The column titles.
         """
         header = [
             "Ticker",
@@ -142,8 +157,15 @@ class FundamentalAnalyser:
             "Enterprise Value",
             "Current Share Outstanding",
         ]
-        sheet_values = [header]
+        return header
 
+    def key_statistics_rows(self):
+        """
+        Yields the rows of the key statistics sheet without the header.
+
+        Yields:
+        - list: A row with the key statistics of a stock.
+        """
         for stock in self.stocks:
             row = [
                 stock.fundamental.stock.ticker,
@@ -241,6 +263,13 @@ class FundamentalAnalyser:
                 stock.fundamental.stat.enterprise_value,
                 stock.fundamental.stat.current_share_outstanding,
             ]
-            sheet_values.append(row)
+            yield row
 
-        return sheet_values
+    def key_statistics_sheet(self) -> []:
+        """
+        Generates a sheet of key statistics for each stock.
+
+        Returns:
+        - list of list: A list of rows, each containing key statistics for a stock.
+        """
+        return [self.key_statistics_header(), *self.key_statistics_rows()]
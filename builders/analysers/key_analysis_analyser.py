@@ -1,3 +1,4 @@
+from builders.analysers.sentiment_analyser import SentimentAnalyser
 from schemas.key_analysis import KeyAnalysis
 from schemas.stock import Stock
 
@@ -11,15 +12,21 @@ class KeyAnalysisAnalyser:
         A list of Stock objects to be analyzed.
     """
 
-    def __init__(self, stocks: [Stock]):
+    def __init__(self, stocks: [Stock], sentiment_analyser: SentimentAnalyser = None):
         """
         Initializes the KeyAnalysisAnalyser with a list of stocks.
 
         Parameters:
         - stocks : list of Stock
             A list of Stock objects to be analyzed.
+        - sentiment_analyser : SentimentAnalyser
+            Optional analyser of the scored posts, adds the per-ticker sentiment columns
+            to the analysis sheet.
         """
         self.stocks = stocks
+        self.ticker_sentiment = (
+            sentiment_analyser.ticker_sentiment() if sentiment_analyser else None
+        )
         self._calculate()
 
     def _calculate(self):
@@ -176,12 +183,12 @@ class KeyAnalysisAnalyser:
                 net_debt_to_equity_ratio=round(net_debt_to_equity, 2),
             )
 
-    def analysis_sheet(self):
+    def analysis_header(self) -> []:
         """
-        Generates a sheet of analysis for each stock that derives from fundamental.
+        Returns the header row of the analysis sheet.
 
         Returns:
-        - list of list: A list of rows, each containing key statistics for a stock.
+        - list: The column titles.
         """
         headers = [
             "Ticker",
@@ -199,8 +206,23 @@ class KeyAnalysisAnalyser:
             "Composite Rank",
             "Net Debt to Equity",
         ]
+        if self.ticker_sentiment is not None:
+            headers += [
+                "Sentiment Rate",
+                "Sentiment Posts",
+                "Positive Posts",
+                "Negative Posts",
+                "Neutral Posts",
+            ]
+        return headers
 
-        sheet_values = [headers]
+    def analysis_rows(self):
+        """
+        Yields the rows of the analysis sheet without the header.
+
+        Yields:
+        - list: A row with the key analysis of a stock.
+        """
         for stock in self.stocks:
             row = [
                 stock.ticker,
@@ -218,7 +240,22 @@ class KeyAnalysisAnalyser:
                 stock.key_analysis.composite_rank,
                 stock.key_analysis.net_debt_to_equity_ratio,
             ]
+            if self.ticker_sentiment is not None:
+                sentiment = self.ticker_sentiment[stock.ticker]
+                row += [
+                    sentiment["rate"],
+                    sentiment["count"],
+                    sentiment["positive"],
+                    sentiment["negative"],
+                    sentiment["neutral"],
+                ]
+            yield row
 
-            sheet_values.append(row)
+    def analysis_sheet(self):
+        """
+        Generates a sheet of analysis for each stock that derives from fundamental.
 
-        return sheet_values
+        Returns:
+        - list of list: A list of rows, each containing key statistics for a stock.
+        """
+        return [self.analysis_header(), *self.analysis_rows()]
@@ -1,4 +1,5 @@
 from schemas.stock import Stock
+from services.sentiment_scorer import SentimentScorer
 
 
 class SentimentAnalyser:
@@ -9,29 +10,68 @@ class SentimentAnalyser:
     - stocks (list of Stock): A list of Stock objects to be analyzed.
     """
 
-    def __init__(self, stocks: [Stock]):
+    def __init__(self, stocks: [Stock], scorer: SentimentScorer = None):
         """
         Initializes the SentimentAnalyser with a list of stocks.
 
         Parameters:
         - stocks (list of Stock): A list of Stock objects containing sentiment data.
+        - scorer (SentimentScorer): Scorer that fills in rate and category, a local lexicon scorer by default.
         """
         self.stocks = stocks
+        self.scorer = scorer or SentimentScorer()
+        self._calculate()
 
-    def sentiment_sheet(self):
+    def _calculate(self):
         """
-        Generates a sheet of sentiment data for each stock.
+        Scores the posts of every stock in one batch. Posts scored in an earlier run come from the cache.
+        """
+        self.scorer.score(
+            [sentiment for stock in self.stocks for sentiment in stock.sentiment or []]
+        )
 
-        This method creates a list of lists, where each inner list represents a row
-        containing sentiment information for a stock. The first row is a header row.
+    def ticker_sentiment(self) -> dict:
+        """
+        Aggregates the scored posts per ticker.
 
         Returns:
-        - list of list: A list of rows, each containing sentiment data for a stock.
+        - dict: Ticker to a dict with the mean rate and the number of positive, negative and neutral posts.
+        """
+        summary = {}
+        for stock in self.stocks:
+            sentiments = stock.sentiment or []
+            categories = [sentiment.category for sentiment in sentiments]
+            summary[stock.ticker] = {
+                "rate": (
+                    round(sum(s.rate for s in sentiments) / len(sentiments), 4)
+                    if sentiments
+                    else 0.0
+                ),
+                "count": len(sentiments),
+                "positive": categories.count("positive"),
+                "negative": categories.count("negative"),
+                "neutral": categories.count("neutral"),
+            }
+
+        return summary
+
+    def sentiment_header(self) -> []:
+        """
+        Returns the header row of the sentiment sheet.
+
+        Returns:
+        - list: The column titles.
         """
         header = ["Ticker", "Content", "Rate", "Category", "Posted At"]
+        return header
 
-        sheet_values = [header]
+    def sentiment_rows(self):
+        """
+        Yields the rows of the sentiment sheet without the header.
 
+        Yields:
+        - list: A row with one scored post of a stock.
+        """
         for stock in self.stocks:
             for sentiment in stock.sentiment:
                 row = [
@@ -41,7 +81,16 @@ class SentimentAnalyser:
                     sentiment.category,
                     sentiment.posted_at.strftime("%Y-%m-%d %H:%M:%S"),
                 ]
+                yield row
+
+    def sentiment_sheet(self):
+        """
+        Generates a sheet of sentiment data for each stock.
 
-                sheet_values.append(row)
+        This method creates a list of lists, where each inner list represents a row
+        containing sentiment information for a stock. The first row is a header row.
 
-        return sheet_values
+        Returns:
+        - list of list: A list of rows, each containing sentiment data for a stock.
+        """
+        return [self.sentiment_header(), *self.sentiment_rows()]
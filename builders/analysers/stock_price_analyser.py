@@ -1,4 +1,6 @@
 from schemas.stock import Stock
+from schemas.technical import Technical
+from services.indicator_engine import IndicatorEngine
 
 
 class StockPriceAnalyser:
@@ -9,24 +11,38 @@ class StockPriceAnalyser:
     - stocks (list of Stock): A list of Stock objects to be analyzed.
     """
 
-    def __init__(self, stocks: [Stock]):
+    def __init__(self, stocks: [Stock], indicator_engine: IndicatorEngine = None):
         """
         Initializes the StockPriceAnalyser with a list of stocks.
 
         Parameters:
         - stocks (list of Stock): A list of Stock objects containing sentiment data.
+        - indicator_engine (IndicatorEngine): Optional engine over the local price history,
+          adds technical indicator columns to the stock price sheet.
         """
         self.stocks = stocks
+        self.indicator_engine = indicator_engine
 
-    def stock_price_sheet(self):
+        if self.indicator_engine is not None:
+            self._calculate()
+
+    def _calculate(self):
         """
-        Generates a sheet of stock price data for each stock.
+        Brings the indicator engine up to date with the price store and attaches the
+        technical indicators to each stock.
+        """
+        self.indicator_engine.sync([stock.ticker for stock in self.stocks])
+        technicals = self.indicator_engine.technicals()
 
-        This method creates a list of lists, where each inner list represents a row
-        containing sentiment information for a stock. The first row is a header row.
+        for stock in self.stocks:
+            stock.technical = technicals.get(stock.ticker, Technical())
+
+    def stock_price_header(self) -> []:
+        """
+        Returns the header row of the stock price sheet.
 
         Returns:
-        - list of list: A list of rows, each containing sentiment data for a stock.
+        - list: The column titles.
         """
         header = [
             "Ticker",
@@ -45,8 +61,27 @@ class StockPriceAnalyser:
             "Frequency Sell",
             "Frequency Buy",
         ]
-        sheet_values = [header]
+        if self.indicator_engine is not None:
+            header += [
+                "SMA 50",
+                "SMA 200",
+                "EMA 20",
+                "RSI 14",
+                "ATR 14",
+                "Volatility 20D (Annualised)",
+                "Distance to 52 Week High",
+                "Distance to 52 Week Low",
+                "Volume Z-Score",
+            ]
+        return header
+
+    def stock_price_rows(self):
+        """
+        Yields the rows of the stock price sheet without the header.
 
+        Yields:
+        - list: A row with the price data of a stock.
+        """
         for stock in self.stocks:
             row = [
                 stock.ticker,
@@ -65,6 +100,28 @@ class StockPriceAnalyser:
                 stock.stock_price.fsell,
                 stock.stock_price.fbuy,
             ]
-            sheet_values.append(row)
+            if self.indicator_engine is not None:
+                row += [
+                    stock.technical.sma_50,
+                    stock.technical.sma_200,
+                    stock.technical.ema_20,
+                    stock.technical.rsi_14,
+                    stock.technical.atr_14,
+                    stock.technical.volatility_20,
+                    stock.technical.distance_52_week_high,
+                    stock.technical.distance_52_week_low,
+                    stock.technical.volume_z_score,
+                ]
+            yield row
+
+    def stock_price_sheet(self):
+        """
+        Generates a sheet of stock price data for each stock.
 
-        return sheet_values
+        This method creates a list of lists, where each inner list represents a row
+        containing sentiment information for a stock. The first row is a header row.
+
+        Returns:
+        - list of list: A list of rows, each containing sentiment data for a stock.
+        """
+        return [self.stock_price_header(), *self.stock_price_rows()]
@@ -1,3 +1,5 @@
+from sqlalchemy import select
+
 from builders.builder_interface import BuilderInterface
 from db import (
     StockPrice,
@@ -157,15 +159,34 @@ class DatabaseBuilder(BuilderInterface):
 
     def insert_sentiment(self):
         for stock in self.stocks:
-            for sentiment in stock.sentiment:
-                with get_session() as session:
-                    sentiment = Sentiment(
-                        content=sentiment.content,
-                        rate=sentiment.rate,
-                        stock_ticker=stock.ticker,
-                        posted_at=sentiment.posted_at,
+            with get_session() as session:
+                # Skip posts already stored by an earlier run, dedup by stream ID
+                stored_stream_ids = set(
+                    session.scalars(
+                        select(Sentiment.stream_id).where(
+                            Sentiment.stock_ticker == stock.ticker,
+                            Sentiment.stream_id != 0,
+                        )
+                    )
+                )
+
+                for sentiment in stock.sentiment or []:
+                    if sentiment.stream_id in stored_stream_ids:
+                        continue
+
+                    if sentiment.stream_id != 0:
+                        stored_stream_ids.add(sentiment.stream_id)
+
+                    session.add(
+                        Sentiment(
+                            content=sentiment.content,
+                            rate=sentiment.rate,
+                            category=sentiment.category,
+                            stock_ticker=stock.ticker,
+                            posted_at=sentiment.posted_at,
+                            stream_id=sentiment.stream_id,
+                        )
                     )
-                    session.add(sentiment)
 
     def insert_stock_price(self):
         for stock in self.stocks:
@@ -1,3 +1,5 @@
+from itertools import chain
+
 import openpyxl
 
 from builders.analysers import StockPriceAnalyser
@@ -6,6 +8,7 @@ from builders.analysers.key_analysis_analyser import KeyAnalysisAnalyser
 from builders.analysers.sentiment_analyser import SentimentAnalyser
 from builders.builder_interface import BuilderInterface
 from utils.logger_config import logger
+from utils.metrics import metrics
 
 
 class Excel(BuilderInterface):
@@ -23,38 +26,37 @@ class Excel(BuilderInterface):
         self.key_analysis_analyser = key_analysis_analyser
         self.stock_price_analyser = stock_price_analyser
 
-        try:
-            # Try to load an existing workbook
-            self.wb = openpyxl.load_workbook(self.filename)
-        except FileNotFoundError:
-            # Create a new workbook if it doesn't exist
-            self.wb = openpyxl.Workbook()
-
-            # Remove the default sheet created.
-            self.wb.remove(self.wb.active)
+        # Write-only workbooks stream every row to disk instead of keeping the cells in
+        # memory. They have no default sheet and replace an existing file on save, every
+        # sheet is written by each build anyway.
+        self.wb = openpyxl.Workbook(write_only=True)
 
-    def _write_to_sheet(self, sheet_name: str, values: []):
+    def _write_to_sheet(self, sheet_name: str, header: [], rows):
         """
-        Write values to an existing or new sheet in the Excel file.
+        Write values to a new sheet in the Excel file.
 
         :param sheet_name: Name of the sheet
-        :param values: List of rows (each row is a list of values)
+        :param header: The header row
+        :param rows: Iterable of rows (each row is a list of values), consumed one row at a time
         """
-        # Create a new sheet if it doesn't exist
-        if sheet_name not in self.wb.sheetnames:
-            self.wb.create_sheet(title=sheet_name)
+        sheet = self.wb.create_sheet(title=sheet_name)
 
-        sheet = self.wb[sheet_name]
+        num_rows = 0
+        with metrics.timer("builder_write_seconds", builder="excel", sheet=sheet_name):
+            for i, row_data in enumerate(chain([header], rows)):
+                sheet.append(row_data)
+                num_rows = i
 
-        for i, row_data in enumerate(values):
-            for j, value in enumerate(row_data):
-                sheet.cell(row=i + 1, column=j + 1, value=value)
+        metrics.increment(
+            "builder_rows_total", num_rows, builder="excel", sheet=sheet_name
+        )
 
     def save(self):
         """
         Save the workbook to a file.
         """
-        self.wb.save(self.filename)
+        with metrics.timer("builder_save_seconds", builder="excel"):
+            self.wb.save(self.filename)
         logger.info(
             f"Excel file saved successfully in the root project (./{self.filename})"
         )
@@ -63,14 +65,20 @@ class Excel(BuilderInterface):
         """
         Inserts stock data into the spreadsheet.
         """
-        self._write_to_sheet("idx-stocks", self.fundamental_analyser.stocks_sheet())
+        self._write_to_sheet(
+            "idx-stocks",
+            self.fundamental_analyser.stocks_header(),
+            self.fundamental_analyser.stocks_rows(),
+        )
 
     def insert_key_statistic(self):
         """
         Inserts keystatistic data into the spreadsheet.
         """
         self._write_to_sheet(
-            "key-statistics", self.fundamental_analyser.key_statistics_sheet()
+            "key-statistics",
+            self.fundamental_analyser.key_statistics_header(),
+            self.fundamental_analyser.key_statistics_rows(),
         )
 
     def insert_key_analysis(self):
@@ -78,18 +86,28 @@ class Excel(BuilderInterface):
         Inserts fundamental analysis data into the spreadsheet.
         """
 
-        self._write_to_sheet("analysis", self.key_analysis_analyser.analysis_sheet())
+        self._write_to_sheet(
+            "analysis",
+            self.key_analysis_analyser.analysis_header(),
+            self.key_analysis_analyser.analysis_rows(),
+        )
 
     def insert_sentiment(self):
         """
         Inserts sentiment analysis data into the spreadsheet.
         """
-        self._write_to_sheet("sentiments", self.sentiment_analyser.sentiment_sheet())
+        self._write_to_sheet(
+            "sentiments",
+            self.sentiment_analyser.sentiment_header(),
+            self.sentiment_analyser.sentiment_rows(),
+        )
 
     def insert_stock_price(self):
         """
         Inserts stock price data into the spreadsheet.
         """
         self._write_to_sheet(
-            "stock-prices", self.stock_price_analyser.stock_price_sheet()
+            "stock-prices",
+            self.stock_price_analyser.stock_price_header(),
+            self.stock_price_analyser.stock_price_rows(),
         )
@@ -0,0 +1,228 @@
+import os
+import time
+from datetime import date
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from builders.analysers.fundamental_analyser import FundamentalAnalyser
+from builders.analysers.key_analysis_analyser import KeyAnalysisAnalyser
+from builders.analysers.sentiment_analyser import SentimentAnalyser
+from builders.analysers.stock_price_analyser import StockPriceAnalyser
+from builders.builder_interface import BuilderInterface
+from utils.helpers import to_snake_case
+from utils.logger_config import logger
+from utils.metrics import metrics
+
+# Columns kept as text, by sheet, every other column is float64. The types are declared
+# instead of inferred from the rows, so every partition of a dataset has the same schema,
+# also when a column happens to be empty in one run.
+TEXT_COLUMNS = {
+    "idx-stocks": {"ticker", "name", "ipo_date", "note"},
+    "key-statistics": {"ticker", "latest_dividend_ex_date"},
+    "analysis": {"ticker"},
+    "sentiments": {"ticker", "content", "category", "posted_at"},
+    "stock-prices": {"ticker"},
+}
+
+
+class Parquet(BuilderInterface):
+    """
+    Writes every sheet as a typed Parquet dataset, partitioned by run date.
+
+    Files land in `<root>/<sheet>/run_date=<YYYY-MM-DD>/part.parquet` with snake_case
+    column names, so the history of a sheet loads with `pyarrow.parquet.read_table` or
+    `pandas.read_parquet("<root>/<sheet>")` without parsing a workbook, with `run_date`
+    as a column. Column types come from `TEXT_COLUMNS`, not from the data.
+
+    Attributes:
+        root (str): Root directory of the datasets.
+        partition (str): The partition directory name of this run.
+    """
+
+    def __init__(
+        self,
+        title: str,
+        fundamental_analyser: FundamentalAnalyser,
+        sentiment_analyser: SentimentAnalyser,
+        key_analysis_analyser: KeyAnalysisAnalyser,
+        stock_price_analyser: StockPriceAnalyser,
+        root: str = "parquet",
+        run_date: date = None,
+        batch_rows: int = 10_000,
+    ):
+        """
+        Initializes the Parquet builder.
+
+        Args:
+            title (str): The title of the output, kept as file metadata.
+            root (str): Root directory of the dataset.
+            run_date (date): Partition of this run, today by default.
+            batch_rows (int): Number of rows per record batch.
+        """
+        self.title = title
+        self.fundamental_analyser = fundamental_analyser
+        self.sentiment_analyser = sentiment_analyser
+        self.key_analysis_analyser = key_analysis_analyser
+        self.stock_price_analyser = stock_price_analyser
+        self.batch_rows = batch_rows
+        self.root = root
+        self.partition = f"run_date={(run_date or date.today()).isoformat()}"
+
+    @staticmethod
+    def _column_names(header: []) -> [str]:
+        names = []
+        for name in map(to_snake_case, header):
+            # Headers such as "Market Cap" can repeat within a sheet
+            unique_name, suffix = name, 2
+            while unique_name in names:
+                unique_name, suffix = f"{name}_{suffix}", suffix + 1
+            names.append(unique_name)
+        return names
+
+    def _schema(self, sheet_name: str, names: [str]) -> pa.Schema:
+        text_columns = TEXT_COLUMNS.get(sheet_name, set())
+        return pa.schema(
+            [
+                (name, pa.string() if name in text_columns else pa.float64())
+                for name in names
+            ],
+            metadata={"title": self.title},
+        )
+
+    @staticmethod
+    def _column_array(values: [], data_type: pa.DataType) -> pa.Array:
+        """
+        Builds a column of the given type. Text columns take any value as its string,
+        numeric columns take numbers, with empty strings standing for missing numbers
+        stored as nulls.
+
+        Raises:
+            pyarrow.ArrowInvalid, pyarrow.ArrowTypeError: If a value does not fit the type.
+        """
+        if pa.types.is_string(data_type):
+            return pa.array(
+                [None if value is None else str(value) for value in values],
+                type=data_type,
+            )
+        try:
+            return pa.array(values, type=data_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return pa.array(
+                [None if value == "" else value for value in values], type=data_type
+            )
+
+    @classmethod
+    def _typed_arrays(cls, sheet_name: str, columns: [], schema: pa.Schema) -> []:
+        arrays = []
+        for column, field in zip(columns, schema):
+            try:
+                arrays.append(cls._column_array(column, field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                # Nulling the value would lose data without anyone noticing
+                raise ValueError(
+                    f"Column {field.name} of {sheet_name} is declared as {field.type}, "
+                    f"a value does not fit: {e}"
+                ) from e
+        return arrays
+
+    def _write_table(self, sheet_name: str, header: [], rows):
+        """
+        Streams the rows of a sheet to its Parquet file in record batches of `batch_rows`.
+
+        Every batch is converted to the declared schema of the sheet, only one batch of
+        rows is held in memory at a time.
+
+        Args:
+            sheet_name (str): Name of the sheet, used as dataset directory name.
+            header (list): The header row.
+            rows (iterable of list): The data rows, consumed lazily.
+
+        Raises:
+            ValueError: If a value does not fit the declared column type.
+        """
+        names = self._column_names(header)
+        directory = os.path.join(self.root, sheet_name, self.partition)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "part.parquet")
+        rows = iter(rows)
+        schema = self._schema(sheet_name, names)
+        num_rows = 0
+        started = time.perf_counter()
+
+        # Readers of the partition never see a half-written file
+        writer = pq.ParquetWriter(f"{path}.tmp", schema, compression="zstd")
+        try:
+            while batch := list(islice(rows, self.batch_rows)):
+                columns = [list(column) for column in zip(*batch)]
+                arrays = self._typed_arrays(sheet_name, columns, schema)
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+                num_rows += len(batch)
+        except BaseException:
+            writer.close()
+            os.remove(f"{path}.tmp")
+            raise
+
+        writer.close()
+        os.replace(f"{path}.tmp", path)
+        metrics.observe(
+            "builder_write_seconds",
+            time.perf_counter() - started,
+            builder="parquet",
+            sheet=sheet_name,
+        )
+        metrics.increment(
+            "builder_rows_total", num_rows, builder="parquet", sheet=sheet_name
+        )
+        logger.info(f"Parquet file saved in {path} ({num_rows} rows)")
+
+    def insert_stock(self):
+        """
+        Inserts stock data into the dataset.
+        """
+        self._write_table(
+            "idx-stocks",
+            self.fundamental_analyser.stocks_header(),
+            self.fundamental_analyser.stocks_rows(),
+        )
+
+    def insert_key_statistic(self):
+        """
+        Inserts keystatistic data into the dataset.
+        """
+        self._write_table(
+            "key-statistics",
+            self.fundamental_analyser.key_statistics_header(),
+            self.fundamental_analyser.key_statistics_rows(),
+        )
+
+    def insert_key_analysis(self):
+        """
+        Inserts fundamental analysis data into the dataset.
+        """
+        self._write_table(
+            "analysis",
+            self.key_analysis_analyser.analysis_header(),
+            self.key_analysis_analyser.analysis_rows(),
+        )
+
+    def insert_sentiment(self):
+        """
+        Inserts sentiment analysis data into the dataset.
+        """
+        self._write_table(
+            "sentiments",
+            self.sentiment_analyser.sentiment_header(),
+            self.sentiment_analyser.sentiment_rows(),
+        )
+
+    def insert_stock_price(self):
+        """
+        Inserts stock price data into the dataset.
+        """
+        self._write_table(
+            "stock-prices",
+            self.stock_price_analyser.stock_price_header(),
+            self.stock_price_analyser.stock_price_rows(),
+        )
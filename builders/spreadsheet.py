@@ -10,6 +10,7 @@ from builders.analysers.stock_price_analyser import StockPriceAnalyser
 from builders.builder_interface import BuilderInterface
 from services.google_drive_service import GoogleDriveService
 from utils.logger_config import logger
+from utils.metrics import metrics
 
 load_dotenv()
 
@@ -21,9 +22,14 @@ class Spreadsheet(BuilderInterface):
     Attributes:
         title (str): The title of the spreadsheet.
         google_drive_service (GoogleDriveService): An instance of GoogleDriveService to interact with Google Drive.
-        spreadsheet_id (str): The ID of the created spreadsheet.
+        spreadsheet_id (str): The ID of the created spreadsheet, or of the existing spreadsheet in update mode.
+        is_update (bool): Whether only changed rows are pushed to an existing spreadsheet.
+        upload_state_path (str): File holding the ID of a spreadsheet whose upload was interrupted, so the
+            next run with the same title resumes it instead of creating a new spreadsheet.
     """
 
+    UPLOAD_STATE_DIR = "sheets_upload"
+
     def __init__(
         self,
         title: str,
@@ -31,99 +37,151 @@ class Spreadsheet(BuilderInterface):
         sentiment_analyser: SentimentAnalyser,
         key_analysis_analyser: KeyAnalysisAnalyser,
         stock_price_analyser: StockPriceAnalyser,
+        spreadsheet_id: str = None,
     ):
         """
         Initializes the Spreadsheet class with a title and creates a new spreadsheet.
 
         Args:
             title (str): The title of the spreadsheet.
+            spreadsheet_id (str): ID of an existing spreadsheet to update with the changed rows only,
+                a new spreadsheet is created if None or empty.
         """
         self.title = title
         self.fundamental_analyser = fundamental_analyser
         self.google_drive_service = GoogleDriveService()
-        self.spreadsheet_id = ""
+        self.spreadsheet_id = spreadsheet_id or ""
+        self.is_update = bool(spreadsheet_id)
         self.sentiment_analyser = sentiment_analyser
         self.key_analysis_analyser = key_analysis_analyser
         self.stock_price_analyser = stock_price_analyser
-        self._create()
+        # Sheet title -> rows generator, consumed by `save`
+        self.pending_sheets = {}
+        # Sheet title -> number of data rows, counted while the rows stream to the API
+        self.row_counts = {}
+        self.upload_state_path = os.path.join(
+            self.UPLOAD_STATE_DIR, f"{self.title}.json"
+        )
+        if not self.is_update:
+            self._create()
 
     def _create(self):
         """
-        Creates a new spreadsheet and sets permissions for specified Google Drive emails.
+        Creates a new spreadsheet and sets permissions for specified Google Drive emails, or reuses the
+        spreadsheet of an interrupted upload with the same title.
         """
+        if os.path.exists(self.upload_state_path):
+            with open(self.upload_state_path, "r") as file:
+                self.spreadsheet_id = json.load(file)["spreadsheet_id"]
+            logger.info(f"Resuming upload to spreadsheet {self.spreadsheet_id}")
+            return
+
         self.spreadsheet_id = self.google_drive_service.create_spreadsheet(
             title=self.title
         )
+        os.makedirs(self.UPLOAD_STATE_DIR, exist_ok=True)
+        with open(self.upload_state_path, "w") as file:
+            json.dump({"spreadsheet_id": self.spreadsheet_id}, file)
 
         google_drive_emails = json.loads(os.getenv("GOOGLE_DRIVE_EMAILS"))
-        for google_drive_email in google_drive_emails:
-            self.google_drive_service.add_drive_permission(
-                self.spreadsheet_id, google_drive_email
+        self.google_drive_service.add_drive_permissions(
+            self.spreadsheet_id, google_drive_emails
+        )
+
+    def save(self):
+        """
+        Publishes every inserted sheet in one batched write. Rows are pulled from the analysers while they
+        are uploaded, large sheets in resumable blocks, so no sheet is held in memory in full. The upload
+        state is only dropped once every sheet is written. In update mode only the rows that changed since
+        the last publish are written.
+        """
+        with metrics.timer("builder_save_seconds", builder="spreadsheet"):
+            if self.is_update:
+                self.google_drive_service.update_changed_data(
+                    self.spreadsheet_id, self.pending_sheets
+                )
+            else:
+                self.google_drive_service.batch_insert_data(
+                    self.spreadsheet_id, self.pending_sheets
+                )
+                os.remove(self.upload_state_path)
+
+        for sheet_name, num_rows in self.row_counts.items():
+            metrics.increment(
+                "builder_rows_total",
+                num_rows,
+                builder="spreadsheet",
+                sheet=sheet_name,
             )
+        logger.info(
+            f"Sheets {', '.join(self.pending_sheets)} have been inserted on "
+            f"https://docs.google.com/spreadsheets/d/{self.spreadsheet_id}"
+        )
+        self.pending_sheets = {}
+        self.row_counts = {}
+
+    def _queue_sheet(self, sheet_name: str, header: [], rows):
+        """
+        Queues a sheet for `save` as a generator of the header and the rows, counting the rows as they
+        are consumed.
+        """
+
+        def values():
+            yield header
+            num_rows = 0
+            for row in rows:
+                num_rows += 1
+                yield row
+            self.row_counts[sheet_name] = num_rows
+
+        self.pending_sheets[sheet_name] = values()
 
     def insert_stock(self):
         """
         Inserts stock data into the spreadsheet.
         """
-        self.google_drive_service.insert_data(
-            self.spreadsheet_id, "idx-stocks", self.fundamental_analyser.stocks_sheet()
-        )
-        logger.info(
-            f"Stocks has been inserted on https://docs.google.com/spreadsheets/d/{self.spreadsheet_id}"
+        self._queue_sheet(
+            "idx-stocks",
+            self.fundamental_analyser.stocks_header(),
+            self.fundamental_analyser.stocks_rows(),
         )
 
     def insert_key_statistic(self):
         """
         Inserts keystatistic data into the spreadsheet.
         """
-        self.google_drive_service.insert_data(
-            self.spreadsheet_id,
+        self._queue_sheet(
             "key-statistics",
-            self.fundamental_analyser.key_statistics_sheet(),
-        )
-        logger.info(
-            f"Key statistics has been inserted on https://docs.google.com/spreadsheets/d/{self.spreadsheet_id}"
+            self.fundamental_analyser.key_statistics_header(),
+            self.fundamental_analyser.key_statistics_rows(),
         )
 
     def insert_key_analysis(self):
         """
         Inserts fundamental analysis data into the spreadsheet.
         """
-
-        self.google_drive_service.insert_data(
-            self.spreadsheet_id, "analyses", self.key_analysis_analyser.analysis_sheet()
-        )
-
-        logger.info(
-            f"Analysis has been inserted on https://docs.google.com/spreadsheets/d/{self.spreadsheet_id}"
+        self._queue_sheet(
+            "analyses",
+            self.key_analysis_analyser.analysis_header(),
+            self.key_analysis_analyser.analysis_rows(),
         )
 
     def insert_sentiment(self):
         """
         Inserts sentiment analysis data into the spreadsheet.
         """
-
-        self.google_drive_service.insert_data(
-            self.spreadsheet_id,
+        self._queue_sheet(
             "sentiments",
-            self.sentiment_analyser.sentiment_sheet(),
-        )
-
-        logger.info(
-            f"Sentiment has been inserted on https://docs.google.com/spreadsheets/d/{self.spreadsheet_id}"
+            self.sentiment_analyser.sentiment_header(),
+            self.sentiment_analyser.sentiment_rows(),
         )
 
     def insert_stock_price(self):
         """
         Inserts stock price data into the spreadsheet.
         """
-
-        self.google_drive_service.insert_data(
-            self.spreadsheet_id,
+        self._queue_sheet(
             "stock-prices",
-            self.stock_price_analyser.stock_price_sheet(),
-        )
-
-        logger.info(
-            f"Sentiment has been inserted on https://docs.google.com/spreadsheets/d/{self.spreadsheet_id}"
+            self.stock_price_analyser.stock_price_header(),
+            self.stock_price_analyser.stock_price_rows(),
         )
@@ -1,7 +1,7 @@
 import logging
 import os
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 
 from db.models import Base
 from db.models.fundamental import *
@@ -11,29 +11,74 @@ from db.models.stock import Stock
 from db.models.stock_price import StockPrice
 # from db.models.corp_action import CorpAction
 from utils.helpers import get_project_root
-from utils.logger_config import InterceptHandler
+from utils.logger_config import LOG_LEVEL, InterceptHandler, logger
 
 # Set the base directory to the project root
 base_dir = get_project_root()
 
 # Define the path to the database file relative to the project root
-db_path = os.path.join(base_dir, "db/idx-fundamental.db")
+db_path = os.getenv("DATABASE_PATH", os.path.join(base_dir, "db/idx-fundamental.db"))
 
-logging.basicConfig(handlers=[InterceptHandler()], level=0)
+# Standard logging (SQLAlchemy) goes through loguru, below the log level it is dropped
+# before a record is even created
+logging.basicConfig(handlers=[InterceptHandler()], level=logger.level(LOG_LEVEL).no)
+
+# Echoing every SQL statement is only useful when debugging queries
+sql_echo = os.getenv("SQL_ECHO", "false").lower() in ("1", "true", "yes")
 
 
 class DB:
     def __init__(self):
-        self._engine = create_engine(f"sqlite:///{db_path}", echo=True)
+        self._engine = create_engine(f"sqlite:///{db_path}", echo=sql_echo)
 
-    def setup_db(self, is_drop_table: bool = False):
+    def setup_db(self, is_drop_table: bool = False, keep_tables: tuple = ()):
         with self._engine.begin() as conn:
             if is_drop_table:
-                # Drop all tables in the database
-                Base.metadata.drop_all(conn)
+                # Drop all tables in the database, except the ones kept across runs
+                Base.metadata.drop_all(
+                    conn,
+                    tables=[
+                        table
+                        for table in Base.metadata.sorted_tables
+                        if table.name not in keep_tables
+                    ],
+                )
 
             # Create all tables in the database
             Base.metadata.create_all(conn)
+            self._add_missing_columns(conn)
+
+    @staticmethod
+    def _add_missing_columns(conn):
+        """
+        Adds the model columns an existing table lacks, create_all only creates
+        missing tables. Tables kept across runs, such as sentiments, may come from
+        an older version of the models.
+        """
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            missing = [
+                column for column in table.columns if column.name not in existing
+            ]
+            for column in missing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                default = column.default
+                default_sql = (
+                    f" DEFAULT {default.arg!r}"
+                    if default is not None and default.is_scalar
+                    else ""
+                )
+                conn.exec_driver_sql(
+                    f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" '
+                    f"{column_type}{default_sql}"
+                )
+                logger.info(f"Added column {column.name} to table {table.name}")
+
+            missing_names = {column.name for column in missing}
+            for index in table.indexes:
+                if missing_names & {column.name for column in index.columns}:
+                    index.create(conn, checkfirst=True)
 
     @property
     def engine(self):
@@ -1,4 +1,4 @@
-from sqlalchemy import DateTime, ForeignKey
+from sqlalchemy import BigInteger, DateTime, ForeignKey
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 
 from db.models import BaseModel, VARCHAR, FLOAT
@@ -11,6 +11,7 @@ class Sentiment(BaseModel):
     rate: Mapped[FLOAT]
     category: Mapped[VARCHAR]
     posted_at = mapped_column(DateTime)
+    stream_id = mapped_column(BigInteger, default=0, index=True)
 
     stock_ticker = mapped_column(ForeignKey("stocks.ticker"))
     stock: Mapped["Stock"] = relationship(back_populates="sentiments")
@@ -3,14 +3,16 @@ from datetime import date
 
 from dotenv import load_dotenv
 
+# Settings from .env are read when the project modules are imported
+load_dotenv()
+
 from builders.analysers import Analyser
 from builders.database_builder import DatabaseBuilder
 from db import database
 from providers.idx import IDX
 from providers.stockbit import StockBit
 from utils.logger_config import logger
-
-load_dotenv()
+from utils.profiler import SamplingProfiler, profile_stage
 
 
 def parse_arguments():
@@ -28,6 +30,13 @@ def parse_arguments():
         default="spreadsheet",
         help="Specify the output format: 'spreadsheet' for Google Spreadsheet, 'excel' for Excel file",
     )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="profiles",
+        metavar="DIR",
+        help="Profile the run by sampling and write collapsed stacks (flamegraph) and a top functions report to DIR",
+    )
     return parser.parse_args()
 
 
@@ -35,6 +44,8 @@ logger.info("IDX Composite Fundamental Analysis")
 
 args = parse_arguments()
 
+profiler = SamplingProfiler(args.profile).start() if args.profile else None
+
 # Setup database
 # database.setup_db(is_drop_table=True)
 
@@ -46,18 +57,20 @@ with open("dmy-ex1", "r") as f:
 # syms = sorted(syms)[1:5]
 # syms = sorted(syms)
 idx.set_symbol(syms)
-stocks = idx.stocks()
+with profile_stage("idx"):
+    stocks = idx.stocks()
 # stocks = idx.stocks_from_df(csv_path = "/media/data1/project1/idx-fundamental-analysis/idx.csv")
 logger.info("Stocks: {}".format(stocks))
 logger.info("Total Stocks: {}".format(len(stocks)))
 
 # Process stocks key statistics, price, fundamental, and stream data (news) from Stockbit
-sb = (StockBit(stocks=stocks)
-       .with_stock_price()
-    #   .with_dividend()
-    #    .with_fundamental()
-      .with_stream_data()
-    )
+with profile_stage("stockbit"):
+    sb = (StockBit(stocks=stocks)
+           .with_stock_price()
+        #   .with_dividend()
+        #    .with_fundamental()
+          .with_stream_data()
+        )
 
 # corp_actions = []
 # for stock in stocks:
@@ -67,7 +80,8 @@ sb = (StockBit(stocks=stocks)
 # Analyser to build the output
 try:
     title = f"IDX Fundamental Analysis {date.today().strftime('%Y-%m-%d')}"
-    Analyser(stocks=stocks)
+    with profile_stage("analyse"):
+        Analyser(stocks=stocks)
     # .build(output=args.output_format, title=title)
 except Exception as e:
     print("e2", e)
@@ -77,7 +91,8 @@ try:
     # Populate to database
     database_builder = DatabaseBuilder(stocks=stocks)
     # database_builder.insert_corp_action()
-    database_builder.insert_stock()
+    with profile_stage("database"):
+        database_builder.insert_stock()
     # database_builder.insert_dividend()
     # database_builder.insert_key_statistic()
     # database_builder.insert_key_analysis()
@@ -86,3 +101,5 @@ try:
 except Exception as e:
     print("e1", e)
 
+if profiler is not None:
+    profiler.stop()
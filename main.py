@@ -1,16 +1,33 @@
 import argparse
+import os
+import sys
+import threading
 from datetime import date
 
 from dotenv import load_dotenv
 
+# Settings from .env are read when the project modules are imported
+load_dotenv()
+
 from builders.analysers import Analyser
-from builders.database_builder import DatabaseBuilder
-from db import database
-from providers.idx import IDX
 from providers.stockbit import StockBit
+from services.checkpoint import Checkpoint
+from services.pipeline import Pipeline, Stage
+from services.price_store import PriceStore
 from utils.logger_config import logger
+from utils.metrics import metrics
+from utils.profiler import SamplingProfiler
 
-load_dotenv()
+# Pipeline stages in order
+STAGES = [
+    "idx",
+    "stock_price",
+    "fundamental",
+    "stream",
+    "analyse",
+    "output",
+    "database",
+]
 
 
 def parse_arguments():
@@ -24,41 +41,179 @@ def parse_arguments():
     parser.add_argument(
         "-o",
         "--output-format",
-        choices=["spreadsheet", "excel"],
+        choices=["spreadsheet", "excel", "parquet"],
         default="spreadsheet",
-        help="Specify the output format: 'spreadsheet' for Google Spreadsheet, 'excel' for Excel file",
+        help="Specify the output format: 'spreadsheet' for Google Spreadsheet, 'excel' for Excel file, "
+        "'parquet' for Parquet files partitioned by run date",
+    )
+    parser.add_argument(
+        "--spreadsheet-id",
+        # An empty GOOGLE_SPREADSHEET_ID in .env means a new spreadsheet, like an unset one
+        default=os.getenv("GOOGLE_SPREADSHEET_ID") or None,
+        help="Update this existing Google Spreadsheet with the changed rows only, instead of creating a new one",
+    )
+    parser.add_argument(
+        "-s",
+        "--stages",
+        nargs="+",
+        choices=STAGES,
+        help="Run only these stages, the stages they depend on are restored from today's checkpoints when fresh",
+    )
+    parser.add_argument(
+        "--resume-from",
+        choices=STAGES[1:],
+        help="Run this stage and every stage after it, restoring the earlier ones from today's checkpoints",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Run the selected stages even when today's checkpoint is fresh",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=3,
+        help="Maximum number of stages running at the same time",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        default=os.getenv("METRICS_OUT"),
+        help="Write the run metrics to this file, Prometheus text format for .prom or .txt files, JSON otherwise",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="profiles",
+        metavar="DIR",
+        help="Profile the run by sampling and write collapsed stacks (flamegraph) and a top functions report to DIR",
     )
     return parser.parse_args()
 
 
+def build_stages(args) -> [Stage]:
+    price_store = PriceStore()
+    shared = {}
+    lock = threading.Lock()
+
+    def stockbit(pipeline: Pipeline) -> StockBit:
+        # One client and one login for the concurrent StockBit stages
+        with lock:
+            if "stockbit" not in shared:
+                shared["stockbit"] = StockBit(
+                    stocks=pipeline.stocks, price_store=price_store
+                )
+            return shared["stockbit"]
+
+    def retrieve_stocks(pipeline: Pipeline):
+        # selenium is only imported when the stock list is actually scraped
+        from providers.idx import IDX
+
+        # Retrieve stocks from IDX
+        idx = IDX(is_full_retrieve=args.full_retrieve)
+        pipeline.stocks = idx.stocks()
+        logger.info("Stocks: {}".format(pipeline.stocks))
+        logger.info("Total Stocks: {}".format(len(pipeline.stocks)))
+
+    def retrieve_stock_price(pipeline: Pipeline):
+        # yfinance is only imported when the history is actually downloaded
+        from providers.yfinance import YFinance
+
+        # Backfill the daily history the indicators need, then keep the closed session's
+        # price snapshot as its bar in the local price store
+        try:
+            YFinance(price_store=price_store).download_history(pipeline.stocks)
+        except Exception as e:
+            logger.exception(f"Downloading the price history failed: {e}")
+        stockbit(pipeline).with_stock_price()
+        price_store.compact()
+
+    def analyse(pipeline: Pipeline):
+        shared["analyser"] = Analyser(stocks=pipeline.stocks, price_store=price_store)
+
+    def build_output(_pipeline: Pipeline):
+        title = f"IDX Fundamental Analysis {date.today().strftime('%Y-%m-%d')}"
+        shared["analyser"].build(
+            output=args.output_format,
+            title=title,
+            spreadsheet_id=args.spreadsheet_id,
+        )
+
+    def populate_database(pipeline: Pipeline):
+        from builders.database_builder import DatabaseBuilder
+        from db import database
+
+        # Sentiments are fetched incrementally, so they accumulate across runs
+        database.setup_db(is_drop_table=True, keep_tables=("sentiments",))
+        database_builder = DatabaseBuilder(stocks=pipeline.stocks)
+        for table, insert in (
+            ("stocks", database_builder.insert_stock),
+            ("key-statistics", database_builder.insert_key_statistic),
+            ("analyses", database_builder.insert_key_analysis),
+            ("stock-prices", database_builder.insert_stock_price),
+            ("sentiments", database_builder.insert_sentiment),
+        ):
+            with metrics.timer(
+                "builder_write_seconds", builder="database", sheet=table
+            ):
+                insert()
+
+        # The stored posts are only skipped by later runs once they are committed
+        if "stockbit" in shared:
+            shared["stockbit"].save_stream_cursors()
+
+    # Key statistics, price and stream data (news) from Stockbit only need the stock
+    # list, and the outputs only need the analysis, so each group runs concurrently
+    return [
+        Stage("idx", retrieve_stocks, creates_stocks=True),
+        Stage(
+            "stock_price",
+            retrieve_stock_price,
+            depends_on=("idx",),
+            fields=("stock_price",),
+        ),
+        Stage(
+            "fundamental",
+            lambda pipeline: stockbit(pipeline).with_fundamental(),
+            depends_on=("idx",),
+            fields=("fundamental",),
+        ),
+        Stage(
+            "stream",
+            lambda pipeline: stockbit(pipeline).with_stream_data(),
+            depends_on=("idx",),
+            fields=("sentiment",),
+        ),
+        Stage("analyse", analyse, depends_on=("stock_price", "fundamental", "stream")),
+        Stage("output", build_output, depends_on=("analyse",)),
+        Stage("database", populate_database, depends_on=("analyse",)),
+    ]
+
+
 def main():
     logger.info("IDX Composite Fundamental Analysis")
 
     args = parse_arguments()
 
-    # Setup database
-    database.setup_db(is_drop_table=True)
-
-    # Retrieve stocks from IDX
-    idx = IDX(is_full_retrieve=args.full_retrieve)
-    stocks = idx.stocks()
-    logger.info("Stocks: {}".format(stocks))
-    logger.info("Total Stocks: {}".format(len(stocks)))
-
-    # Process stocks key statistics, price, fundamental, and stream data (news) from Stockbit
-    StockBit(stocks=stocks).with_stock_price().with_fundamental().with_stream_data()
-
-    # Analyser to build the output
-    title = f"IDX Fundamental Analysis {date.today().strftime('%Y-%m-%d')}"
-    Analyser(stocks=stocks).build(output=args.output_format, title=title)
-
-    # Populate to database
-    database_builder = DatabaseBuilder(stocks=stocks)
-    database_builder.insert_stock()
-    database_builder.insert_key_statistic()
-    database_builder.insert_key_analysis()
-    database_builder.insert_stock_price()
-    database_builder.insert_sentiment()
+    targets = args.stages
+    if args.resume_from:
+        targets = STAGES[STAGES.index(args.resume_from) :]
+
+    pipeline = Pipeline(build_stages(args), Checkpoint(), max_workers=args.workers)
+
+    profiler = SamplingProfiler(args.profile).start() if args.profile else None
+    try:
+        pipeline.run(targets, force=args.force)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+
+    if args.metrics_out:
+        metrics.write(args.metrics_out)
+        logger.info(f"Metrics written to {args.metrics_out}")
+
+    if not pipeline.is_successful:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -37,8 +37,6 @@ It uses Selenium WebDriver to interact with the website and extracts relevant da
 
 import re
 
-import pandas as pd
-
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as expect
@@ -80,6 +78,9 @@ class IDX:
         Returns:
             [Stock]: list of Stock object containing parsed stock data.
         """
+        # pandas is only needed for the CSV snapshot, imported here to keep startup fast
+        import pandas as pd
+
         url = f"{self.base_url}/id/data-pasar/data-saham/daftar-saham/"
 
         self.driver.get(url)
@@ -193,7 +194,6 @@ class IDX:
                 stocks.append(stock)
         else:
             csv_path = "/media/data1/project1/idx-fundamental-analysis/idx.csv"
-            df = pd.DataFrame()
             # """
             # for index,tc in enumerate(self.symbols):
             # print(tickers)
@@ -216,13 +216,12 @@ class IDX:
                     note=notes[index].text,
                 )
                 stocks.append(stock)
-                
-                try:
-                    pd.concat([df, pd.DataFrame(stock.to_dict())])
-                except Exception as e:
-                    print(e)
                 # break
-                
+
+            # One frame from the flat rows, instead of a throwaway frame per stock
+            df = pd.DataFrame.from_records(
+                [stock.to_tuple() for stock in stocks], columns=Stock.field_names()
+            )
             df.to_csv(csv_path)
 
         # Close browser
@@ -252,6 +251,8 @@ class IDX:
         #     exc = exc_file.read()
         # self.tickers = exc.splitlines()
 
+        import pandas as pd
+
         # Read existing data from CSV
         df = pd.read_csv(csv_path)
 
@@ -1,6 +1,8 @@
+import json
+import os
 import time
+from datetime import datetime
 
-from black import datetime
 from dotenv import load_dotenv
 
 from schemas.fundamental import (
@@ -22,30 +24,53 @@ from schemas.fundamental import (
 from schemas.sentiment import Sentiment
 from schemas.stock import Stock
 from schemas.stock_price import StockPrice
+from services.price_store import EXCHANGE_TIMEZONE, PriceStore, last_closed_session
 from services.stockbit_api_client import StockbitApiClient
 from utils.helpers import (
     parse_currency_to_float,
     parse_key_statistic_results_item_value,
 )
 from utils.logger_config import logger
+from utils.metrics import metrics
+from utils.profiler import profile_stage
 
 load_dotenv()
 
+# The parts of the responses read by the parsers, large responses are decoded only there
+KEY_STATISTIC_SUBTREES = ("data.stats", "data.closure_fin_items_results")
+STREAM_SUBTREES = ("data.stream",)
+
 
 class StockBit:
     """
     A class to interact with the StockBit API and fetch key statistics, stock price, and sentiment for stocks.
     """
 
-    def __init__(self, stocks: [Stock]):
+    def __init__(self, stocks: [Stock], price_store: PriceStore = None):
         """
         Initializes the StockBit provider with necessary headers and URL.
+
+        Parameters:
+        - stocks (list of Stock): Stocks to enrich.
+        - price_store (PriceStore): Optional store that receives today's bar from each price snapshot.
         """
         logger.info("StockBit provider initialised")
         self.stocks = stocks
-        self.base_url = "https://exodus.stockbit.com"
+        self.price_store = price_store
         self.key_statistic = None
         self.stockbit_api_client = StockbitApiClient()
+        self.base_url = self.stockbit_api_client.base_url
+        # Pause between requests, to avoid overwhelming the server
+        self.request_delay = float(os.getenv("STOCKBIT_REQUEST_DELAY", "0.1"))
+        # Batched price endpoint, a path with a `{tickers}` placeholder for comma separated
+        # tickers, answering with a list of orderbooks. Prices are fetched per ticker if unset
+        self.bulk_price_path = os.getenv("STOCKBIT_BULK_PRICE_PATH")
+        self.bulk_price_chunk_size = int(os.getenv("STOCKBIT_BULK_PRICE_CHUNK", "100"))
+        self.stream_cursor_path = os.path.join(
+            self.stockbit_api_client.cache_dir, "stream_cursors.json"
+        )
+        # Cursors moved by the last `with_stream_data`, saved once the posts are stored
+        self.stream_cursors = {}
 
     def key_statistic_by_stock(self, stock: Stock) -> dict:
         """
@@ -69,7 +94,7 @@ class StockBit:
         """
         url = f"{self.base_url}/keystats/ratio/v1/{stock.ticker}?year_limit=10"
 
-        return self.stockbit_api_client.get(url)
+        return self.stockbit_api_client.get(url, subtrees=KEY_STATISTIC_SUBTREES)
 
     def with_dividend(self):
         """
@@ -118,7 +143,7 @@ class StockBit:
                 fundamental.dividend = dividend
                 logger.debug(dividend)
 
-            time.sleep(0.1)
+            time.sleep(self.request_delay)
             logger.debug(stock)
 
         return self
@@ -134,9 +159,12 @@ class StockBit:
             self.key_statistic = self.key_statistic_by_stock(stock)
 
             if self.key_statistic:
-                stock.fundamental = self._fundamental(stock)
+                with metrics.timer(
+                    "stockbit_parse_seconds", parser="fundamental"
+                ), profile_stage("parse"):
+                    stock.fundamental = self._fundamental(stock)
 
-            time.sleep(0.1)
+            time.sleep(self.request_delay)
             logger.debug(stock)
 
         return self
@@ -484,25 +512,31 @@ class StockBit:
 
         return self.stockbit_api_client.get(url)
 
-    def with_stock_price(self):
+    def stock_prices_by_stocks(self, stocks: [Stock]) -> dict:
         """
-        Updates each stock in the stocks list with detailed price data.
+        Fetches the stock price data of several stocks in one request to the batched price endpoint.
 
-        This method iterates over each stock in the `stocks` list, fetching the latest stock price data.
-        It updates various attributes of the stock with the retrieved data, such as last price, change, volume, etc.
-        The method pauses briefly between processing each stock to avoid overwhelming the server with requests.
+        Parameters:
+        - stocks (list of Stock): The stocks, at most one chunk of them.
 
         Returns:
-        - self: The instance of the class, allowing for method chaining.
+        - dict: Ticker to its orderbook data, empty if the request failed.
         """
-        for stock in self.stocks:
-            response = self.stock_price_by_stock(stock)
+        tickers = ",".join(stock.ticker for stock in stocks)
+        url = f"{self.base_url}{self.bulk_price_path.format(tickers=tickers)}"
 
-            if response == {}:
-                continue
+        response = self.stockbit_api_client.get(url)
+        data = response.get("data") or []
+        if isinstance(data, dict):
+            data = list(data.values())
 
-            data = response["data"]
+        return {item["symbol"]: item for item in data if item and item.get("symbol")}
 
+    def _with_stock_price_data(self, stock: Stock, data: dict):
+        """
+        Sets the price of a stock from its orderbook data, and appends the session's bar to the price store.
+        """
+        with metrics.timer("stockbit_parse_seconds", parser="stock_price"):
             stock.stock_price = StockPrice(
                 price=data["lastprice"],
                 change=data["change"],
@@ -520,9 +554,112 @@ class StockBit:
                 frequency=data["frequency"],
             )
 
-            time.sleep(0.1)
+        if self.price_store is not None:
+            self._append_session_bar(stock)
 
-            logger.debug(stock)
+        logger.debug(stock)
+
+    def _append_session_bar(self, stock: Stock):
+        """
+        Appends the price snapshot as the daily bar of the session, dated on the exchange calendar.
+
+        Only a snapshot taken after the close of a trading day is a complete bar. Intraday and weekend
+        snapshots are skipped, and so is a snapshot without trades or repeating the last stored bar,
+        which is what the orderbook shows on an exchange holiday.
+
+        Parameters:
+        - stock (Stock): The stock with its price just set.
+        """
+        now = datetime.now(EXCHANGE_TIMEZONE)
+        day = now.date()
+        stock_price = stock.stock_price
+        if day != last_closed_session(now) or not stock_price.volume:
+            return
+
+        last_date = self.price_store.last_date(stock.ticker)
+        if last_date is not None and last_date < day:
+            last_bar = self.price_store.read(
+                stock.ticker,
+                start=last_date,
+                end=last_date,
+                columns=["close", "volume"],
+            )
+            if (
+                len(last_bar["close"])
+                and last_bar["close"][-1] == stock_price.price
+                and last_bar["volume"][-1] == stock_price.volume
+            ):
+                return
+
+        self.price_store.append_bar(
+            stock.ticker,
+            day=day,
+            open_=stock_price.open,
+            high=stock_price.high,
+            low=stock_price.low,
+            close=stock_price.price,
+            volume=stock_price.volume,
+        )
+
+    def _with_bulk_stock_price(self) -> [Stock]:
+        """
+        Fetches prices through the batched price endpoint, one request per chunk of stocks.
+
+        If the first chunk fails entirely the endpoint is assumed to be unavailable and is not
+        tried again in this run.
+
+        Returns:
+        - list of Stock: Stocks the batched endpoint returned no price for.
+        """
+        missing = []
+        for i in range(0, len(self.stocks), self.bulk_price_chunk_size):
+            chunk = self.stocks[i : i + self.bulk_price_chunk_size]
+            prices = self.stock_prices_by_stocks(chunk)
+
+            if not prices and i == 0:
+                logger.warning(
+                    f"Batched price endpoint {self.bulk_price_path} returned nothing, "
+                    f"falling back to one request per ticker"
+                )
+                self.bulk_price_path = None
+                return list(self.stocks)
+
+            for stock in chunk:
+                data = prices.get(stock.ticker)
+                if data is None:
+                    missing.append(stock)
+                else:
+                    self._with_stock_price_data(stock, data)
+
+            time.sleep(self.request_delay)
+
+        return missing
+
+    def with_stock_price(self):
+        """
+        Updates each stock in the stocks list with detailed price data.
+
+        This method iterates over each stock in the `stocks` list, fetching the latest stock price data.
+        It updates various attributes of the stock with the retrieved data, such as last price, change, volume, etc.
+        When a price store is configured, a snapshot taken after the close is also appended as the session's daily bar.
+        With a batched price endpoint configured (`STOCKBIT_BULK_PRICE_PATH`), prices are fetched in chunks of
+        `STOCKBIT_BULK_PRICE_CHUNK` tickers, stocks missing from its answers are fetched one by one.
+        The method pauses briefly between processing each stock to avoid overwhelming the server with requests.
+
+        Returns:
+        - self: The instance of the class, allowing for method chaining.
+        """
+        stocks = self._with_bulk_stock_price() if self.bulk_price_path else self.stocks
+
+        for stock in stocks:
+            response = self.stock_price_by_stock(stock)
+
+            if response == {}:
+                continue
+
+            self._with_stock_price_data(stock, response["data"])
+
+            time.sleep(self.request_delay)
 
         return self
 
@@ -545,7 +682,9 @@ class StockBit:
 
         return self.stockbit_api_client.get(url)
 
-    def stream_by_stock(self, stock: Stock) -> dict:
+    def stream_by_stock(
+        self, stock: Stock, last_stream_id: int = 0, limit: int = 20
+    ) -> dict:
         """
         Fetches the stream data for a given stock.
 
@@ -556,57 +695,243 @@ class StockBit:
         Parameters:
         - stock (Stock): An instance of the Stock class containing the ticker symbol
           for which the stream data is to be fetched.
+        - last_stream_id (int): Return posts older than this stream ID, 0 for the newest page.
+        - limit (int): Number of posts per page.
 
         Returns:
         - dict: A dictionary containing the response data from the HTTP POST request.
         """
         url = f"{self.base_url}/stream/v3/symbol/{stock.ticker}"
-        payload = {"category": "STREAM_CATEGORY_ALL", "last_stream_id": 0, "limit": 20}
-        return self.stockbit_api_client.post(url, payload)
+        payload = {
+            "category": "STREAM_CATEGORY_ALL",
+            "last_stream_id": last_stream_id,
+            "limit": limit,
+        }
+
+        # The newest page changes all the time, older pages are safe to cache
+        return self.stockbit_api_client.post(
+            url, payload, use_cache=last_stream_id != 0, subtrees=STREAM_SUBTREES
+        )
+
+    def _load_stream_cursors(self) -> dict:
+        """
+        Loads the per-ticker stream cursors saved by earlier runs.
+
+        A cursor has the `newest` stream ID stored and the `floor` up to which every post is
+        stored. Posts between `floor` and `resume_from` are still missing when an earlier run
+        hit `max_pages`, `resume_from` is absent when there is no gap.
+
+        Returns:
+        - dict: Ticker to cursor.
+        """
+        try:
+            with open(self.stream_cursor_path, "r") as file:
+                stream_cursors = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+        # Cursors saved as a single high-water mark
+        return {
+            ticker: (
+                {"newest": cursor, "floor": cursor}
+                if isinstance(cursor, int)
+                else cursor
+            )
+            for ticker, cursor in stream_cursors.items()
+        }
+
+    def save_stream_cursors(self):
+        """
+        Saves the stream cursors moved by `with_stream_data`.
+
+        Call it once the fetched posts are stored, e.g. after the sentiments are committed to
+        the database, otherwise a failed write would skip those posts in the next run.
+        """
+        if not self.stream_cursors:
+            return
+
+        stream_cursors = self._load_stream_cursors()
+        stream_cursors.update(self.stream_cursors)
+
+        tmp_path = f"{self.stream_cursor_path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(stream_cursors, file)
+        os.replace(tmp_path, self.stream_cursor_path)
+        self.stream_cursors = {}
+
+    @staticmethod
+    def _sentiment_from_stream(stream: dict) -> Sentiment:
+        return Sentiment(
+            content=stream["content"],
+            posted_at=datetime.fromisoformat(stream["created_at"]),
+            stream_id=int(stream.get("stream_id") or stream.get("id") or 0),
+        )
 
-    def with_stream_data(self):
+    @staticmethod
+    def _is_new_stream(
+        sentiment: Sentiment, high_water_mark: int, seen_stream_ids: set
+    ) -> bool:
+        """
+        Checks whether a post is newer than the high-water mark and not seen yet in this run.
+        Posts without a stream ID cannot be compared and are always kept.
+        """
+        if sentiment.stream_id == 0:
+            return True
+
+        if (
+            sentiment.stream_id <= high_water_mark
+            or sentiment.stream_id in seen_stream_ids
+        ):
+            return False
+
+        seen_stream_ids.add(sentiment.stream_id)
+        return True
+
+    def _walk_stream(
+        self,
+        stock: Stock,
+        last_stream_id: int,
+        stop_at: int,
+        max_pages: int,
+        limit: int,
+        seen_stream_ids: set,
+    ) -> tuple:
+        """
+        Walks the stream pages of a stock backwards, from `last_stream_id` down to `stop_at`.
+
+        Parameters:
+        - stock (Stock): The stock, new posts are appended to its sentiment.
+        - last_stream_id (int): Start below this stream ID, 0 for the newest post.
+        - stop_at (int): Stop at the first post with this stream ID or older.
+        - max_pages (int): Maximum number of pages fetched.
+        - limit (int): Number of posts per page.
+        - seen_stream_ids (set): Stream IDs already added in this run.
+
+        Returns:
+        - tuple: The newest and the oldest stream ID fetched (None if no post was fetched),
+          whether the walk reached `stop_at` or the end of the stream, and the number of
+          pages fetched.
+        """
+        newest_stream_id = None
+        oldest_stream_id = None
+        pages = 0
+        while pages < max_pages:
+            response_stream = self.stream_by_stock(stock, last_stream_id, limit)
+            pages += 1
+
+            if response_stream == {}:
+                # A failed page leaves the rest for a later run
+                return newest_stream_id, oldest_stream_id, False, pages
+
+            stream_data = response_stream["data"]["stream"] or []
+            page_stream_ids = []
+
+            for stream in stream_data:
+                sentiment = self._sentiment_from_stream(stream)
+                page_stream_ids.append(sentiment.stream_id)
+
+                # Everything from here on is stored already
+                if 0 < sentiment.stream_id <= stop_at:
+                    return newest_stream_id, oldest_stream_id, True, pages
+
+                if sentiment.stream_id:
+                    newest_stream_id = max(newest_stream_id or 0, sentiment.stream_id)
+                    oldest_stream_id = min(
+                        oldest_stream_id or sentiment.stream_id, sentiment.stream_id
+                    )
+                if self._is_new_stream(sentiment, stop_at, seen_stream_ids):
+                    stock.sentiment.append(sentiment)
+
+            # A short page is the last one, and pages cannot be walked past posts without IDs
+            if len(stream_data) < limit or 0 in page_stream_ids:
+                return newest_stream_id, oldest_stream_id, True, pages
+
+            last_stream_id = min(page_stream_ids)
+            time.sleep(self.request_delay)
+
+        return newest_stream_id, oldest_stream_id, False, pages
+
+    def with_stream_data(self, max_pages: int = 5, limit: int = 20):
         """
         Updates each stock in the stocks list with sentiment data from stream and pinned stream sources.
 
         This method iterates over each stock in the `stocks` list, fetching both pinned and regular stream data.
+        Stream pages are walked from the newest post backwards using `last_stream_id`, and stop at the
+        newest post stored by an earlier run, so later runs only fetch new posts. When `max_pages` runs
+        out first, the cursor remembers the oldest post fetched and later runs fill in the gap.
+        The moved cursors are only saved by `save_stream_cursors`, once the posts are stored.
         It processes the response to extract sentiment information, which is then added to the stock's sentiment attribute.
         The method pauses briefly between processing each stock to avoid overwhelming the server with requests.
 
+        Parameters:
+        - max_pages (int): Maximum number of pages fetched per stock.
+        - limit (int): Number of posts per page.
+
         Returns:
         - self: The instance of the class, allowing for method chaining.
         """
+        stream_cursors = self._load_stream_cursors()
+
         for stock in self.stocks:
+            cursor = stream_cursors.get(stock.ticker, {"newest": 0, "floor": 0})
+            newest = cursor["newest"]
+            floor = cursor["floor"]
+            resume_from = cursor.get("resume_from")
+            seen_stream_ids = set()
+            stock.sentiment = stock.sentiment or []
+            previous_posts = len(stock.sentiment)
+
             response_stream_pinned = self.stream_pinned_by_stock(stock)
-            response_stream = self.stream_by_stock(stock)
 
             if response_stream_pinned != {}:
                 pinned_data = response_stream_pinned["data"]
 
                 if pinned_data is not None:
-                    posted_at = datetime.fromisoformat(pinned_data["created_at"])
-                    sentiment = Sentiment(
-                        content=pinned_data["content"], posted_at=posted_at
-                    )
+                    sentiment = self._sentiment_from_stream(pinned_data)
 
-                    stock.sentiment = [sentiment]
+                    if self._is_new_stream(sentiment, floor, seen_stream_ids):
+                        stock.sentiment.append(sentiment)
 
-            if response_stream != {}:
-                stream_data = response_stream["data"]["stream"]
-
-                if stream_data is not None:
-                    for stream in stream_data:
-                        posted_at = datetime.fromisoformat(stream["created_at"])
-
-                        sentiment = Sentiment(
-                            content=stream["content"], posted_at=posted_at
-                        )
-
-                        if stock.sentiment is None:
-                            stock.sentiment = [sentiment]
-                        else:
-                            stock.sentiment.append(sentiment)
+            # New posts since the last run
+            newest_fetched, oldest_fetched, is_complete, pages = self._walk_stream(
+                stock, 0, newest, max_pages, limit, seen_stream_ids
+            )
+            # Posts older than the first run are not backfilled
+            if is_complete or stock.ticker not in stream_cursors:
+                if resume_from is None:
+                    floor = max(floor, newest_fetched or 0)
+            elif oldest_fetched is not None:
+                # The posts between the oldest fetched and the last run are missing now,
+                # the gap is widened down to the floor and refetched by later runs
+                resume_from = oldest_fetched
+            newest = max(newest, newest_fetched or 0)
+
+            # Posts a run before this one did not get to
+            if resume_from is not None and is_complete and pages < max_pages:
+                _, oldest_fetched, is_complete, _ = self._walk_stream(
+                    stock,
+                    resume_from,
+                    floor,
+                    max_pages - pages,
+                    limit,
+                    seen_stream_ids,
+                )
+                if is_complete:
+                    floor = newest
+                    resume_from = None
+                elif oldest_fetched is not None:
+                    resume_from = oldest_fetched
+
+            cursor = {"newest": newest, "floor": floor}
+            if resume_from is not None:
+                cursor["resume_from"] = resume_from
+            stream_cursors[stock.ticker] = self.stream_cursors[stock.ticker] = cursor
+
+            metrics.increment(
+                "stockbit_stream_posts_total", len(stock.sentiment) - previous_posts
+            )
 
-            time.sleep(0.1)
+            time.sleep(self.request_delay)
 
             logger.debug(stock)
 
@@ -616,7 +941,7 @@ class StockBit:
         """
         Fetch corporate action data for a given emmitent.
         """
-        url = f"https://exodus.stockbit.com/corpaction/{emmitent}?limit={limit}"
+        url = f"{self.base_url}/corpaction/{emmitent}?limit={limit}"
         headers = {
             "accept": "application/json",
             "authorization": "Bearer -aaaa",
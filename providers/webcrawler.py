@@ -1,31 +1,167 @@
 import asyncio
+import hashlib
+import json
+import os
+import time
+from urllib.parse import urlparse
 
 from crawl4ai import AsyncWebCrawler
 
 from schemas.sentiment import Sentiment
 from schemas.stock import Stock
+from utils.logger_config import logger
 
 
 class WebCrawler:
-    def __init__(self, stocks: [Stock], strategy: str = "basic"):
+    """
+    Crawls company home pages with one shared crawl4ai browser.
+
+    Pages are fetched concurrently up to `max_concurrency`, while requests to the same
+    domain are serialised and spaced by `domain_delay` seconds. Crawled markdown is
+    cached by URL together with its content hash, pages fetched within `cache_ttl`
+    seconds are served from the cache instead of being fetched again. A page fetched
+    again with the same content hash only renews its cache entry, the cached copy is
+    used as on a cache hit and nothing is rewritten.
+    """
+
+    def __init__(
+        self,
+        stocks: [Stock],
+        strategy: str = "basic",
+        max_concurrency: int = 5,
+        domain_delay: float = 1.0,
+        cache_dir: str = "crawl_cache",
+        cache_ttl: float = 24 * 60 * 60,
+    ):
         self.stocks = stocks
         self.strategy = strategy
+        self.max_concurrency = max_concurrency
+        self.domain_delay = domain_delay
+        self.cache_dir = cache_dir
+        self.cache_ttl = cache_ttl
+        self._domain_locks = {}
+        self._domain_last_request = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
 
     def process(self):
         asyncio.run(self.crawl())
 
     async def crawl(self):
-        for stock in self.stocks:
-            async with AsyncWebCrawler(verbose=True) as crawler:
-                result = await crawler.arun(url=stock.home_page)
-                print(result.markdown[:500])  # Print first 500 characters
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with AsyncWebCrawler(verbose=True) as crawler:
+            await asyncio.gather(
+                *(
+                    self._crawl_stock(crawler, semaphore, stock)
+                    for stock in self.stocks
+                    if stock.home_page
+                )
+            )
+
+    async def _crawl_stock(self, crawler, semaphore, stock: Stock):
+        """
+        Crawls the home page of a stock and attaches its markdown as a sentiment entry,
+        from the cache when the page was crawled within `cache_ttl` or did not change.
+        """
+        url = stock.home_page
+        cached = self._load_cache(url)
+
+        if cached and time.time() - cached["fetched_at"] < self.cache_ttl:
+            logger.debug(f"Using {url} from the cache, crawled {cached['fetched_at']}")
+            self._attach(stock, cached["markdown"])
+            return
+
+        # Waiting on a busy domain must not hold one of the concurrency slots
+        async with self._domain_lock(url):
+            await self._wait_for_domain(url)
+            async with semaphore:
+                try:
+                    result = await crawler.arun(url=url)
+                except Exception as e:
+                    logger.error(f"Failed to crawl {url}: {e}")
+                    return
+
+        if not result.success or not result.markdown:
+            logger.warning(f"No content crawled from {url}")
+            return
+
+        content_hash = hashlib.sha256(result.markdown.encode()).hexdigest()
+        if cached is not None and cached["content_hash"] == content_hash:
+            # Restart the TTL without rewriting the entry
+            logger.debug(f"Content of {url} is unchanged, keeping the cached copy")
+            self._touch_cache(url)
+            self._attach(stock, cached["markdown"])
+            return
+
+        self._save_cache(url, content_hash, result.markdown)
+        self._attach(stock, result.markdown)
+        logger.debug(f"Crawled {url}: {result.markdown[:500]}")
+
+    @staticmethod
+    def _attach(stock: Stock, markdown: str):
+        sentiment = Sentiment(content=markdown)
+        if stock.sentiment is None:
+            stock.sentiment = [sentiment]
+        else:
+            stock.sentiment.append(sentiment)
+
+    def _domain_lock(self, url: str) -> asyncio.Lock:
+        domain = urlparse(url).netloc
+        if domain not in self._domain_locks:
+            self._domain_locks[domain] = asyncio.Lock()
+        return self._domain_locks[domain]
+
+    async def _wait_for_domain(self, url: str):
+        """
+        Sleeps until `domain_delay` seconds have passed since the last request to the
+        same domain. Must be called while holding the domain lock.
+        """
+        domain = urlparse(url).netloc
+        elapsed = time.monotonic() - self._domain_last_request.get(domain, 0.0)
+        if elapsed < self.domain_delay:
+            await asyncio.sleep(self.domain_delay - elapsed)
+        self._domain_last_request[domain] = time.monotonic()
+
+    def _get_cache_filename(self, url: str) -> str:
+        hashed_url = hashlib.md5(url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{hashed_url}.json")
+
+    def _load_cache(self, url: str) -> dict | None:
+        cache_file = self._get_cache_filename(url)
+        if not os.path.exists(cache_file):
+            return None
+
+        try:
+            with open(cache_file, "r") as f:
+                cached = json.load(f)
+            # The modification time is when the page was last fetched, see `_touch_cache`
+            cached["fetched_at"] = os.path.getmtime(cache_file)
+            return cached
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Error loading cache from {cache_file}: {e}")
+            return None
 
-                if stock.sentiment is None:
-                    stock.sentiment = [
-                        Sentiment(url=stock.home_page, content=result.markdown)
-                    ]
+    def _save_cache(self, url: str, content_hash: str, markdown: str):
+        cache_file = self._get_cache_filename(url)
+        try:
+            with open(cache_file, "w") as f:
+                json.dump(
+                    {
+                        "url": url,
+                        "content_hash": content_hash,
+                        "markdown": markdown,
+                    },
+                    f,
+                )
+        except OSError as e:
+            logger.error(f"Error saving cache to {cache_file}: {e}")
 
-                print(stock)
+    def _touch_cache(self, url: str):
+        cache_file = self._get_cache_filename(url)
+        try:
+            os.utime(cache_file)
+        except OSError as e:
+            logger.error(f"Error renewing cache {cache_file}: {e}")
 
 
 if __name__ == "__main__":
@@ -1,8 +1,16 @@
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pandas as pd
 import yfinance as yf
 from pyrate_limiter import Limiter, RequestRate, Duration, MemoryQueueBucket
 from requests import Session
 from requests_cache import CacheMixin, SQLiteCache
-from requests_ratelimiter import LimiterMixin
+from requests_ratelimiter import LimiterMixin, LimiterSession
+
+from services.price_store import PriceStore, last_closed_session
+from utils.logger_config import logger
 
 
 class CachedLimiterSession(CacheMixin, LimiterMixin, Session):
@@ -10,7 +18,10 @@ class CachedLimiterSession(CacheMixin, LimiterMixin, Session):
 
 
 class YFinance:
-    def __init__(self):
+    # IDX listings are quoted on Yahoo Finance with the Jakarta suffix
+    SUFFIX = ".JK"
+
+    def __init__(self, price_store: PriceStore = None):
         self.yf = yf
         self.session = CachedLimiterSession(
             limiter=Limiter(
@@ -20,8 +31,127 @@ class YFinance:
             backend=SQLiteCache("yfinance.cache"),
         )
         self.session.headers["User-agent"] = "my-program/1.0"
+        # History downloads of the whole universe would take half an hour at the rate
+        # above, they get their own uncached session with a much looser limit
+        self.history_session = LimiterSession(
+            per_second=float(os.getenv("YFINANCE_HISTORY_RATE", "10")),
+            bucket_class=MemoryQueueBucket,
+        )
+        self.history_session.headers["User-agent"] = "my-program/1.0"
+        self.price_store = price_store or PriceStore()
 
     def close_price(self, stock):
         ticker = self.yf.Ticker(stock.ticker, session=self.session)
         hist = ticker.history(period="1d")
         return hist["Close"].iloc[-1]  # Get the last close price
+
+    def download_history(
+        self, stocks, start: date = None, chunk_size: int = 50
+    ) -> dict:
+        """
+        Downloads daily OHLCV history for many stocks and appends it to the price store.
+
+        Only the date range after the history already downloaded for each ticker is
+        requested, so the first run backfills history and later runs fetch a few days at
+        most. Snapshot bars stored in between do not count, they are overwritten by the
+        downloaded bars. The download ends at the last closed session, a bar of a session
+        still trading would be partial. A ticker Yahoo has no bars for is marked as
+        downloaded up to the last closed session too, so it is not requested again in
+        full on the next run.
+        Tickers sharing the same missing range are downloaded together in chunks of
+        `chunk_size`, with yfinance fanning the symbols out over threads on the history
+        session, limited to `YFINANCE_HISTORY_RATE` requests per second (10 by default).
+
+        Args:
+            stocks (list of Stock): Stocks to download.
+            start (date): First date to backfill for tickers not in the store yet.
+                Defaults to five years ago.
+            chunk_size (int): Number of tickers per download call.
+
+        Returns:
+            dict: Ticker to the number of bars appended.
+        """
+        end = last_closed_session()
+        start = start or end - timedelta(days=365 * 5)
+
+        # Group tickers by the first missing date, so each download covers one range
+        pending = defaultdict(list)
+        for stock in stocks:
+            history_end = self.price_store.history_end(stock.ticker)
+            first_missing = (
+                start if history_end is None else history_end + timedelta(days=1)
+            )
+            if first_missing <= end:
+                pending[first_missing].append(stock.ticker)
+
+        appended = {}
+        for first_missing, tickers in pending.items():
+            for i in range(0, len(tickers), chunk_size):
+                chunk = tickers[i : i + chunk_size]
+                logger.info(
+                    f"Downloading {len(chunk)} tickers from {first_missing} to {end}"
+                )
+
+                frame = self.yf.download(
+                    tickers=[f"{ticker}{self.SUFFIX}" for ticker in chunk],
+                    start=first_missing,
+                    end=end + timedelta(days=1),
+                    group_by="ticker",
+                    auto_adjust=False,
+                    actions=False,
+                    threads=True,
+                    progress=False,
+                    session=self.history_session,
+                )
+                # yfinance keeps the error of every failed symbol of the last download
+                errors = dict(getattr(self.yf.shared, "_ERRORS", {}))
+
+                for ticker in chunk:
+                    appended[ticker] = self._store_history(ticker, frame)
+                    error = errors.get(f"{ticker}{self.SUFFIX}")
+                    if appended[ticker] == 0 and (error is None or "delisted" in error):
+                        # Nothing to fetch in the range, a failed request is retried
+                        self.price_store.set_history_end(ticker, end)
+
+        return appended
+
+    def _store_history(self, ticker: str, frame: pd.DataFrame) -> int:
+        """
+        Extracts one ticker from a yfinance download frame and appends it to the store.
+
+        Args:
+            ticker (str): The stock ticker symbol, without suffix.
+            frame (pd.DataFrame): The frame returned by `yf.download`.
+
+        Returns:
+            int: The number of bars appended.
+        """
+        symbol = f"{ticker}{self.SUFFIX}"
+
+        if isinstance(frame.columns, pd.MultiIndex):
+            if symbol not in frame.columns.get_level_values(0):
+                logger.warning(f"No history returned for {symbol}")
+                return 0
+            history = frame[symbol]
+        else:
+            history = frame
+
+        history = history.dropna(subset=["Close"])
+        if history.empty:
+            return 0
+
+        index = pd.DatetimeIndex(history.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+
+        appended = self.price_store.append(
+            ticker,
+            dates=index.values,
+            open_=history["Open"].to_numpy(),
+            high=history["High"].to_numpy(),
+            low=history["Low"].to_numpy(),
+            close=history["Close"].to_numpy(),
+            volume=history["Volume"].to_numpy(),
+        )
+        self.price_store.set_history_end(ticker, index[-1].date())
+        return appended
@@ -1,9 +1,107 @@
-from dataclasses import asdict
+from copy import deepcopy
+from dataclasses import fields
+from operator import attrgetter
+from typing import get_args, get_origin
 
-from attr import dataclass
+# Schema class -> (field names, attrgetter over them), computed once per class
+_FIELDS = {}
+# Schema class -> ((field name, nested schema class, is list), ...) for `from_dict`
+_NESTED_FIELDS = {}
+
+
+def _deep_value(value):
+    """
+    Converts a field value for `to_dict(deep=True)`, recursing into schemas and
+    containers the way `dataclasses.asdict` does.
+    """
+    if isinstance(value, BaseDataClass):
+        return value.to_dict(deep=True)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_deep_value(item) for item in value)
+    if isinstance(value, dict):
+        return {_deep_value(key): _deep_value(item) for key, item in value.items()}
+    return deepcopy(value)
 
 
-@dataclass
 class BaseDataClass:
-    def to_dict(self):
-        return asdict(self)
+    # Schemas are slotted dataclasses, the base must be slotted too or every
+    # instance would still carry a __dict__
+    __slots__ = ()
+
+    @classmethod
+    def _fields(cls) -> tuple:
+        cached = _FIELDS.get(cls)
+        if cached is None:
+            names = tuple(
+                field.name
+                for field in fields(cls)
+                if field.metadata.get("serialize", True)
+            )
+            getter = attrgetter(*names)
+            # attrgetter over a single name returns the bare value
+            cached = _FIELDS[cls] = (
+                names,
+                getter if len(names) > 1 else lambda obj: (getter(obj),),
+            )
+        return cached
+
+    @classmethod
+    def field_names(cls) -> tuple:
+        """
+        Returns the names of the serialised fields, in declaration order.
+        """
+        return cls._fields()[0]
+
+    def to_tuple(self) -> tuple:
+        """
+        Returns the field values in `field_names` order, nested schemas left as is.
+        """
+        return self._fields()[1](self)
+
+    def to_dict(self, deep: bool = False) -> dict:
+        """
+        Returns the fields as a dict. The shallow export keeps nested schemas as
+        objects and copies nothing, `deep=True` recurses like `dataclasses.asdict`.
+        Both skip fields marked `serialize: False`, such as back-references.
+        """
+        names, getter = self._fields()
+        if deep:
+            return {
+                name: _deep_value(value) for name, value in zip(names, getter(self))
+            }
+
+        return dict(zip(names, getter(self)))
+
+    @classmethod
+    def _nested_fields(cls) -> tuple:
+        cached = _NESTED_FIELDS.get(cls)
+        if cached is None:
+            nested = []
+            for field in fields(cls):
+                field_type, is_list = field.type, False
+                if get_origin(field_type) is list:
+                    field_type, is_list = (get_args(field_type) or (None,))[0], True
+                if isinstance(field_type, type) and issubclass(
+                    field_type, BaseDataClass
+                ):
+                    nested.append((field.name, field_type, is_list))
+            cached = _NESTED_FIELDS[cls] = tuple(nested)
+        return cached
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """
+        Builds a schema from a dict of its fields, such as a decoded `to_json` or
+        `to_msgpack` payload, rebuilding nested schemas and lists of them.
+        """
+        data = {name: data[name] for name in cls.field_names() if name in data}
+        for name, schema, is_list in cls._nested_fields():
+            value = data.get(name)
+            if value is None:
+                continue
+            data[name] = (
+                [schema.from_dict(item) for item in value]
+                if is_list
+                else schema.from_dict(value)
+            )
+        return cls(**data)
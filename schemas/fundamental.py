@@ -1,9 +1,13 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
 
 from schemas import BaseDataClass
 
+if TYPE_CHECKING:
+    from schemas.stock import Stock
 
-@dataclass
+
+@dataclass(slots=True)
 class CurrentValuation(BaseDataClass):
     current_pe_ratio_annual: float = 0.0
     current_pe_ratio_ttm: float = 0.0
@@ -21,7 +25,7 @@ class CurrentValuation(BaseDataClass):
     peg_forward: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class PerShare(BaseDataClass):
     current_eps_ttm: float = 0
     current_eps_annualised: float = 0
@@ -31,7 +35,7 @@ class PerShare(BaseDataClass):
     free_cashflow_per_share_ttm: float = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class Solvency(BaseDataClass):
     current_ratio_quarter: float = 0
     quick_ratio_quarter: float = 0
@@ -45,7 +49,7 @@ class Solvency(BaseDataClass):
     altman_z_score_modified: float = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class ManagementEffectiveness(BaseDataClass):
     return_on_assets_ttm: float = 0
     return_on_equity_ttm: float = 0
@@ -60,21 +64,21 @@ class ManagementEffectiveness(BaseDataClass):
     inventory_turnover_ttm: float = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class Profitability(BaseDataClass):
     gross_profit_margin_quarter: float = 0.0
     operating_profit_margin_quarter: float = 0.0
     net_profit_margin_quarter: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class Growth(BaseDataClass):
     revenue_quarter_yoy_growth: float = 0.0
     gross_profit_quarter_yoy_growth: float = 0.0
     net_income_quarter_yoy_growth: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class Dividend(BaseDataClass):
     dividend: float = 0.0
     dividend_ttm: float = 0.0
@@ -83,7 +87,7 @@ class Dividend(BaseDataClass):
     latest_dividend_ex_date: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class MarketRank(BaseDataClass):
     piotroski_f_score: float = 0.0
     eps_rating: float = 0.0
@@ -96,7 +100,7 @@ class MarketRank(BaseDataClass):
     rank_near_52_weeks_high: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class IncomeStatement(BaseDataClass):
     revenue_ttm: float = 0.0
     gross_profit_ttm: float = 0.0
@@ -104,7 +108,7 @@ class IncomeStatement(BaseDataClass):
     net_income_ttm: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class BalanceSheet(BaseDataClass):
     cash_quarter: float = 0.0
     total_assets_quarter: float = 0.0
@@ -117,7 +121,7 @@ class BalanceSheet(BaseDataClass):
     net_debt_quarter: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class CashFlowStatement(BaseDataClass):
     cash_from_operations_ttm: float = 0.0
     cash_from_investing_ttm: float = 0.0
@@ -126,7 +130,7 @@ class CashFlowStatement(BaseDataClass):
     free_cash_flow_ttm: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class PricePerformance(BaseDataClass):
     one_week_price_returns: float = 0.0
     three_month_price_returns: float = 0.0
@@ -141,25 +145,32 @@ class PricePerformance(BaseDataClass):
     fifty_two_week_low: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class Stat(BaseDataClass):
     current_share_outstanding: float = 0.0
     market_cap: float = 0.0
     enterprise_value: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class Fundamental(BaseDataClass):
-    stat: Stat = Stat
-    current_valuation: CurrentValuation = CurrentValuation
-    per_share: PerShare = PerShare
-    solvency: Solvency = Solvency
-    management_effectiveness: ManagementEffectiveness = ManagementEffectiveness
-    profitability: Profitability = Profitability
-    growth: Growth = Growth
-    dividend: Dividend = Dividend
-    market_rank: MarketRank = MarketRank
-    income_statement: IncomeStatement = IncomeStatement
-    balance_sheet: BalanceSheet = BalanceSheet
-    cash_flow_statement: CashFlowStatement = CashFlowStatement
-    price_performance: PricePerformance = PricePerformance
+    stat: Stat = field(default_factory=Stat)
+    current_valuation: CurrentValuation = field(default_factory=CurrentValuation)
+    per_share: PerShare = field(default_factory=PerShare)
+    solvency: Solvency = field(default_factory=Solvency)
+    management_effectiveness: ManagementEffectiveness = field(
+        default_factory=ManagementEffectiveness
+    )
+    profitability: Profitability = field(default_factory=Profitability)
+    growth: Growth = field(default_factory=Growth)
+    dividend: Dividend = field(default_factory=Dividend)
+    market_rank: MarketRank = field(default_factory=MarketRank)
+    income_statement: IncomeStatement = field(default_factory=IncomeStatement)
+    balance_sheet: BalanceSheet = field(default_factory=BalanceSheet)
+    cash_flow_statement: CashFlowStatement = field(default_factory=CashFlowStatement)
+    price_performance: PricePerformance = field(default_factory=PricePerformance)
+    # The stock the fundamentals belong to, left out of repr, comparison and
+    # serialisation as it points back to the owning Stock
+    stock: "Stock" = field(
+        default=None, repr=False, compare=False, metadata={"serialize": False}
+    )
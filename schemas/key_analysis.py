@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from schemas import BaseDataClass
 
 
-@dataclass
+@dataclass(slots=True)
 class KeyAnalysis(BaseDataClass):
     normal_price: float = 0.0
     price_to_equity_discount: float = 0.0
@@ -4,9 +4,10 @@ from datetime import datetime
 from schemas import BaseDataClass
 
 
-@dataclass
+@dataclass(slots=True)
 class Sentiment(BaseDataClass):
     content: str = ""
     rate: float = 0.0
     category: str = ""
     posted_at: datetime = None
+    stream_id: int = 0
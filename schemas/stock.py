@@ -6,9 +6,10 @@ from schemas.fundamental import Fundamental
 from schemas.key_analysis import KeyAnalysis
 from schemas.sentiment import Sentiment
 from schemas.stock_price import StockPrice
+from schemas.technical import Technical
 
 
-@dataclass
+@dataclass(slots=True)
 class Stock(BaseDataClass):
     ticker: str
     name: str = ""
@@ -20,3 +21,5 @@ class Stock(BaseDataClass):
     sentiment: List[Sentiment] = None
     fundamental: Fundamental = None
     key_analysis: KeyAnalysis = None
+    technical: Technical = None
+    corp_actions: List[dict] = None
@@ -3,7 +3,7 @@ from dataclasses import dataclass
 from schemas import BaseDataClass
 
 
-@dataclass
+@dataclass(slots=True)
 class StockPrice(BaseDataClass):
     price: float = 0.0
     volume: int = 0
@@ -0,0 +1,16 @@
+from dataclasses import dataclass
+
+from schemas import BaseDataClass
+
+
+@dataclass(slots=True)
+class Technical(BaseDataClass):
+    sma_50: float = None
+    sma_200: float = None
+    ema_20: float = None
+    rsi_14: float = None
+    atr_14: float = None
+    volatility_20: float = None
+    distance_52_week_high: float = None
+    distance_52_week_low: float = None
+    volume_z_score: float = None
@@ -0,0 +1,103 @@
+import os
+from datetime import date, datetime
+
+from schemas.stock import Stock
+from utils.logger_config import logger
+from utils.serialization import from_msgpack, to_msgpack
+
+
+class Checkpoint:
+    """
+    Saves the stock list after each pipeline stage, so a failed run resumes from the
+    last completed stage instead of fetching everything again.
+
+    Checkpoints are msgpack files in `<directory>/<run date>/<stage>.msgpack`, written
+    through a temporary file so a crash never leaves a truncated checkpoint behind.
+    """
+
+    def __init__(self, directory: str = "checkpoints", run_date: date = None):
+        """
+        Initializes the checkpoint store of a run.
+
+        Args:
+            directory (str): Root directory of the checkpoints.
+            run_date (date): Day of the run, today by default. Only checkpoints of
+                the same day are resumed.
+        """
+        self.directory = os.path.join(directory, (run_date or date.today()).isoformat())
+
+    def path(self, stage: str) -> str:
+        return os.path.join(self.directory, f"{stage}.msgpack")
+
+    def exists(self, stage: str) -> bool:
+        return os.path.exists(self.path(stage))
+
+    def save(self, stage: str, stocks: [Stock]):
+        """
+        Writes the stock list as it is after a stage.
+
+        Args:
+            stage (str): Name of the completed stage.
+            stocks (list of Stock): The enriched stocks, or snapshots of them holding only
+                the ticker and the fields the stage filled in.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(stage)
+        payload = to_msgpack(
+            {
+                "stage": stage,
+                "created_at": datetime.now(),
+                "stocks": stocks,
+            }
+        )
+        with open(f"{path}.tmp", "wb") as file:
+            file.write(payload)
+        os.replace(f"{path}.tmp", path)
+        logger.info(f"Checkpoint {stage} saved in {path} ({len(stocks)} stocks)")
+
+    def load(self, stage: str) -> [Stock]:
+        """
+        Reads the stock list saved after a stage.
+
+        Args:
+            stage (str): Name of the completed stage.
+
+        Returns:
+            list of Stock: The stocks, with the Fundamental.stock back references restored.
+
+        Raises:
+            FileNotFoundError: If the stage has no checkpoint for this run date.
+        """
+        with open(self.path(stage), "rb") as file:
+            payload = from_msgpack(file.read())
+
+        stocks = [Stock.from_dict(stock) for stock in payload["stocks"]]
+        for stock in stocks:
+            if stock.fundamental is not None:
+                stock.fundamental.stock = stock
+
+        logger.info(
+            f"Checkpoint {stage} of {payload['created_at']} loaded ({len(stocks)} stocks)"
+        )
+        return stocks
+
+    def load_latest(self, stages: [str]) -> tuple[str, list[Stock]]:
+        """
+        Reads the checkpoint of the last stage in `stages` that has one.
+
+        Args:
+            stages (list of str): Completed stages, in pipeline order.
+
+        Returns:
+            tuple: The stage name and its stocks.
+
+        Raises:
+            FileNotFoundError: If none of the stages has a checkpoint for this run date.
+        """
+        for stage in reversed(stages):
+            if self.exists(stage):
+                return stage, self.load(stage)
+
+        raise FileNotFoundError(
+            f"No checkpoint of {', '.join(stages)} in {self.directory}"
+        )
@@ -1,14 +1,29 @@
+import hashlib
 import json
 import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
 
 from dotenv import load_dotenv
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 
 from utils.helpers import get_sheet_range
+from utils.logger_config import logger
 
 load_dotenv()
 
+# Sheet created along with every new spreadsheet
+DEFAULT_SHEET_TITLE = "Sheet1"
+
+# Status codes worth retrying: rate limited or a transient server error
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
 
 class GoogleDriveService:
     """
@@ -30,11 +45,41 @@ class GoogleDriveService:
 
     add_sheet(sheet_id: str, sheet_title: str):
         Adds a new sheet to an existing Google Sheets spreadsheet.
+
+    add_drive_permissions(file_id: str, emails: list):
+        Adds write permission for several email addresses in one batched HTTP request.
+
+    batch_insert_data(sheet_id: str, sheets: dict):
+        Creates missing sheets, removes the default sheet and writes every sheet with as few round trips
+        as possible.
+
+    insert_data_chunked(sheet_id: str, sheet_title: str, values: iterable):
+        Streams a large sheet in bounded row blocks, concurrently, with retries and resume.
+
+    update_changed_data(sheet_id: str, sheets: dict) -> int:
+        Writes only the rows that changed since the last publish to an existing spreadsheet.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        chunk_rows: int = 2000,
+        max_workers: int = 4,
+        max_retries: int = 5,
+        upload_state_dir: str = "sheets_upload",
+    ):
         """
         Initializes the GoogleDriveService with credentials from environment variables.
+
+        Parameters
+        ----------
+        chunk_rows : int
+            Sheets with more rows than this are written in blocks of this many rows.
+        max_workers : int
+            Number of blocks written concurrently.
+        max_retries : int
+            Number of retries of a failed block write.
+        upload_state_dir : str
+            Directory holding the committed blocks of interrupted uploads.
         """
         service_account_info = json.loads(os.getenv("GOOGLE_SERVICE_ACCOUNT"))
         self.creds = service_account.Credentials.from_service_account_info(
@@ -43,6 +88,18 @@ class GoogleDriveService:
         self.sheet_service = build("sheets", "v4", credentials=self.creds)
         self.drive_service = build("drive", "v3", credentials=self.creds)
 
+        # Spreadsheet ID -> {sheet title: sheet ID}, saves a `spreadsheets().get` per write
+        self._sheets = {}
+        # Spreadsheet ID -> {sheet title: (row count, column count)} of the sheet grids
+        self._grids = {}
+
+        self.chunk_rows = chunk_rows
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.upload_state_dir = upload_state_dir
+        # googleapiclient services are not thread-safe, each upload thread builds its own
+        self._thread_local = threading.local()
+
     def create_spreadsheet(self, title="My New Spreadsheet") -> str:
         """
         Creates a new Google Sheets spreadsheet with the given title.
@@ -61,10 +118,57 @@ class GoogleDriveService:
 
         spreadsheet = (
             self.sheet_service.spreadsheets()
-            .create(body=spreadsheet, fields="spreadsheetId")
+            .create(body=spreadsheet, fields="spreadsheetId,sheets.properties")
             .execute()
         )
-        return spreadsheet.get("spreadsheetId")
+        spreadsheet_id = spreadsheet.get("spreadsheetId")
+        self._sheets[spreadsheet_id] = self._sheet_ids(spreadsheet)
+        self._grids[spreadsheet_id] = self._grid_sizes(spreadsheet)
+
+        return spreadsheet_id
+
+    @staticmethod
+    def _sheet_ids(spreadsheet: dict) -> dict:
+        return {
+            sheet["properties"]["title"]: sheet["properties"]["sheetId"]
+            for sheet in spreadsheet.get("sheets", [])
+        }
+
+    @staticmethod
+    def _grid_sizes(spreadsheet: dict) -> dict:
+        grids = {}
+        for sheet in spreadsheet.get("sheets", []):
+            grid = sheet["properties"].get("gridProperties", {})
+            grids[sheet["properties"]["title"]] = (
+                grid.get("rowCount", 0),
+                grid.get("columnCount", 0),
+            )
+        return grids
+
+    def get_sheets(self, sheet_id: str) -> dict:
+        """
+        Returns the sheets of a spreadsheet, fetched once and then served from the local cache.
+
+        Parameters
+        ----------
+        sheet_id : str
+            The ID of the Google Sheets spreadsheet.
+
+        Returns
+        -------
+        dict
+            Sheet title to sheet ID.
+        """
+        if sheet_id not in self._sheets:
+            spreadsheet = (
+                self.sheet_service.spreadsheets()
+                .get(spreadsheetId=sheet_id, fields="sheets.properties")
+                .execute()
+            )
+            self._sheets[sheet_id] = self._sheet_ids(spreadsheet)
+            self._grids[sheet_id] = self._grid_sizes(spreadsheet)
+
+        return self._sheets[sheet_id]
 
     def add_drive_permission(self, file_id: str, email: str):
         """
@@ -87,6 +191,38 @@ class GoogleDriveService:
             fileId=file_id, body=permission, sendNotificationEmail=False
         ).execute()
 
+    def add_drive_permissions(self, file_id: str, emails: []):
+        """
+        Adds write permission to a Google Drive file for several email addresses in one batched HTTP request.
+
+        Parameters
+        ----------
+        file_id : str
+            The ID of the Google Drive file.
+        emails : list
+            The email addresses to grant write permission to.
+        """
+
+        def callback(request_id, _response, exception):
+            if exception is not None:
+                logger.error(f"Failed to add permission for {request_id}: {exception}")
+
+        batch = self.drive_service.new_batch_http_request(callback=callback)
+        for email in emails:
+            permission = {
+                "type": "user",
+                "role": "writer",
+                "emailAddress": email,
+            }
+            batch.add(
+                self.drive_service.permissions().create(
+                    fileId=file_id, body=permission, sendNotificationEmail=False
+                ),
+                request_id=email,
+            )
+
+        batch.execute()
+
     def insert_data(self, sheet_id: str, sheet_title: str, values: []):
         """
         Inserts data into a specified sheet within a Google Sheets spreadsheet.
@@ -100,13 +236,7 @@ class GoogleDriveService:
         values : list
             The data to be inserted into the sheet.
         """
-        sheets = (
-            self.sheet_service.spreadsheets()
-            .get(spreadsheetId=sheet_id)
-            .execute()
-            .get("sheets", [])
-        )
-        sheet_titles = [sheet["properties"]["title"] for sheet in sheets]
+        sheet_titles = list(self.get_sheets(sheet_id))
 
         if sheet_title not in sheet_titles:
             self.add_sheet(sheet_id, sheet_title)
@@ -133,17 +263,554 @@ class GoogleDriveService:
             The title of the new sheet to be added.
         """
         requests = [{"addSheet": {"properties": {"title": sheet_title}}}]
-        body = {"requests": requests}
-        self.sheet_service.spreadsheets().batchUpdate(
-            spreadsheetId=sheet_id, body=body
-        ).execute()
+        self._batch_update(sheet_id, requests)
 
     def clean_first_sheet(self, sheet_titles, sheet_id):
         for sheet_title in sheet_titles:
-            if sheet_title == "Sheet1":
-                requests = [{"deleteSheet": {"sheetId": 0}}]
-                body = {"requests": requests}
+            if sheet_title == DEFAULT_SHEET_TITLE:
+                requests = [
+                    {
+                        "deleteSheet": {
+                            "sheetId": self.get_sheets(sheet_id)[DEFAULT_SHEET_TITLE]
+                        }
+                    }
+                ]
+                self._batch_update(sheet_id, requests)
+
+    def _batch_update(self, sheet_id: str, requests: []):
+        """
+        Sends structural requests in one `spreadsheets.batchUpdate` call and refreshes the sheet cache
+        from the replies, so no extra `spreadsheets().get` is needed afterwards.
+
+        Parameters
+        ----------
+        sheet_id : str
+            The ID of the Google Sheets spreadsheet.
+        requests : list
+            The batchUpdate requests.
+        """
+        response = (
+            self.sheet_service.spreadsheets()
+            .batchUpdate(spreadsheetId=sheet_id, body={"requests": requests})
+            .execute()
+        )
+
+        sheets = self.get_sheets(sheet_id)
+        grids = self._grids.setdefault(sheet_id, {})
+        for request, reply in zip(requests, response.get("replies", [])):
+            if "addSheet" in request:
+                properties = reply["addSheet"]["properties"]
+                sheets[properties["title"]] = properties["sheetId"]
+                grid = properties.get(
+                    "gridProperties",
+                    request["addSheet"]["properties"]["gridProperties"],
+                )
+                grids[properties["title"]] = (grid["rowCount"], grid["columnCount"])
+            elif "updateSheetProperties" in request:
+                properties = request["updateSheetProperties"]["properties"]
+                for title, sheet in sheets.items():
+                    if sheet == properties["sheetId"]:
+                        grid = properties["gridProperties"]
+                        grids[title] = (grid["rowCount"], grid["columnCount"])
+            elif "deleteSheet" in request:
+                deleted = request["deleteSheet"]["sheetId"]
+                for title, sheet in list(sheets.items()):
+                    if sheet == deleted:
+                        del sheets[title]
+                        grids.pop(title, None)
+
+    def batch_insert_data(self, sheet_id: str, sheets: dict):
+        """
+        Writes several sheets with as few round trips as possible: one `spreadsheets.batchUpdate` that adds
+        the missing sheets and deletes the default `Sheet1`, one `values.batchUpdate` with every sheet of at
+        most `chunk_rows` rows, and the larger sheets streamed through the chunked uploader.
+
+        Parameters
+        ----------
+        sheet_id : str
+            The ID of the Google Sheets spreadsheet.
+        sheets : dict
+            Sheet title to the rows to write into it, any iterable. At most `chunk_rows` + 1 rows of a
+            sheet are read ahead, a larger sheet is consumed one block at a time.
+
+        Returns
+        -------
+        dict
+            Sheet title to the number of rows written.
+        """
+        heads = {}
+        tails = {}
+        for title, values in sheets.items():
+            tails[title] = iter(values)
+            heads[title] = list(islice(tails[title], self.chunk_rows + 1))
+
+        self._prepare_sheets(
+            sheet_id,
+            {
+                title: self._grid_properties(len(head), self._width(head))
+                for title, head in heads.items()
+            },
+        )
+
+        # Small sheets share as few requests as possible, large ones go through the chunked uploader
+        data = [
+            {
+                "range": f"{title}!{get_sheet_range(self._width(head), len(head))}",
+                "values": head,
+            }
+            for title, head in heads.items()
+            if head and len(head) <= self.chunk_rows
+        ]
+        self._batch_update_values(sheet_id, data)
+
+        written = {title: len(head) for title, head in heads.items()}
+        for title, head in heads.items():
+            if len(head) > self.chunk_rows:
+                written[title] = self.insert_data_chunked(
+                    sheet_id, title, chain(head, tails[title])
+                )
+        return written
+
+    def _prepare_sheets(self, sheet_id: str, grids: dict, grow_only: bool = True):
+        """
+        Adds the missing sheets, sizes every sheet grid and deletes the default `Sheet1`, all in one
+        `spreadsheets.batchUpdate`. Nothing is sent when every sheet already has its size.
+
+        Parameters
+        ----------
+        sheet_id : str
+            The ID of the Google Sheets spreadsheet.
+        grids : dict
+            Sheet title to its `gridProperties`.
+        grow_only : bool
+            Only grow the existing grids, shrinking one deletes the rows and columns cut off.
+        """
+        existing = self.get_sheets(sheet_id)
+        sizes = self._grids.get(sheet_id, {})
+
+        requests = []
+        for title, grid in grids.items():
+            if title not in existing:
+                requests.append(
+                    {
+                        "addSheet": {
+                            "properties": {"title": title, "gridProperties": grid}
+                        }
+                    }
+                )
+                continue
+
+            row_count, column_count = sizes.get(title, (0, 0))
+            if grow_only:
+                grid = {
+                    "rowCount": max(grid["rowCount"], row_count),
+                    "columnCount": max(grid["columnCount"], column_count),
+                }
+            if (grid["rowCount"], grid["columnCount"]) != (row_count, column_count):
+                requests.append(
+                    {
+                        "updateSheetProperties": {
+                            "properties": {
+                                "sheetId": existing[title],
+                                "gridProperties": grid,
+                            },
+                            "fields": "gridProperties(rowCount,columnCount)",
+                        }
+                    }
+                )
+        # A spreadsheet must keep one sheet, so the default one goes after the others exist
+        if DEFAULT_SHEET_TITLE in existing and DEFAULT_SHEET_TITLE not in grids:
+            requests.append({"deleteSheet": {"sheetId": existing[DEFAULT_SHEET_TITLE]}})
+
+        if requests:
+            self._batch_update(sheet_id, requests)
+
+    def _ensure_grid(self, sheet_id: str, sheet_title: str, rows: int, columns: int):
+        """
+        Grows a sheet grid to hold at least `rows` x `columns` cells. The rows are at least doubled, so a
+        sheet streamed block by block is only resized a few times.
+        """
+        row_count, column_count = self._grids.get(sheet_id, {}).get(sheet_title, (0, 0))
+        if rows <= row_count and columns <= column_count:
+            return
+        self._prepare_sheets(
+            sheet_id,
+            {
+                sheet_title: {
+                    "rowCount": max(rows, 2 * row_count),
+                    "columnCount": max(columns, column_count),
+                }
+            },
+        )
+
+    def update_changed_data(
+        self, sheet_id: str, sheets: dict, cache_dir: str = "spreadsheet_cache"
+    ) -> int:
+        """
+        Updates an existing spreadsheet with only the rows that changed since the last publish.
+
+        The values last published to every sheet are kept in `<cache_dir>/<sheet_id>/<title>.json`.
+        New rows are read one block of `chunk_rows` rows at a time and compared with the cached ones,
+        every run of consecutive changed rows is sent as ranges grouped into `values.batchUpdate` calls
+        of at most `chunk_rows` rows each. A changed row narrower than before is padded with empty cells,
+        so its old trailing cells do not linger. Rows left over from a longer previous publish are blanked
+        with one `values.batchClear`. The grids only grow while rows are written, and are cut to the new
+        size after the clear, so the cleared range still exists. A sheet without a cached copy is
+        written in full, through the chunked uploader when it is larger than `chunk_rows`.
+
+        Parameters
+        ----------
+        sheet_id : str
+            The ID of the Google Sheets spreadsheet.
+        sheets : dict
+            Sheet title to the rows to write into it, any iterable.
+        cache_dir : str
+            Directory of the locally cached published values.
+
+        Returns
+        -------
+        int
+            The number of rows written.
+        """
+        spreadsheet_cache_dir = os.path.join(cache_dir, sheet_id)
+        os.makedirs(spreadsheet_cache_dir, exist_ok=True)
+
+        previous = {}
+        heads = {}
+        tails = {}
+        for title, values in sheets.items():
+            cache_path = os.path.join(spreadsheet_cache_dir, f"{title}.json")
+            previous[title] = self._load_json(cache_path) or []
+            tails[title] = map(self._published_row, values)
+            heads[title] = list(islice(tails[title], self.chunk_rows + 1))
+
+        self._prepare_sheets(
+            sheet_id,
+            {
+                title: self._grid_properties(
+                    max(len(previous[title]), len(head)),
+                    max(self._width(previous[title]), self._width(head)),
+                )
+                for title, head in heads.items()
+            },
+        )
+
+        data = []
+        data_rows = 0
+        written_rows = 0
+        sizes = {}
+        for title, head in heads.items():
+            stats = sizes[title] = {"rows": 0, "columns": 0}
+            with open(
+                os.path.join(spreadsheet_cache_dir, f"{title}.json.tmp"), "w"
+            ) as cache_file:
+                # The new cache is written while the rows stream by, not built in memory
+                values = self._cached_rows(chain(head, tails[title]), cache_file, stats)
+                if not previous[title] and len(head) > self.chunk_rows:
+                    written_rows += self.insert_data_chunked(sheet_id, title, values)
+                    continue
+
+                offset = 0
+                while block := list(islice(values, self.chunk_rows)):
+                    self._ensure_grid(
+                        sheet_id, title, offset + len(block), self._width(block)
+                    )
+                    for start, rows in self._changed_row_runs(
+                        previous[title], block, offset
+                    ):
+                        rows = [
+                            self._padded_row(row, previous[title], start + i)
+                            for i, row in enumerate(rows)
+                        ]
+                        range_name = get_sheet_range(
+                            self._width(rows), len(rows), start + 1
+                        )
+                        data.append({"range": f"{title}!{range_name}", "values": rows})
+                        data_rows += len(rows)
+                    offset += len(block)
+
+                    if data_rows >= self.chunk_rows:
+                        self._batch_update_values(sheet_id, data)
+                        written_rows += data_rows
+                        data, data_rows = [], 0
+        self._batch_update_values(sheet_id, data)
+        updated_rows = written_rows + data_rows
+
+        clear_ranges = []
+        for title, stats in sizes.items():
+            leftover = previous[title][stats["rows"] :]
+            if leftover:
+                range_name = get_sheet_range(
+                    self._width(leftover) or 1, len(leftover), stats["rows"] + 1
+                )
+                clear_ranges.append(f"{title}!{range_name}")
+        # Shrinking a grid deletes its rows, a clear of them afterwards would be out of range
+        if clear_ranges:
+            self._execute_with_retry(
+                lambda: self.sheet_service.spreadsheets()
+                .values()
+                .batchClear(spreadsheetId=sheet_id, body={"ranges": clear_ranges}),
+                f"clear of {len(clear_ranges)} ranges",
+            )
+        self._prepare_sheets(
+            sheet_id,
+            {
+                title: self._grid_properties(stats["rows"], stats["columns"])
+                for title, stats in sizes.items()
+            },
+            grow_only=False,
+        )
+
+        # The cache only moves forward once the spreadsheet holds the new values
+        for title in sizes:
+            cache_path = os.path.join(spreadsheet_cache_dir, f"{title}.json")
+            os.replace(f"{cache_path}.tmp", cache_path)
+
+        logger.info(f"Updated {updated_rows} rows, cleared {len(clear_ranges)} ranges")
+        return updated_rows
+
+    @staticmethod
+    def _published_row(row) -> []:
+        """
+        Converts a row to the JSON form the API receives and the cache holds, e.g. tuples become lists.
+        The API leaves the cell of a null untouched, so None becomes an empty string to blank it.
+        """
+        return [
+            "" if value is None else value
+            for value in json.loads(json.dumps(row, default=str))
+        ]
+
+    @staticmethod
+    def _cached_rows(values, cache_file, stats: dict):
+        """
+        Yields the rows while writing them to `cache_file` as one JSON array, and counts them and the
+        widest row in `stats`.
+        """
+        cache_file.write("[")
+        for row in values:
+            if stats["rows"]:
+                cache_file.write(",")
+            json.dump(row, cache_file)
+            stats["rows"] += 1
+            stats["columns"] = max(stats["columns"], len(row))
+            yield row
+        cache_file.write("]")
+
+    def _batch_update_values(self, sheet_id: str, data: []):
+        """
+        Writes ranges with `values.batchUpdate` calls of at most `chunk_rows` rows each, at most
+        `max_workers` calls in flight, every call retried on its own.
+
+        Parameters
+        ----------
+        sheet_id : str
+            The ID of the Google Sheets spreadsheet.
+        data : list
+            The ranges, dicts with the A1 `range` and its `values`.
+        """
+        batches = []
+        batch_rows = 0
+        for entry in data:
+            if not batches or batch_rows + len(entry["values"]) > self.chunk_rows:
+                batches.append([])
+                batch_rows = 0
+            batches[-1].append(entry)
+            batch_rows += len(entry["values"])
+
+        def upload(batch):
+            self._execute_with_retry(
+                lambda: self._thread_sheet_service()
+                .spreadsheets()
+                .values()
+                .batchUpdate(
+                    spreadsheetId=sheet_id,
+                    body={"valueInputOption": "RAW", "data": batch},
+                ),
+                f"update of {len(batch)} ranges",
+            )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            # list() re-raises the first failed call once the others finished
+            list(executor.map(upload, batches))
+
+    @staticmethod
+    def _padded_row(row: [], previous: [], index: int) -> []:
+        """
+        Pads a row with empty cells to the width of the row published before at the same index.
+        """
+        if index >= len(previous) or len(previous[index]) <= len(row):
+            return row
+        return row + [""] * (len(previous[index]) - len(row))
+
+    @staticmethod
+    def _changed_row_runs(previous: [], values: [], offset: int = 0):
+        """
+        Yields (first row index, rows) for every run of consecutive rows that differ from `previous`,
+        `values` being the rows from index `offset` on.
+        """
+        start = None
+        for i, row in enumerate(values):
+            is_changed = offset + i >= len(previous) or previous[offset + i] != row
+            if is_changed and start is None:
+                start = i
+            elif not is_changed and start is not None:
+                yield offset + start, values[start:i]
+                start = None
+
+        if start is not None:
+            yield offset + start, values[start:]
+
+    @staticmethod
+    def _grid_properties(rows: int, columns: int) -> dict:
+        """
+        Sizes a sheet grid to fit `rows` x `columns` cells, never below the default 1000 x 26 grid.
+        """
+        return {"rowCount": max(rows, 1000), "columnCount": max(columns, 26)}
+
+    @staticmethod
+    def _width(rows: []) -> int:
+        return max((len(row) for row in rows), default=0)
+
+    def _thread_sheet_service(self):
+        if not hasattr(self._thread_local, "sheet_service"):
+            self._thread_local.sheet_service = build(
+                "sheets", "v4", credentials=self.creds, cache_discovery=False
+            )
+        return self._thread_local.sheet_service
+
+    def _upload_state_path(self, sheet_id: str, sheet_title: str) -> str:
+        return os.path.join(self.upload_state_dir, f"{sheet_id}-{sheet_title}.json")
+
+    def _load_json(self, path: str) -> dict:
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _execute_with_retry(self, request_factory, description: str):
+        """
+        Executes a request, retrying rate limits, server errors and connection errors with
+        exponential backoff and jitter.
+
+        Parameters
+        ----------
+        request_factory : callable
+            Builds the request to execute, called again for every attempt.
+        description : str
+            Request description for the logs.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return request_factory().execute()
+            except HttpError as e:
+                if e.resp.status not in RETRYABLE_STATUS_CODES:
+                    raise
+                error = e
+            except (ConnectionError, TimeoutError, OSError) as e:
+                error = e
+
+            if attempt == self.max_retries:
+                raise error
+
+            delay = min(2**attempt, 32) + random.random()
+            logger.warning(
+                f"Retrying {description} in {delay:.1f}s "
+                f"({attempt + 1}/{self.max_retries}): {error}"
+            )
+            time.sleep(delay)
+
+    def insert_data_chunked(self, sheet_id: str, sheet_title: str, values) -> int:
+        """
+        Streams a sheet in blocks of `chunk_rows` rows with at most `max_workers` blocks in flight.
+
+        Rows are read one block at a time, a new block is only read once a block in flight is done, so
+        the rows held in memory stay bounded whatever the size of the sheet. The grid grows ahead of the
+        blocks and is cut to the written rows at the end.
+
+        Every committed block is recorded with a digest of its rows in a local state file, so an
+        interrupted upload resumes from the blocks still missing and a block whose rows did not
+        change is never sent twice. The state file is removed once every block is committed.
+
+        Parameters
+        ----------
+        sheet_id : str
+            The ID of the Google Sheets spreadsheet, the sheet must already exist.
+        sheet_title : str
+            The title of the sheet to insert data into.
+        values : iterable
+            The rows to be inserted into the sheet, consumed lazily.
+
+        Returns
+        -------
+        int
+            The number of rows written.
+        """
+        os.makedirs(self.upload_state_dir, exist_ok=True)
+        state_path = self._upload_state_path(sheet_id, sheet_title)
+        committed = self._load_json(state_path)
+        state_lock = threading.Lock()
+
+        def upload(block):
+            start, rows, digest = block
+            range_name = (
+                f"{sheet_title}!"
+                f"{get_sheet_range(self._width(rows), len(rows), start + 1)}"
+            )
+            self._execute_with_retry(
+                lambda: self._thread_sheet_service()
+                .spreadsheets()
+                .values()
+                .update(
+                    spreadsheetId=sheet_id,
+                    range=range_name,
+                    valueInputOption="RAW",
+                    body={"values": rows},
+                ),
+                range_name,
+            )
+
+            with state_lock:
+                committed[str(start)] = digest
+                with open(state_path, "w") as file:
+                    json.dump(committed, file)
+
+        values = iter(values)
+        start = 0
+        width = 0
+        sent = 0
+        in_flight = deque()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while rows := list(islice(values, self.chunk_rows)):
+                width = max(width, self._width(rows))
+                # Committed blocks need their rows too, the grid may have been cut since
+                self._ensure_grid(sheet_id, sheet_title, start + len(rows), width)
+
+                digest = hashlib.sha1(
+                    json.dumps(rows, default=str).encode()
+                ).hexdigest()
+                if committed.get(str(start)) != digest:
+                    in_flight.append(executor.submit(upload, (start, rows, digest)))
+                    sent += 1
+                start += len(rows)
+
+                while len(in_flight) > self.max_workers:
+                    # result() re-raises a failed block, the blocks in flight still finish
+                    in_flight.popleft().result()
+
+            for future in in_flight:
+                future.result()
+
+        self._prepare_sheets(
+            sheet_id,
+            {sheet_title: self._grid_properties(start, width)},
+            grow_only=False,
+        )
+        logger.info(
+            f"Uploaded {sheet_title}: {sent} of "
+            f"{-(-start // self.chunk_rows)} blocks sent"
+        )
 
-                self.sheet_service.spreadsheets().batchUpdate(
-                    spreadsheetId=sheet_id, body=body
-                ).execute()
+        if os.path.exists(state_path):
+            os.remove(state_path)
+        return start
@@ -0,0 +1,415 @@
+import os
+
+import numpy as np
+
+from schemas.technical import Technical
+from services.price_store import PriceStore
+from utils.logger_config import logger
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+class IndicatorEngine:
+    """
+    Computes technical indicators for the whole universe at once from the price store.
+
+    State is kept as (window x tickers) ring buffers plus running sums and recursive
+    averages, one column per ticker with its own head pointer. Every bar goes through
+    the same vectorised `_step`, both when the engine is built from history and when a
+    new daily bar is appended, so a daily update costs O(tickers) per indicator instead
+    of a pass over the full window. Only the 52-week high/low takes a max over the
+    buffer when indicators are read.
+
+    Indicators:
+    - SMA 50 / SMA 200 and EMA 20 of the close
+    - RSI 14 and ATR 14 with Wilder smoothing
+    - Annualised volatility of 20 daily log returns
+    - Distance of the close to the 52-week high and low
+    - Z-score of the latest volume against the last 20 sessions
+    """
+
+    SMA_PERIODS = (50, 200)
+    EMA_PERIOD = 20
+    RSI_PERIOD = 14
+    ATR_PERIOD = 14
+    VOLATILITY_PERIOD = 20
+    VOLUME_PERIOD = 20
+
+    BUFFERS = ("close", "high", "low", "volume", "returns")
+    VECTORS = (
+        "head",
+        "count",
+        "last_day",
+        "history_days",
+        "sum_close_50",
+        "sum_close_200",
+        "sum_returns",
+        "sum_returns_sq",
+        "sum_volume",
+        "sum_volume_sq",
+        "ema",
+        "avg_gain",
+        "avg_loss",
+        "atr",
+    )
+
+    def __init__(self, price_store: PriceStore, window: int = TRADING_DAYS_PER_YEAR):
+        """
+        Initializes the engine and loads the saved state of a previous run, if any.
+
+        Args:
+            price_store (PriceStore): Source of daily bars.
+            window (int): Number of bars kept per ticker, at least the longest period.
+        """
+        self.price_store = price_store
+        self.window = max(window, *self.SMA_PERIODS)
+        self.state_path = os.path.join(price_store.root, "_indicators.npz")
+        self.tickers = []
+        self._reset(0)
+        self._load()
+
+    def _reset(self, size: int):
+        self.buffers = {
+            name: np.full((self.window, size), np.nan) for name in self.BUFFERS
+        }
+        self.vectors = {name: np.zeros(size) for name in self.VECTORS}
+        self.vectors["head"] = np.zeros(size, dtype=np.int64)
+        self.vectors["count"] = np.zeros(size, dtype=np.int64)
+        self.vectors["last_day"] = np.full(size, -1, dtype=np.int64)
+        self.vectors["history_days"] = np.zeros(size, dtype=np.int64)
+
+    def _reset_columns(self, columns: [int]):
+        """
+        Clears the state of the given ticker columns, as if they were never synced.
+        """
+        for buffer in self.buffers.values():
+            buffer[:, columns] = np.nan
+        for name, vector in self.vectors.items():
+            vector[columns] = -1 if name == "last_day" else 0
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return
+
+        with np.load(self.state_path) as state:
+            if state["close"].shape[0] != self.window:
+                logger.info("Indicator window changed, rebuilding from history")
+                return
+            if any(name not in state for name in self.VECTORS):
+                logger.info("Indicator state format changed, rebuilding from history")
+                return
+            self.tickers = state["tickers"].tolist()
+            self.buffers = {name: state[name] for name in self.BUFFERS}
+            self.vectors = {name: state[name] for name in self.VECTORS}
+
+    def rebuild(self):
+        """
+        Drops the saved state, the next `sync` recomputes from stored history.
+        """
+        self.tickers = []
+        self._reset(0)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+    def save(self):
+        """
+        Persists the engine state next to the price store.
+        """
+        # np.savez appends ".npz" to names without it, write through a file object instead
+        with open(f"{self.state_path}.tmp", "wb") as file:
+            np.savez(
+                file,
+                tickers=np.array(self.tickers, dtype=str),
+                **self.buffers,
+                **self.vectors,
+            )
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+
+    def _add_tickers(self, tickers: [str]):
+        new_tickers = [ticker for ticker in tickers if ticker not in self.tickers]
+        if not new_tickers:
+            return
+
+        size = len(new_tickers)
+        self.tickers.extend(new_tickers)
+        for name, buffer in self.buffers.items():
+            self.buffers[name] = np.hstack(
+                [buffer, np.full((self.window, size), np.nan)]
+            )
+        for name, vector in self.vectors.items():
+            fill = -1 if name == "last_day" else 0
+            self.vectors[name] = np.concatenate(
+                [vector, np.full(size, fill, dtype=vector.dtype)]
+            )
+
+    def sync(self, tickers: [str] = None) -> int:
+        """
+        Feeds every bar stored after the last processed day of each ticker into the
+        engine, then saves the state. Tickers seen for the first time are warmed up
+        from their last `window` bars. A ticker that gained bars older than its last
+        processed day, e.g. a history backfill, is recomputed from scratch the same
+        way. A day is processed once, so a later snapshot of an already processed day
+        is only picked up after `rebuild`.
+
+        Args:
+            tickers (list of str): Tickers to update, every stored ticker if None.
+
+        Returns:
+            int: The number of bars processed.
+        """
+        tickers = tickers or self.price_store.tickers()
+        self._add_tickers(tickers)
+        positions = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+        pending = []
+        backfilled = []
+        for ticker in tickers:
+            column = positions[ticker]
+            last_day = self.vectors["last_day"][column]
+            bars = self.price_store.read(
+                ticker, columns=["high", "low", "close", "volume"]
+            )
+            # Stored days are unique, more of them up to the last processed day means
+            # bars were inserted behind the engine
+            if (
+                last_day >= 0
+                and np.count_nonzero(bars["date"] <= last_day)
+                != self.vectors["history_days"][column]
+            ):
+                backfilled.append(ticker)
+                self._reset_columns([column])
+                last_day = -1
+            self.vectors["history_days"][column] = len(bars["date"])
+            new = bars["date"] > last_day
+            if not new.any():
+                continue
+            # A fresh ticker only needs enough history to fill its buffer
+            start = max(0, int(new.sum()) - self.window) if last_day < 0 else 0
+            pending.append(
+                (
+                    column,
+                    {
+                        name: np.asarray(values)[new][start:]
+                        for name, values in bars.items()
+                    },
+                )
+            )
+
+        if backfilled:
+            logger.info(
+                f"Recomputing indicators of {len(backfilled)} backfilled tickers"
+            )
+
+        processed = 0
+        # Step the r-th new bar of every pending ticker together
+        for row in range(max((len(bars["date"]) for _, bars in pending), default=0)):
+            ready = [
+                (column, bars) for column, bars in pending if len(bars["date"]) > row
+            ]
+            columns = np.array([column for column, _ in ready])
+            self._step(
+                columns,
+                day=np.array([bars["date"][row] for _, bars in ready]),
+                high=np.array([bars["high"][row] for _, bars in ready]),
+                low=np.array([bars["low"][row] for _, bars in ready]),
+                close=np.array([bars["close"][row] for _, bars in ready]),
+                volume=np.array(
+                    [bars["volume"][row] for _, bars in ready], dtype=float
+                ),
+            )
+            processed += len(columns)
+
+        if processed or backfilled:
+            self.save()
+        logger.info(f"Indicator engine processed {processed} bars")
+        return processed
+
+    def _drop(self, name: str, columns: np.ndarray, lag: int, valid: np.ndarray):
+        """
+        Returns the buffered value `lag` bars back for each column, or 0 where the
+        window is not full yet.
+        """
+        slots = (self.vectors["head"][columns] - lag) % self.window
+        return np.where(valid, self.buffers[name][slots, columns], 0.0)
+
+    def _step(self, columns, day, high, low, close, volume):
+        """
+        Advances the given ticker columns by one bar.
+        """
+        v = self.vectors
+        count = v["count"][columns]
+        has_previous = count > 0
+        head = v["head"][columns]
+        previous_close = np.where(
+            has_previous,
+            self.buffers["close"][(head - 1) % self.window, columns],
+            close,
+        )
+
+        # Simple moving averages
+        for period in self.SMA_PERIODS:
+            dropped = self._drop("close", columns, period, count >= period)
+            v[f"sum_close_{period}"][columns] += close - dropped
+
+        # Daily log returns for volatility
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.where(
+                has_previous & (previous_close > 0),
+                np.log(close / previous_close),
+                0.0,
+            )
+        dropped = self._drop(
+            "returns", columns, self.VOLATILITY_PERIOD, count >= self.VOLATILITY_PERIOD
+        )
+        v["sum_returns"][columns] += returns - dropped
+        v["sum_returns_sq"][columns] += returns**2 - dropped**2
+
+        dropped = self._drop(
+            "volume", columns, self.VOLUME_PERIOD, count >= self.VOLUME_PERIOD
+        )
+        v["sum_volume"][columns] += volume - dropped
+        v["sum_volume_sq"][columns] += volume**2 - dropped**2
+
+        # Exponential moving average
+        alpha = 2 / (self.EMA_PERIOD + 1)
+        ema = v["ema"][columns]
+        v["ema"][columns] = np.where(has_previous, ema + alpha * (close - ema), close)
+
+        # RSI, a cumulative mean during warm-up then Wilder smoothing
+        change = close - previous_close
+        changes = np.minimum(count, self.RSI_PERIOD)
+        safe_changes = np.maximum(changes, 1)
+        for name, value in (
+            ("avg_gain", np.maximum(change, 0)),
+            ("avg_loss", np.maximum(-change, 0)),
+        ):
+            average = v[name][columns]
+            v[name][columns] = np.where(
+                has_previous,
+                average + (value - average) / safe_changes,
+                0.0,
+            )
+
+        # Average true range with the same smoothing
+        true_range = np.where(
+            has_previous,
+            np.maximum.reduce(
+                [
+                    high - low,
+                    np.abs(high - previous_close),
+                    np.abs(low - previous_close),
+                ]
+            ),
+            high - low,
+        )
+        atr = v["atr"][columns]
+        v["atr"][columns] = atr + (true_range - atr) / np.minimum(
+            count + 1, self.ATR_PERIOD
+        )
+
+        # Write the bar and move the heads
+        for name, value in (
+            ("close", close),
+            ("high", high),
+            ("low", low),
+            ("volume", volume),
+            ("returns", returns),
+        ):
+            self.buffers[name][head, columns] = value
+
+        v["head"][columns] = (head + 1) % self.window
+        v["count"][columns] = count + 1
+        v["last_day"][columns] = day
+
+    def values(self) -> dict:
+        """
+        Returns every indicator as a vector aligned with `self.tickers`. Indicators
+        whose period is longer than the ticker's history are NaN.
+
+        Returns:
+            dict: Indicator name to numpy array.
+        """
+        v = self.vectors
+        count = v["count"]
+        last_close = self.buffers["close"][
+            (v["head"] - 1) % self.window, np.arange(len(count))
+        ]
+
+        def average(total, period, available):
+            return np.where(available >= period, total / period, np.nan)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns_count = self.VOLATILITY_PERIOD
+            mean_returns = v["sum_returns"] / returns_count
+            returns_variance = v["sum_returns_sq"] / returns_count - mean_returns**2
+            volatility = np.where(
+                count > returns_count,
+                np.sqrt(np.maximum(returns_variance, 0) * TRADING_DAYS_PER_YEAR),
+                np.nan,
+            )
+
+            mean_volume = v["sum_volume"] / self.VOLUME_PERIOD
+            std_volume = np.sqrt(
+                np.maximum(v["sum_volume_sq"] / self.VOLUME_PERIOD - mean_volume**2, 0)
+            )
+            last_volume = self.buffers["volume"][
+                (v["head"] - 1) % self.window, np.arange(len(count))
+            ]
+            volume_z_score = np.where(
+                (count >= self.VOLUME_PERIOD) & (std_volume > 0),
+                (last_volume - mean_volume) / std_volume,
+                np.nan,
+            )
+
+            rsi = np.where(
+                count > self.RSI_PERIOD,
+                np.where(
+                    v["avg_loss"] > 0,
+                    100 - 100 / (1 + v["avg_gain"] / v["avg_loss"]),
+                    100.0,
+                ),
+                np.nan,
+            )
+
+            has_bars = count > 0
+            high_52_week = np.full(len(count), np.nan)
+            low_52_week = np.full(len(count), np.nan)
+            if has_bars.any():
+                high_52_week[has_bars] = np.nanmax(
+                    self.buffers["high"][:, has_bars], axis=0
+                )
+                low_52_week[has_bars] = np.nanmin(
+                    self.buffers["low"][:, has_bars], axis=0
+                )
+
+            return {
+                "sma_50": average(v["sum_close_50"], 50, count),
+                "sma_200": average(v["sum_close_200"], 200, count),
+                "ema_20": np.where(count >= self.EMA_PERIOD, v["ema"], np.nan),
+                "rsi_14": rsi,
+                "atr_14": np.where(count >= self.ATR_PERIOD, v["atr"], np.nan),
+                "volatility_20": volatility,
+                "distance_52_week_high": last_close / high_52_week - 1,
+                "distance_52_week_low": last_close / low_52_week - 1,
+                "volume_z_score": volume_z_score,
+            }
+
+    def technicals(self) -> dict:
+        """
+        Returns the indicators of every ticker as schema objects. Indicators that are
+        not available, e.g. for a too short history, are None so they stay blank
+        instead of reading as a real value of 0.
+
+        Returns:
+            dict: Ticker to Technical.
+        """
+        values = self.values()
+        return {
+            ticker: Technical(
+                **{
+                    name: round(float(vector[i]), 4) if np.isfinite(vector[i]) else None
+                    for name, vector in values.items()
+                }
+            )
+            for i, ticker in enumerate(self.tickers)
+        }
@@ -0,0 +1,251 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable
+
+from schemas.stock import Stock
+from services.checkpoint import Checkpoint
+from utils.logger_config import logger
+from utils.metrics import metrics
+from utils.profiler import profile_stage
+
+DONE = "done"
+FRESH = "fresh"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+@dataclass
+class Stage:
+    """
+    A step of the pipeline.
+
+    Attributes:
+        name (str): Unique stage name.
+        run (Callable): Does the work, receives the pipeline.
+        depends_on (tuple of str): Stages that must complete before this one.
+        fields (tuple of str): Stock fields the stage fills in. A stage with fields is
+            checkpointed after it runs and can be restored from a fresh checkpoint.
+        creates_stocks (bool): The stage builds the stock list itself, restoring it
+            replaces the whole list.
+    """
+
+    name: str
+    run: Callable[["Pipeline"], None]
+    depends_on: tuple = ()
+    fields: tuple = ()
+    creates_stocks: bool = False
+
+    @property
+    def is_checkpointed(self) -> bool:
+        return self.creates_stocks or bool(self.fields)
+
+
+@dataclass
+class StageResult:
+    status: str
+    seconds: float = 0.0
+    error: str = ""
+
+
+class Pipeline:
+    """
+    Runs stages as a dependency graph, independent stages concurrently.
+
+    A checkpointed stage is skipped when today's checkpoint exists and every stage it
+    depends on was restored too. A checkpoint only holds the fields of its stage, and only
+    those are copied back onto the stocks.
+    A failed stage only takes down the stages that depend on it, the others carry on.
+    """
+
+    def __init__(
+        self, stages: [Stage], checkpoint: Checkpoint = None, max_workers: int = 3
+    ):
+        """
+        Initializes the pipeline.
+
+        Args:
+            stages (list of Stage): The stages, in any order.
+            checkpoint (Checkpoint): Checkpoint store, today's by default.
+            max_workers (int): Maximum number of stages running at the same time.
+
+        Raises:
+            ValueError: If a stage depends on an unknown stage.
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            unknown = set(stage.depends_on) - self.stages.keys()
+            if unknown:
+                raise ValueError(f"Stage {stage.name} depends on unknown {unknown}")
+
+        self.checkpoint = checkpoint or Checkpoint()
+        self.max_workers = max_workers
+        self.stocks: [Stock] = []
+        self.results = {}
+        self._lock = threading.Lock()
+
+    def _required(self, targets: [str]) -> set:
+        required = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in required:
+                required.add(name)
+                pending.extend(self.stages[name].depends_on)
+        return required
+
+    def run(self, targets: [str] = None, force: bool = False) -> dict:
+        """
+        Runs the target stages and whatever they depend on.
+
+        Args:
+            targets (list of str): Stages to run, all stages if None.
+            force (bool): Run the targets even when their checkpoint is fresh.
+
+        Returns:
+            dict: Stage name to StageResult.
+        """
+        targets = set(targets or self.stages)
+        pending = {name: self.stages[name] for name in self._required(targets)}
+        self.results = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            running = {}
+            while pending or running:
+                for stage in self._ready(pending):
+                    is_fresh = (
+                        stage.is_checkpointed
+                        and not (force and stage.name in targets)
+                        and all(
+                            self.results[name].status == FRESH
+                            for name in stage.depends_on
+                        )
+                        and self.checkpoint.exists(stage.name)
+                    )
+                    running[executor.submit(self._execute, stage, is_fresh)] = stage
+
+                if not running:
+                    if not pending:
+                        break
+                    raise ValueError(
+                        f"Dependency cycle between {', '.join(sorted(pending))}"
+                    )
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.results[running.pop(future).name] = future.result()
+
+        self._record_metrics()
+        self._log_summary()
+        return self.results
+
+    def _ready(self, pending: dict) -> [Stage]:
+        """
+        Pops the stages whose dependencies all finished. Stages downstream of a failed
+        or skipped stage are marked skipped on the way.
+        """
+        ready = []
+        is_changed = True
+        while is_changed:
+            is_changed = False
+            for stage in list(pending.values()):
+                if any(name not in self.results for name in stage.depends_on):
+                    continue
+
+                del pending[stage.name]
+                is_changed = True
+                blocked = [
+                    name
+                    for name in stage.depends_on
+                    if self.results[name].status in (FAILED, SKIPPED)
+                ]
+                if blocked:
+                    self.results[stage.name] = StageResult(
+                        SKIPPED, error=f"{', '.join(blocked)} did not complete"
+                    )
+                    logger.warning(f"Stage {stage.name} skipped, {blocked} not done")
+                else:
+                    ready.append(stage)
+
+        return ready
+
+    def _execute(self, stage: Stage, is_fresh: bool) -> StageResult:
+        started = time.perf_counter()
+
+        if is_fresh:
+            try:
+                self._restore(stage)
+                logger.info(f"Stage {stage.name} is fresh, restored from checkpoint")
+                return StageResult(FRESH, time.perf_counter() - started)
+            except Exception as e:
+                logger.warning(f"Restoring {stage.name} failed, running it: {e}")
+
+        logger.info(f"Stage {stage.name} started")
+        try:
+            with profile_stage(stage.name):
+                stage.run(self)
+            if stage.is_checkpointed:
+                with self._lock:
+                    self.checkpoint.save(stage.name, self._snapshot(stage))
+        except Exception as e:
+            seconds = time.perf_counter() - started
+            logger.exception(f"Stage {stage.name} failed after {seconds:.1f}s")
+            return StageResult(FAILED, seconds, error=repr(e))
+
+        seconds = time.perf_counter() - started
+        logger.info(f"Stage {stage.name} done in {seconds:.1f}s")
+        return StageResult(DONE, seconds)
+
+    def _snapshot(self, stage: Stage) -> [Stock]:
+        """
+        Returns what the checkpoint of a finished stage holds. Concurrent stages are still
+        changing the shared stocks, so a stage with fields only saves its own fields, which
+        nothing else writes; a stage creating the stocks runs before anything uses them.
+        """
+        if stage.creates_stocks:
+            return self.stocks
+
+        return [
+            Stock(stock.ticker, **{name: getattr(stock, name) for name in stage.fields})
+            for stock in self.stocks
+        ]
+
+    def _restore(self, stage: Stage):
+        """
+        Copies the fields of a stage from its checkpoint onto the current stocks.
+        """
+        saved_stocks = self.checkpoint.load(stage.name)
+        if stage.creates_stocks:
+            self.stocks = saved_stocks
+            return
+
+        saved = {stock.ticker: stock for stock in saved_stocks}
+        for stock in self.stocks:
+            saved_stock = saved.get(stock.ticker)
+            if saved_stock is None:
+                continue
+            for name in stage.fields:
+                setattr(stock, name, getattr(saved_stock, name))
+            if stock.fundamental is not None:
+                stock.fundamental.stock = stock
+
+    def _record_metrics(self):
+        for name, result in self.results.items():
+            metrics.set("pipeline_stage_seconds", result.seconds, stage=name)
+            metrics.set(
+                "pipeline_stage_completed",
+                int(result.status in (DONE, FRESH)),
+                stage=name,
+                status=result.status,
+            )
+
+    def _log_summary(self):
+        for name, result in self.results.items():
+            logger.info(
+                f"{name:<12} {result.status:<8} {result.seconds:8.1f}s {result.error}"
+            )
+
+    @property
+    def is_successful(self) -> bool:
+        return all(result.status in (DONE, FRESH) for result in self.results.values())
@@ -0,0 +1,458 @@
+import os
+import shutil
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from utils.logger_config import logger
+
+# Column layout of a daily bar. Every column lives in its own little-endian binary
+# file so a reader only touches the columns it needs.
+BAR_COLUMNS = {
+    "date": np.dtype("<i8"),  # days since 1970-01-01
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<i8"),
+}
+
+# IDX sessions run on Jakarta time, a day's bar is final once post-trading has ended
+EXCHANGE_TIMEZONE = ZoneInfo("Asia/Jakarta")
+MARKET_CLOSE = time(16, 15)
+
+# Prefixes of the directories a compaction works in, next to the ticker directories
+_COMPACTING_PREFIX = ".compacting-"
+_REPLACED_PREFIX = ".replaced-"
+
+
+def date_to_day(value: date) -> int:
+    """
+    Converts a date to the number of days since the Unix epoch.
+
+    Args:
+        value (date): The date to convert.
+
+    Returns:
+        int: Days since 1970-01-01.
+    """
+    return int(np.datetime64(value, "D").astype("<i8"))
+
+
+def last_closed_session(now: datetime = None) -> date:
+    """
+    Returns the last weekday whose IDX session has closed. Exchange holidays are not
+    known here, they simply have no bars.
+
+    Args:
+        now (datetime): The current time, timezone aware, now by default.
+
+    Returns:
+        date: The session date on the exchange calendar.
+    """
+    now = (now or datetime.now(EXCHANGE_TIMEZONE)).astimezone(EXCHANGE_TIMEZONE)
+    day = now.date() if now.time() >= MARKET_CLOSE else now.date() - timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day
+
+
+def day_to_date(value: int) -> date:
+    """
+    Converts a number of days since the Unix epoch back to a date.
+
+    Args:
+        value (int): Days since 1970-01-01.
+
+    Returns:
+        date: The corresponding date.
+    """
+    return np.datetime64(int(value), "D").astype(date)
+
+
+class PriceStore:
+    """
+    Local columnar store of daily OHLCV bars, one directory per ticker.
+
+    Layout::
+
+        <root>/<TICKER>/date.bin
+        <root>/<TICKER>/open.bin
+        ...
+
+    Bars are only ever appended, so a daily update writes a handful of bytes per column.
+    Reads memory-map the column files, so range queries over years of history for the
+    whole universe never load more than the requested slice into RAM. An append that
+    goes back in time (a backfill, or a re-fetched bar for the same day) marks the
+    ticker as unsorted until `compact` rewrites it sorted and de-duplicated.
+
+    The last date covered by a history download is recorded separately from the bars,
+    so snapshot bars appended in between never make the history look complete.
+    """
+
+    def __init__(self, root: str = "price_store"):
+        """
+        Initializes the store and makes sure the root directory exists.
+
+        Args:
+            root (str): Directory holding the per-ticker column files.
+        """
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self._recover_compactions()
+
+    def _column_path(self, ticker: str, column: str) -> str:
+        return os.path.join(self.root, ticker, f"{column}.bin")
+
+    def _unsorted_marker_path(self, ticker: str) -> str:
+        return os.path.join(self.root, ticker, ".unsorted")
+
+    def _history_end_path(self, ticker: str) -> str:
+        return os.path.join(self.root, ticker, ".history_end")
+
+    def _is_sorted(self, ticker: str) -> bool:
+        return not os.path.exists(self._unsorted_marker_path(ticker))
+
+    def _length(self, ticker: str) -> int:
+        """
+        Returns the number of complete bars stored for a ticker. A write interrupted
+        between two columns leaves them with different lengths, the shortest one wins.
+        """
+        lengths = []
+        for column, dtype in BAR_COLUMNS.items():
+            path = self._column_path(ticker, column)
+            if not os.path.exists(path):
+                return 0
+            lengths.append(os.path.getsize(path) // dtype.itemsize)
+        return min(lengths)
+
+    def append(
+        self,
+        ticker: str,
+        dates,
+        open_,
+        high,
+        low,
+        close,
+        volume,
+    ) -> int:
+        """
+        Appends bars for a ticker. All arguments are array-likes of the same length.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            dates: Bar dates, as numpy datetime64 values or days since the epoch.
+            open_: Open prices.
+            high: High prices.
+            low: Low prices.
+            close: Close prices.
+            volume: Traded volume.
+
+        Returns:
+            int: The number of bars written.
+        """
+        dates = np.asarray(dates)
+        if np.issubdtype(dates.dtype, np.datetime64):
+            dates = dates.astype("datetime64[D]").astype("<i8")
+
+        values = {
+            "date": dates,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
+        }
+
+        count = len(dates)
+        if count == 0:
+            return 0
+
+        os.makedirs(os.path.join(self.root, ticker), exist_ok=True)
+
+        # Trim a half-written tail first so every column stays aligned.
+        length = self._length(ticker)
+        for column, dtype in BAR_COLUMNS.items():
+            path = self._column_path(ticker, column)
+            if (
+                os.path.exists(path)
+                and os.path.getsize(path) != length * dtype.itemsize
+            ):
+                os.truncate(path, length * dtype.itemsize)
+
+        # Appending out of order is allowed, reads de-duplicate until the next compaction
+        previous_day = self._memmap(ticker, "date", length)[-1] if length else None
+        if np.any(np.diff(dates) <= 0) or (
+            previous_day is not None and dates[0] <= previous_day
+        ):
+            open(self._unsorted_marker_path(ticker), "a").close()
+
+        for column, dtype in BAR_COLUMNS.items():
+            array = np.nan_to_num(np.asarray(values[column], dtype=np.float64))
+            with open(self._column_path(ticker, column), "ab") as file:
+                file.write(array.astype(dtype).tobytes())
+
+        logger.debug(f"Appended {count} bars for {ticker}")
+        return count
+
+    def append_bar(
+        self,
+        ticker: str,
+        day: date,
+        open_: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: int,
+    ) -> int:
+        """
+        Appends a single daily bar. Writing the same day again replaces it on read.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            day (date): The bar date.
+            open_ (float): Open price.
+            high (float): High price.
+            low (float): Low price.
+            close (float): Close price.
+            volume (int): Traded volume.
+
+        Returns:
+            int: The number of bars written.
+        """
+        return self.append(
+            ticker, [date_to_day(day)], [open_], [high], [low], [close], [volume]
+        )
+
+    def _memmap(self, ticker: str, column: str, length: int) -> np.ndarray:
+        return np.memmap(
+            self._column_path(ticker, column),
+            dtype=BAR_COLUMNS[column],
+            mode="r",
+            shape=(length,),
+        )
+
+    def read(
+        self,
+        ticker: str,
+        start: date = None,
+        end: date = None,
+        columns: [str] = None,
+    ) -> dict:
+        """
+        Reads the bars of a ticker between two dates, both inclusive.
+
+        For a sorted ticker the result is a set of read-only memory-mapped slices located
+        by binary search on the date column, nothing outside the range is paged in.
+        Unsorted tickers are sorted and de-duplicated in memory, last write wins.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            start (date): First date to include, unbounded if None.
+            end (date): Last date to include, unbounded if None.
+            columns (list of str): Columns to return, all of them if None.
+
+        Returns:
+            dict: Column name to numpy array. Arrays are empty if the ticker is unknown.
+        """
+        columns = columns or list(BAR_COLUMNS)
+        if "date" not in columns:
+            columns = ["date", *columns]
+
+        length = self._length(ticker)
+        if length == 0:
+            return {column: np.empty(0, BAR_COLUMNS[column]) for column in columns}
+
+        dates = self._memmap(ticker, "date", length)
+
+        if self._is_sorted(ticker):
+            lo = (
+                0
+                if start is None
+                else np.searchsorted(dates, date_to_day(start), "left")
+            )
+            hi = (
+                length
+                if end is None
+                else np.searchsorted(dates, date_to_day(end), "right")
+            )
+            return {
+                column: self._memmap(ticker, column, length)[lo:hi]
+                for column in columns
+            }
+
+        index = self._deduplicated_index(np.asarray(dates))
+        mask = np.ones(len(index), dtype=bool)
+        if start is not None:
+            mask &= dates[index] >= date_to_day(start)
+        if end is not None:
+            mask &= dates[index] <= date_to_day(end)
+        index = index[mask]
+
+        return {
+            column: np.asarray(self._memmap(ticker, column, length))[index]
+            for column in columns
+        }
+
+    @staticmethod
+    def _deduplicated_index(dates: np.ndarray) -> np.ndarray:
+        """
+        Returns positions that sort `dates` ascending, keeping the last written bar of
+        every date.
+        """
+        order = np.argsort(dates, kind="stable")
+        ordered = dates[order]
+        keep = np.append(ordered[1:] != ordered[:-1], True)
+        return order[keep]
+
+    def last_date(self, ticker: str) -> date | None:
+        """
+        Returns the most recent stored bar date for a ticker.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+
+        Returns:
+            date | None: The latest date, or None if nothing is stored.
+        """
+        length = self._length(ticker)
+        if length == 0:
+            return None
+
+        dates = self._memmap(ticker, "date", length)
+        return day_to_date(dates[-1] if self._is_sorted(ticker) else dates.max())
+
+    def history_end(self, ticker: str) -> date | None:
+        """
+        Returns the last date covered by a history download for a ticker.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+
+        Returns:
+            date | None: The date, or None if no history was downloaded yet.
+        """
+        try:
+            with open(self._history_end_path(ticker), "r") as file:
+                return date.fromisoformat(file.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def set_history_end(self, ticker: str, day: date):
+        """
+        Records the last date covered by a history download for a ticker.
+
+        Args:
+            ticker (str): The stock ticker symbol.
+            day (date): Bars up to this date are complete.
+        """
+        path = self._history_end_path(ticker)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "w") as file:
+            file.write(day.isoformat())
+        os.replace(f"{path}.tmp", path)
+
+    def scan(
+        self,
+        tickers: [str] = None,
+        start: date = None,
+        end: date = None,
+        columns: [str] = None,
+    ):
+        """
+        Iterates over the bars of many tickers, one ticker at a time.
+
+        Args:
+            tickers (list of str): Tickers to scan, every stored ticker if None.
+            start (date): First date to include, unbounded if None.
+            end (date): Last date to include, unbounded if None.
+            columns (list of str): Columns to return, all of them if None.
+
+        Yields:
+            tuple: The ticker and its column dict as returned by `read`.
+        """
+        for ticker in tickers or self.tickers():
+            yield ticker, self.read(ticker, start=start, end=end, columns=columns)
+
+    def compact(self, tickers: [str] = None) -> int:
+        """
+        Rewrites unsorted tickers sorted by date with one bar per day, and drops any
+        half-written tail.
+
+        The columns are written to a new directory that replaces the ticker directory
+        only once it is complete, so the columns are always swapped together. A crash
+        between the two renames of the swap is repaired when the store is opened again.
+
+        Args:
+            tickers (list of str): Tickers to compact, every stored ticker if None.
+
+        Returns:
+            int: The number of tickers rewritten.
+        """
+        compacted = 0
+        for ticker in tickers or self.tickers():
+            if self._is_sorted(ticker):
+                continue
+
+            bars = self.read(ticker)
+            ticker_dir = os.path.join(self.root, ticker)
+            compacting_dir = os.path.join(self.root, f"{_COMPACTING_PREFIX}{ticker}")
+            replaced_dir = os.path.join(self.root, f"{_REPLACED_PREFIX}{ticker}")
+            shutil.rmtree(compacting_dir, ignore_errors=True)
+            os.makedirs(compacting_dir)
+
+            for column, dtype in BAR_COLUMNS.items():
+                with open(os.path.join(compacting_dir, f"{column}.bin"), "wb") as file:
+                    file.write(
+                        np.ascontiguousarray(bars[column], dtype=dtype).tobytes()
+                    )
+                    file.flush()
+                    os.fsync(file.fileno())
+            if os.path.exists(self._history_end_path(ticker)):
+                shutil.copy2(
+                    self._history_end_path(ticker),
+                    os.path.join(compacting_dir, ".history_end"),
+                )
+
+            os.rename(ticker_dir, replaced_dir)
+            os.rename(compacting_dir, ticker_dir)
+            shutil.rmtree(replaced_dir)
+
+            compacted += 1
+            logger.debug(f"Compacted {ticker} to {len(bars['date'])} bars")
+
+        return compacted
+
+    def _recover_compactions(self):
+        """
+        Cleans up after compactions interrupted by a crash. A ticker directory moved aside
+        but not replaced yet is moved back, it is complete and only unsorted; the compacted
+        copy is dropped and redone by the next compaction.
+        """
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(_COMPACTING_PREFIX):
+                shutil.rmtree(path)
+            elif name.startswith(_REPLACED_PREFIX):
+                ticker_dir = os.path.join(self.root, name[len(_REPLACED_PREFIX) :])
+                if os.path.exists(ticker_dir):
+                    shutil.rmtree(path)
+                else:
+                    os.rename(path, ticker_dir)
+                    logger.warning(
+                        f"Restored {ticker_dir} after an interrupted compaction"
+                    )
+
+    def tickers(self) -> [str]:
+        """
+        Lists the tickers that have bars in the store.
+
+        Returns:
+            list of str: Sorted ticker symbols.
+        """
+        return sorted(
+            name
+            for name in os.listdir(self.root)
+            if not name.startswith(".") and os.path.isdir(os.path.join(self.root, name))
+        )
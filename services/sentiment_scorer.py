@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+from schemas.sentiment import Sentiment
+from utils.logger_config import logger
+
+# Weighted lexicon for Indonesian and English stock talk, as used on Stockbit streams.
+LEXICON = {
+    # positive
+    "naik": 1.0,
+    "menguat": 1.0,
+    "meningkat": 1.0,
+    "tumbuh": 1.0,
+    "bullish": 1.5,
+    "uptrend": 1.5,
+    "breakout": 1.5,
+    "rebound": 1.0,
+    "cuan": 1.5,
+    "untung": 1.0,
+    "laba": 0.5,
+    "profit": 1.0,
+    "akumulasi": 1.0,
+    "accumulate": 1.0,
+    "beli": 0.5,
+    "buy": 0.5,
+    "hijau": 0.5,
+    "ara": 1.5,
+    "terbang": 1.0,
+    "rekor": 1.0,
+    "positif": 1.0,
+    "positive": 1.0,
+    "optimis": 1.0,
+    "optimistic": 1.0,
+    "kuat": 0.5,
+    "strong": 0.5,
+    "gain": 1.0,
+    "growth": 1.0,
+    "up": 0.5,
+    "dividen": 0.5,
+    "dividend": 0.5,
+    "undervalued": 1.0,
+    "murah": 0.5,
+    # negative
+    "turun": -1.0,
+    "melemah": -1.0,
+    "menurun": -1.0,
+    "anjlok": -1.5,
+    "longsor": -1.5,
+    "bearish": -1.5,
+    "downtrend": -1.5,
+    "breakdown": -1.5,
+    "rugi": -1.5,
+    "loss": -1.0,
+    "merugi": -1.5,
+    "distribusi": -1.0,
+    "jual": -0.5,
+    "sell": -0.5,
+    "merah": -0.5,
+    "arb": -1.5,
+    "nyangkut": -1.0,
+    "cutloss": -1.0,
+    "koreksi": -0.5,
+    "negatif": -1.0,
+    "negative": -1.0,
+    "pesimis": -1.0,
+    "lemah": -0.5,
+    "weak": -0.5,
+    "drop": -1.0,
+    "down": -0.5,
+    "suspend": -1.5,
+    "suspensi": -1.5,
+    "gagal": -1.0,
+    "default": -1.5,
+    "bangkrut": -2.0,
+    "pailit": -2.0,
+    "fraud": -2.0,
+    "korupsi": -1.5,
+    "overvalued": -1.0,
+    "mahal": -0.5,
+}
+
+# Tokens that flip the polarity of the following token
+NEGATIONS = {"tidak", "tak", "bukan", "belum", "jangan", "not", "no", "never"}
+
+# Posts of a batch are joined with this separator and tokenised in one pass, the
+# pattern matches it as a token of its own to find where each post starts
+DOCUMENT_SEPARATOR = "\x00"
+TOKEN_PATTERN = re.compile(r"[a-z]+|\x00")
+
+# Lexicon and negations as sorted arrays for one `np.searchsorted` lookup. Tokens are
+# cut one character past the longest word, a cut token is still longer than any word
+# and never matches.
+VOCABULARY = np.array(sorted({*LEXICON, *NEGATIONS}))
+VOCABULARY_WEIGHTS = np.array([LEXICON.get(word, 0.0) for word in VOCABULARY])
+VOCABULARY_NEGATIONS = np.array([word in NEGATIONS for word in VOCABULARY])
+TOKEN_DTYPE = f"<U{max(map(len, VOCABULARY)) + 1}"
+
+
+class SentimentScorer:
+    """
+    Scores stream posts locally with a lexicon, on CPU and without network calls.
+
+    Posts are scored in batches. A batch is lower-cased and tokenised in one regex
+    pass over the joined posts, the tokens are looked up in the sorted lexicon with
+    `np.searchsorted`, negations flip the token after them and the weights are summed
+    per post with `np.bincount`, so no Python code runs per post or per token.
+
+    Scores are cached by content hash, an unchanged post is never scored twice. The
+    cache keeps the `max_entries` most recently used posts, older ones are dropped
+    when it is saved.
+    """
+
+    POSITIVE_THRESHOLD = 0.05
+    NEGATIVE_THRESHOLD = -0.05
+
+    def __init__(
+        self,
+        cache_path: str = "sentiment_cache.json",
+        batch_size: int = 2048,
+        max_entries: int = 100_000,
+    ):
+        """
+        Initializes the scorer and loads the score cache.
+
+        Args:
+            cache_path (str): JSON file mapping content hashes to [rate, category].
+            batch_size (int): Number of posts scored per vectorised batch.
+            max_entries (int): Number of cached scores kept, least recently used
+                ones are dropped first.
+        """
+        self.cache_path = cache_path
+        self.batch_size = batch_size
+        self.max_entries = max_entries
+        self.cache = self._load_cache()
+
+    def _load_cache(self) -> dict:
+        if not os.path.exists(self.cache_path):
+            return {}
+
+        try:
+            with open(self.cache_path, "r") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Error loading sentiment cache from {self.cache_path}: {e}")
+            return {}
+
+    def _save_cache(self):
+        # Entries are kept in use order, the oldest come first
+        excess = max(len(self.cache) - self.max_entries, 0)
+        for content_hash in list(self.cache)[:excess]:
+            del self.cache[content_hash]
+
+        try:
+            with open(f"{self.cache_path}.tmp", "w") as f:
+                json.dump(self.cache, f)
+            os.replace(f"{self.cache_path}.tmp", self.cache_path)
+        except OSError as e:
+            logger.error(f"Error saving sentiment cache to {self.cache_path}: {e}")
+
+    @staticmethod
+    def _content_hash(content: str) -> str:
+        return hashlib.sha1(content.encode()).hexdigest()
+
+    def score(self, sentiments: [Sentiment]) -> int:
+        """
+        Fills in `rate` (-1 to 1) and `category` of every sentiment in place.
+
+        Args:
+            sentiments (list of Sentiment): Posts of any number of tickers.
+
+        Returns:
+            int: The number of posts that had to be scored, the rest came from the cache.
+        """
+        pending = {}
+        for sentiment in sentiments:
+            content_hash = self._content_hash(sentiment.content or "")
+            cached = self.cache.pop(content_hash, None)
+            if cached is not None:
+                # Re-inserted to mark it as recently used
+                self.cache[content_hash] = cached
+                sentiment.rate, sentiment.category = cached
+            else:
+                pending.setdefault(content_hash, []).append(sentiment)
+
+        hashes = list(pending)
+        for i in range(0, len(hashes), self.batch_size):
+            batch = hashes[i : i + self.batch_size]
+            rates = self._score_batch([pending[h][0].content or "" for h in batch])
+
+            for content_hash, rate in zip(batch, rates):
+                rate = round(float(rate), 4)
+                category = self._category(rate)
+                self.cache[content_hash] = [rate, category]
+
+                for sentiment in pending[content_hash]:
+                    sentiment.rate, sentiment.category = rate, category
+
+        if sentiments:
+            self._save_cache()
+
+        cached = len(sentiments) - sum(len(posts) for posts in pending.values())
+        logger.info(f"Scored {len(hashes)} posts, {cached} from cache")
+        return len(hashes)
+
+    def _score_batch(self, contents: [str]) -> np.ndarray:
+        """
+        Scores a batch of texts.
+
+        Args:
+            contents (list of str): Texts to score.
+
+        Returns:
+            np.ndarray: One rate per text, squashed to (-1, 1).
+        """
+        # The separator inside a post would shift the ids of the posts after it
+        text = DOCUMENT_SEPARATOR.join(
+            content.replace(DOCUMENT_SEPARATOR, " ") for content in contents
+        ).lower()
+        tokens = np.array(TOKEN_PATTERN.findall(text), dtype=TOKEN_DTYPE)
+        if len(tokens) == 0:
+            return np.zeros(len(contents))
+
+        is_separator = tokens == DOCUMENT_SEPARATOR
+        document_ids = np.cumsum(is_separator)
+
+        positions = np.searchsorted(VOCABULARY, tokens)
+        positions = np.minimum(positions, len(VOCABULARY) - 1)
+        is_known = VOCABULARY[positions] == tokens
+        is_negation = is_known & VOCABULARY_NEGATIONS[positions]
+        is_word = is_known & ~is_negation
+        weights = VOCABULARY_WEIGHTS[positions]
+
+        # A negation flips the polarity of the token right after it in the same post
+        is_negated = np.concatenate(([False], is_negation[:-1]))
+        weights = np.where(is_negated, -weights, weights)
+
+        totals = np.bincount(
+            document_ids[is_word], weights=weights[is_word], minlength=len(contents)
+        )
+        hits = np.bincount(document_ids[is_word], minlength=len(contents))
+
+        # Normalise by the number of sentiment words so long posts do not saturate
+        return np.tanh(totals / np.sqrt(np.maximum(hits, 1)))
+
+    def _category(self, rate: float) -> str:
+        if rate > self.POSITIVE_THRESHOLD:
+            return "positive"
+        if rate < self.NEGATIVE_THRESHOLD:
+            return "negative"
+        return "neutral"
@@ -1,6 +1,10 @@
 import os
-import tempfile
+import re
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from urllib.parse import urlparse
 
 import requests
 
@@ -8,7 +12,27 @@ import hashlib
 import json
 from loguru import logger
 
-from utils.logger_config import logger
+try:
+    import ijson
+except ImportError:  # Optional, responses are then always decoded whole
+    ijson = None
+
+from services.token_store import TokenStore, token_expiry
+from utils.logger_config import DEBUG_ENABLED, logger
+from utils.metrics import metrics
+from utils.serialization import from_json
+
+# Path segments that identify a company (tickers) or a record (numeric IDs)
+TICKER_SEGMENT_PATTERN = re.compile(r"^(?=.*[A-Z])[A-Z0-9.\-]+$")
+ID_SEGMENT_PATTERN = re.compile(r"^\d+$")
+
+# Raised on invalid JSON, by orjson (a ValueError) or ijson
+DECODE_ERRORS = (ValueError,) if ijson is None else (ValueError, ijson.JSONError)
+
+# Below this size a whole-document orjson decode beats streaming out the subtrees
+SUBTREE_DECODE_MIN_BYTES = int(
+    os.getenv("STOCKBIT_SUBTREE_DECODE_MIN_BYTES", 256 * 1024)
+)
 
 
 class StockbitApiClient:
@@ -16,27 +40,70 @@ class StockbitApiClient:
     Handles HTTP requests to the Stockbit API, including authentication, retries, and file-based caching.
     """
 
-    def __init__(self):
+    def __init__(self, token_store: TokenStore = None, memo_size: int = 2048):
         """
         Initializes the StockbitHttpRequest with a URL and default headers.
-        Authenticates with the Stockbit API upon initialization.
+        Authentication is deferred to the first request that is not served from the cache.
         Sets up file-based caching.
+
+        Args:
+            token_store: Store of the tokens, shared by every client on the machine by default.
+            memo_size: Number of decoded responses kept in memory for the run.
         """
         self.headers = {
             "Accept": "application/json",
             "Content-Type": "application/json",
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:137.0) Gecko/20100101 Firefox/137.0",
         }
-        self.is_authorise = False
-        self.token_temp_file_path = os.path.join(
-            tempfile.gettempdir(), "stockbit_token.tmp"
-        )
-        self.refresh_token_temp_file_path = os.path.join(
-            tempfile.gettempdir(), "stockbit_refresh_token.tmp"
-        )
-        self._initialize_token_file()
-        self.cache_dir = os.path.join("stockbit_cache")
+        # Hosts can be pointed elsewhere, e.g. at the benchmark stand-in server
+        self.base_url = os.getenv("STOCKBIT_BASE_URL", "https://exodus.stockbit.com")
+        self.login_url = os.getenv("STOCKBIT_LOGIN_URL", "https://api.stockbit.com")
+        self.token_store = token_store or TokenStore()
+        self.cache_dir = os.getenv("STOCKBIT_CACHE_DIR", "stockbit_cache")
         os.makedirs(self.cache_dir, exist_ok=True)  # Ensure cache directory exists
+        # Decoded responses by cache key and subtrees, least recently used first
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        # Requests on the wire by (cache key, subtrees, use_cache), identical requests wait on them
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _endpoint(url: str) -> str:
+        """
+        Normalises a URL to its endpoint, so metrics are grouped per endpoint and not per ticker.
+
+        Args:
+            url: The requested URL.
+
+        Returns:
+            The URL path with tickers replaced by `{ticker}` and IDs by `{id}`, without the query.
+        """
+        segments = []
+        for segment in urlparse(url).path.split("/"):
+            if ID_SEGMENT_PATTERN.match(segment):
+                segment = "{id}"
+            elif TICKER_SEGMENT_PATTERN.match(segment):
+                segment = "{ticker}"
+            segments.append(segment)
+        return "/".join(segments)
+
+    @staticmethod
+    def _cache_key(url: str, payload: dict = None) -> str:
+        """
+        Builds the cache key of a request. POST requests to the same URL with different
+        payloads (e.g. stream pages) must not share a cache entry.
+
+        Args:
+            url: The requested URL.
+            payload: Optional payload of a POST request.
+
+        Returns:
+            The URL, followed by the canonical JSON payload if there is one.
+        """
+        if payload is None:
+            return url
+        return f"{url}#{json.dumps(payload, sort_keys=True)}"
 
     def _get_cache_filename(self, url: str) -> str:
         """
@@ -52,42 +119,170 @@ class StockbitApiClient:
         hashed_url = hashlib.md5(url.encode()).hexdigest()
         return os.path.join(self.cache_dir, f"{hashed_url}.json")
 
-    def _load_cache(self, url: str) -> dict:
+    @staticmethod
+    def _decode(content: bytes, subtrees: tuple = None) -> dict:
         """
-        Loads cached data from a file, if it exists.
+        Decodes a JSON response body.
+
+        Large bodies are streamed with ijson when only some subtrees are needed, so the
+        rest of the document is never turned into Python objects.
+
+        Args:
+            content: The raw response body.
+            subtrees: Dotted paths of the parts the caller reads, e.g. `data.stream`.
+                None to decode the whole document.
+
+        Returns:
+            The decoded document, with only the subtrees (at their usual place) if given.
+
+        Raises:
+            One of DECODE_ERRORS: If the body is not valid JSON.
+        """
+        if not subtrees or ijson is None or len(content) < SUBTREE_DECODE_MIN_BYTES:
+            return from_json(content)
+
+        data = {}
+        for path in subtrees:
+            *parents, name = path.split(".")
+            parent = data
+            for parent_name in parents:
+                parent = parent.setdefault(parent_name, {})
+            parent[name] = next(ijson.items(content, path, use_float=True), None)
+        return data
+
+    def _decode_cache(self, content: bytes | None, subtrees: tuple) -> dict | None:
+        """
+        Decodes a cached response body, a corrupt cache file counts as a miss.
+        """
+        if not content:
+            return None
+        try:
+            return self._decode(content, subtrees)
+        except DECODE_ERRORS as e:
+            logger.error(f"Error decoding cached response: {e}")
+            return None
+
+    def _load_cache(self, url: str) -> bytes | None:
+        """
+        Loads the raw cached response from a file, if it exists.
 
         Args:
             url: The URL corresponding to the data to load.
 
         Returns:
-            The cached data as a dictionary, or None if not found or an error occurs.
+            The cached response body, or None if not found or an error occurs.
         """
         cache_file = self._get_cache_filename(url)
         if os.path.exists(cache_file):
             try:
-                with open(cache_file, "r") as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, OSError) as e:
+                with open(cache_file, "rb") as f:
+                    return f.read()
+            except OSError as e:
                 logger.error(f"Error loading cache from {cache_file}: {e}")
                 return None
         return None
 
-    def _save_cache(self, url: str, data: dict) -> None:
+    def _save_cache(self, url: str, content: bytes) -> None:
         """
-        Saves data to a cache file.
+        Saves a response body to a cache file as received, it is not re-encoded.
 
         Args:
             url: The URL corresponding to the data being saved.
-            data: The data to save (must be JSON serializable).
+            content: The raw response body.
         """
         cache_file = self._get_cache_filename(url)
         try:
-            with open(cache_file, "w") as f:
-                json.dump(data, f)
-        except (TypeError, OSError) as e:
+            with open(cache_file, "wb") as f:
+                f.write(content)
+        except OSError as e:
             logger.error(f"Error saving cache to {cache_file}: {e}")
 
-    def _request(self, url: str, method: str, payload: dict = None) -> dict:
+    def _request(
+        self,
+        url: str,
+        method: str,
+        payload: dict = None,
+        use_cache: bool = True,
+        subtrees: tuple = None,
+    ) -> dict:
+        """
+        Makes an HTTP request, at most once at a time per URL and payload.
+
+        Decoded responses are memoised for the run, so the same response is never fetched or
+        decoded twice. A request identical to one already in flight waits for it and gets the
+        same result instead of going to the network. Responses are shared, callers must not
+        modify them.
+
+        Args:
+            url: The URL to request.
+            method: The HTTP method ("GET" or "POST").
+            payload: Optional payload for POST requests.
+            use_cache: Whether to serve the response from the memo or the cache. A fresh response is cached
+                either way.
+            subtrees: Dotted paths of the only parts of the response the caller reads.
+
+        Returns:
+            The JSON response from the server, or an empty dictionary on failure.
+        """
+        cache_key = self._cache_key(url, payload)
+        memo_key = (cache_key, subtrees)
+        flight_key = (cache_key, subtrees, use_cache)
+
+        with self._lock:
+            if use_cache and memo_key in self._memo:
+                self._memo.move_to_end(memo_key)
+                data = self._memo[memo_key]
+            else:
+                data = None
+                future = self._in_flight.get(flight_key)
+                is_leader = future is None
+                if is_leader:
+                    future = self._in_flight[flight_key] = Future()
+
+        if data is not None:
+            metrics.increment(
+                "stockbit_cache_requests_total",
+                endpoint=self._endpoint(url),
+                result="memo",
+            )
+            return data
+
+        if not is_leader:
+            metrics.increment(
+                "stockbit_coalesced_requests_total", endpoint=self._endpoint(url)
+            )
+            return future.result()
+
+        try:
+            data = self._fetch(url, method, payload, use_cache, cache_key, subtrees)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(data)
+            if data:
+                self._remember(memo_key, data)
+            return data
+        finally:
+            with self._lock:
+                del self._in_flight[flight_key]
+
+    def _remember(self, memo_key: tuple, data: dict):
+        with self._lock:
+            self._memo[memo_key] = data
+            self._memo.move_to_end(memo_key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def _fetch(
+        self,
+        url: str,
+        method: str,
+        payload: dict,
+        use_cache: bool,
+        cache_key: str,
+        subtrees: tuple = None,
+    ) -> dict:
         """
         Makes an HTTP request with the specified method and payload, retrying on failure,
         and uses file-based caching.
@@ -96,34 +291,70 @@ class StockbitApiClient:
             url: The URL to request.
             method: The HTTP method ("GET" or "POST").
             payload: Optional payload for POST requests.
+            use_cache: Whether to serve the response from the cache. A fresh response is cached either way.
+            cache_key: Key of the request in the cache.
+            subtrees: Dotted paths of the only parts of the response to decode.
 
         Returns:
             The JSON response from the server, or an empty dictionary on failure.
         """
+        endpoint = self._endpoint(url)
+        rejected_token = None
         retry = 0
         while retry <= 3:
             try:
-                cached_data = self._load_cache(url)
+                cached_content = self._load_cache(cache_key) if use_cache else None
+                cached_data = self._decode_cache(cached_content, subtrees)
                 if cached_data:
-                    logger.debug(f"Loaded data from cache for {url}")
+                    if DEBUG_ENABLED:
+                        logger.debug(f"Loaded data from cache for {url}")
+                    metrics.increment(
+                        "stockbit_cache_requests_total", endpoint=endpoint, result="hit"
+                    )
                     return cached_data
 
-                if method == "GET":
-                    response = requests.get(url, headers=self.headers)
-                elif method == "POST":
-                    response = requests.post(url, headers=self.headers, json=payload)
-                else:
-                    raise ValueError("Unsupported HTTP method")
+                metrics.increment(
+                    "stockbit_cache_requests_total",
+                    endpoint=endpoint,
+                    result="miss" if use_cache else "bypass",
+                )
 
-                logger.debug(url)
-                logger.debug(response.status_code)
-                # avoid logging the entire response.json(), which can be very large
-                if response.content:
-                    logger.debug(f"Response snippet: {str(response.content[:64])}")
+                token = self.token_store.access_token(
+                    self._authenticate_stockbit, rejected=rejected_token
+                )
+                # Built per request, the client is shared by concurrent stages
+                headers = dict(self.headers)
+                if token:
+                    headers["Authorization"] = f"Bearer {token}"
+
+                with metrics.timer(
+                    "stockbit_request_seconds", endpoint=endpoint, method=method
+                ):
+                    if method == "GET":
+                        response = requests.get(url, headers=headers)
+                    elif method == "POST":
+                        response = requests.post(url, headers=headers, json=payload)
+                    else:
+                        raise ValueError("Unsupported HTTP method")
+
+                metrics.increment(
+                    "stockbit_responses_total",
+                    endpoint=endpoint,
+                    status=response.status_code,
+                )
+
+                if DEBUG_ENABLED:
+                    logger.debug(url)
+                    logger.debug(response.status_code)
+                    # avoid logging the entire response.json(), which can be very large
+                    if response.content:
+                        logger.debug(f"Response snippet: {str(response.content[:64])}")
 
                 if response.status_code == 200:
-                    data = response.json()
-                    self._save_cache(url, data)  # Cache the successful response
+                    with metrics.timer("stockbit_decode_seconds", endpoint=endpoint):
+                        data = self._decode(response.content, subtrees)
+                    # Cache the successful response, as received
+                    self._save_cache(cache_key, response.content)
                     return data
                 else:
                     logger.error(
@@ -132,13 +363,26 @@ class StockbitApiClient:
                         f"retry: {retry}"
                     )
                     if response.status_code == 401:
-                        self._authenticate_stockbit()
+                        # The next attempt re-authenticates, unless another request
+                        # already replaced the rejected token
+                        rejected_token = token
                         retry += 1
+                        metrics.increment("stockbit_retries_total", endpoint=endpoint)
                     else:
                         break  # Don't retry for other errors
 
+            except DECODE_ERRORS as e:
+                logger.error(f"Invalid JSON in the response of {url}: {e}")
+                metrics.increment(
+                    "stockbit_responses_total", endpoint=endpoint, status="invalid"
+                )
+                break
+
             except requests.exceptions.RequestException as e:
                 logger.error(f"Request failed: {e} retry: {retry}")
+                metrics.increment(
+                    "stockbit_responses_total", endpoint=endpoint, status="error"
+                )
                 break  # Don't retry on connection errors
 
             time.sleep(0.2)  # Consider increasing this backoff
@@ -146,180 +390,130 @@ class StockbitApiClient:
         logger.error(f"Failed to retrieve data after retries for {url}")
         return {}  # Return an empty dict, consistent with original behavior
 
-    def get(self, url: str):
+    def get(self, url: str, use_cache: bool = True, subtrees: tuple = None):
         """
         Performs a GET request using the stored URL and headers.
 
+        Parameters:
+        - use_cache (bool): Whether a cached response may be returned.
+        - subtrees (tuple of str): Dotted paths of the only parts of the response to decode,
+          e.g. `("data.stream",)`. The whole response is decoded if None.
+
         Returns:
         - dict: The JSON response from the server, or an empty dictionary on failure.
         """
-        return self._request(url, "GET")
+        return self._request(url, "GET", use_cache=use_cache, subtrees=subtrees)
 
-    def post(self, url: str, payload: dict):
+    def post(
+        self, url: str, payload: dict, use_cache: bool = True, subtrees: tuple = None
+    ):
         """
         Performs a POST request using the stored URL, headers, and provided payload.
 
         Parameters:
         - payload (dict): The payload for the POST request.
+        - use_cache (bool): Whether a cached response may be returned.
+        - subtrees (tuple of str): Dotted paths of the only parts of the response to decode.
 
         Returns:
         - dict: The JSON response from the server, or an empty dictionary on failure.
         """
-        return self._request(url, "POST", payload)
+        return self._request(
+            url, "POST", payload, use_cache=use_cache, subtrees=subtrees
+        )
 
-    def _authenticate_stockbit(self):
+    def _authenticate_stockbit(self, tokens: dict) -> dict | None:
         """
-        Authenticates with the Stockbit API and updates the authorization header.
-        Get refresh token if the token is expired
-        Login if needed
+        Gets new tokens, called by the token store while it holds the lock.
+        Uses the refresh token while it is valid, logs in otherwise or when the refresh fails.
+
+        Args:
+            tokens: The stored tokens, possibly empty.
+
+        Returns:
+            The new tokens, or None if authentication failed.
         """
+        refresh_token = tokens.get("refresh_token")
+        if refresh_token:
+            expires_at = token_expiry(refresh_token)
+            if expires_at is None or expires_at > time.time():
+                new_tokens = self._refresh_token(refresh_token)
+                if new_tokens:
+                    return new_tokens
 
-        if self.is_authorise and not self._is_refresh_token_empty():
-            self._refresh_token()
-        else:
-            self._login()
+        return self._login()
 
-    def _login(self):
+    def _login(self) -> dict | None:
         """
         Login to Stockbit API.
+
+        Returns:
+            The access and refresh token, or None if the login failed.
         """
-        url = "https://api.stockbit.com/v2.5/login"
+        url = f"{self.login_url}/v2.5/login"
 
         params = {
             "user": os.getenv("STOCKBIT_USERNAME"),
             "password": os.getenv("STOCKBIT_PASSWORD"),
         }
 
-        self.headers["Authorization"] = None
-
         try:
             response = requests.post(url, headers=self.headers, params=params)
+            metrics.increment("stockbit_authentications_total", kind="login")
 
             if response.status_code == 200:
                 logger.info("Logged in successfully with username and password!")
 
-                token = response.json()["data"]["access_token"]
-                refresh_token = response.json()["data"]["refresh_token"]
-
-                self.headers["Authorization"] = f"Bearer {token}"
-
-                self._write_token(token, refresh_token)
+                data = response.json()["data"]
+                return {
+                    "access_token": data["access_token"],
+                    "refresh_token": data["refresh_token"],
+                }
 
-                self.is_authorise = True
-            else:
-                logger.error(
-                    f"Error: Received status code {response.status_code} - {response.text}"
-                )
-                self.is_authorise = False
-
-            time.sleep(1)
+            logger.error(
+                f"Error: Received status code {response.status_code} - {response.text}"
+            )
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Request failed: {e}")
         except KeyError as e:
             logger.error(f"Key error: {e}")
 
-    def _refresh_token(self):
+        return None
+
+    def _refresh_token(self, refresh_token: str) -> dict | None:
         """
         Refreshes new token using refresh token.
-        """
-        url = "https://exodus.stockbit.com/login/refresh"
-
-        with open(self.refresh_token_temp_file_path, "r") as file:
-            self.headers["Authorization"] = f"Bearer {file.read()}"
-
-            try:
-                response = requests.post(url, headers=self.headers)
-
-                if response.status_code == 200:
-                    logger.info("Token is successfully refreshed!")
-
-                    token = response.json()["data"]["access"]["token"]
-                    refresh_token = response.json()["data"]["refresh"]["token"]
-
-                    self.headers["Authorization"] = f"Bearer {token}"
 
-                    self._write_token(token, refresh_token)
-
-                    self.is_authorise = True
-                else:
-                    logger.error(
-                        f"Error: Received status code {response.status_code} - {response.text}"
-                    )
-                    self._login()
-
-                time.sleep(1)
-
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Request failed: {e}")
+        Args:
+            refresh_token: The stored refresh token.
 
-    def _write_token(self, token, refresh_token):
-        """
-        Write tokens to temporary file.
-        :param token:
-        :param refresh_token:
-        :return:
+        Returns:
+            The new access and refresh token, or None if the refresh failed.
         """
-        with open(self.token_temp_file_path, "w") as file:
-            file.write(token)
+        url = f"{self.base_url}/login/refresh"
+        headers = {**self.headers, "Authorization": f"Bearer {refresh_token}"}
 
-        with open(self.refresh_token_temp_file_path, "w") as file:
-            file.write(refresh_token)
-
-    def _initialize_token_file(self):
-        """
-        Intialize token files
-        :return:
-        """
         try:
-            with open(self.refresh_token_temp_file_path, "r") as file:
-                file.read()
-        except FileNotFoundError:
-            with open(self.refresh_token_temp_file_path, "w") as file:
-                file.write("")
+            response = requests.post(url, headers=headers)
+            metrics.increment("stockbit_authentications_total", kind="refresh")
 
-        try:
-            with open(self.token_temp_file_path, "r") as file:
-                token = file.read()
-                logger.debug(f"Token: {token}")
-                if token != "":
-                    self.headers["Authorization"] = f"Bearer {token}"
-
-                self._request_challenge()
-        except FileNotFoundError:
-            with open(self.token_temp_file_path, "w") as file:
-                file.write("")
-
-    def _is_refresh_token_empty(self) -> bool:
-        """
-        Check if token is empty.
-        :return: boolean
-        """
-        try:
-            with open(os.path.join(self.refresh_token_temp_file_path), "r") as file:
-                token = file.read()
-                return token == ""
-        except FileNotFoundError:
-            return False
+            if response.status_code == 200:
+                logger.info("Token is successfully refreshed!")
 
-    def _request_challenge(self):
-        """
-        Check expired token by request to light API
-        :return:
-        """
-        try:
-            response = requests.get(
-                "https://exodus.stockbit.com/research/indicator/new",
-                headers=self.headers,
-            )
+                data = response.json()["data"]
+                return {
+                    "access_token": data["access"]["token"],
+                    "refresh_token": data["refresh"]["token"],
+                }
 
-            if response.status_code != 200:
-                logger.error(
-                    f"Error: Received status code {response.status_code} - {response.text}"
-                )
-                self._authenticate_stockbit()
-            else:
-                logger.info("Logged in successfully with existing token!")
+            logger.error(
+                f"Error: Received status code {response.status_code} - {response.text}"
+            )
 
         except requests.exceptions.RequestException as e:
             logger.error(f"Request failed: {e}")
+        except KeyError as e:
+            logger.error(f"Key error: {e}")
+
+        return None
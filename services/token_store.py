@@ -0,0 +1,151 @@
+import base64
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+try:
+    import fcntl
+except ImportError:  # Windows, only threads of one process are coordinated
+    fcntl = None
+
+from utils.logger_config import logger
+
+# Path to the lock serialising the threads of this process, flock only covers processes
+# reliably when every thread uses its own file descriptor
+_THREAD_LOCKS = {}
+_THREAD_LOCKS_LOCK = threading.Lock()
+
+
+def token_expiry(token: str) -> float | None:
+    """
+    Reads the expiry of a JWT from its `exp` claim, without verifying the signature.
+
+    Args:
+        token (str): The access or refresh token.
+
+    Returns:
+        float | None: Expiry as a Unix timestamp, None if the token is not a JWT or has no `exp`.
+    """
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenStore:
+    """
+    Stockbit tokens shared by every client, thread and process on the machine.
+
+    Tokens live in one JSON file guarded by a file lock. A token is refreshed before it
+    expires, and re-authentication is single-flight: whoever takes the lock first logs
+    in or refreshes, the others wait on the lock and then pick up the new token instead
+    of authenticating again.
+    """
+
+    def __init__(self, path: str = None, refresh_margin: float = None):
+        """
+        Initializes the store, nothing is read or requested until a token is needed.
+
+        Args:
+            path (str): Token file, `stockbit_tokens.json` in the temp directory by default.
+            refresh_margin (float): Seconds before expiry a token is refreshed,
+                `STOCKBIT_TOKEN_REFRESH_MARGIN` or 300 by default.
+        """
+        self.path = path or os.path.join(tempfile.gettempdir(), "stockbit_tokens.json")
+        self.refresh_margin = (
+            refresh_margin
+            if refresh_margin is not None
+            else float(os.getenv("STOCKBIT_TOKEN_REFRESH_MARGIN", "300"))
+        )
+        with _THREAD_LOCKS_LOCK:
+            self._thread_lock = _THREAD_LOCKS.setdefault(self.path, threading.Lock())
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+
+            with open(f"{self.path}.lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read(self) -> dict:
+        """
+        Returns the stored tokens, an empty dict when there are none.
+        """
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Error loading tokens from {self.path}: {e}")
+            return {}
+
+    def _write(self, tokens: dict):
+        tmp_path = f"{self.path}.tmp"
+        # The file holds credentials, keep it private to the user
+        descriptor = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(tokens, file)
+        os.replace(tmp_path, self.path)
+
+    def is_fresh(self, tokens: dict) -> bool:
+        """
+        Whether the access token exists and does not expire within the refresh margin.
+        Tokens without an `exp` claim are trusted until the API rejects them.
+        """
+        access_token = tokens.get("access_token")
+        if not access_token:
+            return False
+
+        expires_at = token_expiry(access_token)
+        return expires_at is None or expires_at - time.time() > self.refresh_margin
+
+    def access_token(
+        self, authenticate: Callable[[dict], dict | None], rejected: str = None
+    ) -> str | None:
+        """
+        Returns a valid access token, authenticating at most once across all waiters.
+
+        Args:
+            authenticate (Callable): Receives the stored tokens and returns new ones
+                (`access_token`, `refresh_token`), or None when authentication failed.
+            rejected (str): Access token the API just answered 401 to. It is replaced
+                even if it looks fresh, unless another caller already replaced it.
+
+        Returns:
+            str | None: The access token, None when authentication failed.
+        """
+        tokens = self.read()
+        if tokens.get("access_token") != rejected and self.is_fresh(tokens):
+            return tokens["access_token"]
+
+        with self._locked():
+            # Whoever held the lock before may have authenticated already
+            tokens = self.read()
+            if tokens.get("access_token") != rejected and self.is_fresh(tokens):
+                return tokens["access_token"]
+
+            new_tokens = authenticate(tokens)
+            if not new_tokens or not new_tokens.get("access_token"):
+                return None
+
+            self._write(new_tokens)
+            return new_tokens["access_token"]
+
+    def clear(self):
+        with self._locked():
+            if os.path.exists(self.path):
+                os.remove(self.path)
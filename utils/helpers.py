@@ -1,6 +1,7 @@
 import os
+import re
 
-from utils.logger_config import logger
+from utils.logger_config import DEBUG_ENABLED, logger
 
 
 def parse_currency_to_float(currency: str) -> float:
@@ -65,7 +66,8 @@ def parse_key_statistic_results_item_value(
     try:
         value = result_item[key_index]["fitem"]["value"]
         name = result_item[key_index]["fitem"]["name"]
-        logger.debug({name: value})
+        if DEBUG_ENABLED:
+            logger.debug({name: value})
     except IndexError:
         logger.warning(f"IndexError: {result_item}")
         return 0.0
@@ -116,30 +118,49 @@ def get_column_letter(n):
     return string
 
 
-def get_sheet_range(num_columns, num_rows):
+def get_sheet_range(num_columns, num_rows, start_row=1):
     """
     Generates the range of cells in a spreadsheet given the number of columns and rows.
 
     Args:
         num_columns (int): The number of columns in the sheet.
         num_rows (int): The number of rows in the sheet.
+        start_row (int): The 1-based row the range starts at.
 
     Returns:
-        str: The range of cells in the format 'A1:<end_column_letter><num_rows>'.
+        str: The range of cells in the format 'A<start_row>:<end_column_letter><end_row>'.
 
     Example:
         get_sheet_range(3, 5) -> 'A1:C5'
         get_sheet_range(27, 10) -> 'A1:AA10'
+        get_sheet_range(3, 5, start_row=11) -> 'A11:C15'
 
     Raises:
         ValueError: If the number of columns or rows is not a positive integer.
     """
-    start_cell = "A1"
+    start_cell = f"A{start_row}"
     end_column_letter = get_column_letter(num_columns)
-    end_cell = f"{end_column_letter}{num_rows}"
+    end_cell = f"{end_column_letter}{start_row + num_rows - 1}"
     return f"{start_cell}:{end_cell}"
 
 
+def to_snake_case(name: str) -> str:
+    """
+    Converts a sheet header to a snake_case column name.
+
+    Args:
+        name (str): The header, e.g. 'Current PE Ratio (TTM)'.
+
+    Returns:
+        str: The column name, e.g. 'current_pe_ratio_ttm'.
+
+    Example:
+        to_snake_case('Debt/Equity (Quarter)') -> 'debt_equity_quarter'
+        to_snake_case('52 Week High') -> '52_week_high'
+    """
+    return re.sub(r"[^0-9a-z]+", "_", name.lower()).strip("_")
+
+
 def get_project_root():
     # Get the current file's directory
     current_dir = os.path.dirname(os.path.abspath(__file__))
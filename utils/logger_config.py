@@ -1,19 +1,52 @@
 import logging
+import os
+import sys
 
+from dotenv import load_dotenv
 from loguru import logger
 
+# The settings below are read on import, which comes before the entry points load .env
+load_dotenv()
+
+# Level of every sink, DEBUG writes the per-field and per-request lines of the hot loops
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Also write one JSON record per line to logs/app.json, for log shippers
+LOG_JSON = os.getenv("LOG_JSON", "false").lower() in ("1", "true", "yes")
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+
+# Sinks are enqueued: messages are formatted and written by a background thread, so
+# callers never wait on file I/O, rotation or compression
+logger.remove()
+logger.add(sys.stderr, level=LOG_LEVEL, enqueue=True)
+
 # Configure the logger to write to a log file
 logger.add(
-    "logs/app.log",
+    os.path.join(LOG_DIR, "app.log"),
     format="{time} {level} {message}",
-    level="DEBUG",
-    rotation="1 MB",  # Rotate after the log file reaches 1 MB
+    level=LOG_LEVEL,
+    rotation="100 MB",  # Rotate after the log file reaches 100 MB
     retention="10 days",  # Keep rotated files for 10 days
     compression="zip",  # Compress rotated files
+    enqueue=True,
 )
 
+if LOG_JSON:
+    logger.add(
+        os.path.join(LOG_DIR, "app.json"),
+        level=LOG_LEVEL,
+        serialize=True,
+        rotation="100 MB",
+        retention="10 days",
+        compression="zip",
+        enqueue=True,
+    )
+
+# Hot loops check this before building a debug message, which is cheaper than the
+# level check loguru does on every call
+DEBUG_ENABLED = logger.level(LOG_LEVEL).no <= logger.level("DEBUG").no
+
 # Export the logger for use in other modules
-__all__ = ["logger"]
+__all__ = ["logger", "DEBUG_ENABLED", "LOG_LEVEL"]
 
 
 # Function to redirect standard logging to Loguru
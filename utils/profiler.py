@@ -0,0 +1,205 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+from datetime import datetime
+
+from utils.helpers import get_project_root
+from utils.logger_config import logger
+
+# Leaf frames of threads that are parked, e.g. idle executor workers or the main
+# thread waiting for stages; their samples say nothing about where time goes
+IDLE_FILES = (
+    os.path.join("concurrent", "futures", "_base.py"),
+    os.path.join("concurrent", "futures", "thread.py"),
+    "threading.py",
+    "queue.py",
+)
+
+# The running profiler, stage tags are only recorded while there is one
+_active = None
+_no_stage = nullcontext()
+
+
+class _StageTag:
+    __slots__ = ("profiler", "name")
+
+    def __init__(self, profiler: "SamplingProfiler", name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.stages.setdefault(threading.get_ident(), []).append(self.name)
+
+    def __exit__(self, *exc_info):
+        self.profiler.stages[threading.get_ident()].pop()
+
+
+def profile_stage(name: str):
+    """
+    Tags the samples of the current thread with a stage while in the block, tags nest.
+
+    Costs a single check when no profiler is running.
+
+    Args:
+        name (str): Stage name, e.g. `fundamental` or `parse`.
+
+    Returns:
+        A context manager.
+    """
+    if _active is None:
+        return _no_stage
+    return _StageTag(_active, name)
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks of every thread at a fixed interval, from a background thread.
+
+    The run is not instrumented, so the overhead is the sampling itself and stays the same
+    however many calls the code makes. On `stop` it writes the samples in the collapsed
+    stack format read by flamegraph.pl and speedscope, with the stage tags as root frames,
+    and a report of the time per stage and the top functions.
+    """
+
+    def __init__(
+        self, output_dir: str = "profiles", interval: float = 0.005, top: int = 30
+    ):
+        """
+        Initializes the profiler.
+
+        Args:
+            output_dir (str): Directory the profile files are written to.
+            interval (float): Seconds between two samples.
+            top (int): Number of functions listed in the report.
+        """
+        self.output_dir = output_dir
+        self.interval = interval
+        self.top = top
+        self.stages = {}
+        self.samples = Counter()
+        self.started_at = None
+        self.seconds = 0.0
+        self._labels = {}
+        self._root = get_project_root()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self) -> "SamplingProfiler":
+        global _active
+        if _active is not None:
+            raise RuntimeError("A profiler is already running")
+
+        _active = self
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._sample_loop, name="profiler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> tuple[str, str]:
+        """
+        Stops sampling and writes the profile.
+
+        Returns:
+            tuple of str: Paths of the collapsed stacks and of the report.
+        """
+        global _active
+        self._stopped.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self.started_at
+        _active = None
+        return self.write()
+
+    def _sample_loop(self):
+        own_ident = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or self._is_idle(frame):
+                    continue
+
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                codes.reverse()
+
+                stages = tuple(self.stages.get(ident) or ())
+                self.samples[(stages, tuple(codes))] += 1
+
+    @staticmethod
+    def _is_idle(frame) -> bool:
+        return frame.f_code.co_filename.endswith(IDLE_FILES)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            if filename.startswith(self._root):
+                filename = os.path.relpath(filename, self._root)
+            else:
+                filename = os.path.join(*filename.split(os.sep)[-2:])
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+            # Semicolons separate the frames of a collapsed stack
+            label = self._labels[code] = label.replace(";", ":")
+        return label
+
+    def collapsed_stacks(self) -> [str]:
+        """
+        Returns one `frame;frame;... count` line per distinct stack, root first.
+        """
+        lines = []
+        for (stages, codes), count in self.samples.most_common():
+            frames = [f"stage:{name}" for name in stages or ("none",)]
+            frames.extend(self._label(code) for code in codes)
+            lines.append(f"{';'.join(frames)} {count}")
+        return lines
+
+    def report(self) -> str:
+        """
+        Returns the time per stage and the functions with the most samples.
+        """
+        total = sum(self.samples.values()) or 1
+        per_stage = Counter()
+        own = Counter()
+        cumulative = Counter()
+        for (stages, codes), count in self.samples.items():
+            per_stage["/".join(stages) or "none"] += count
+            if codes:
+                own[codes[-1]] += count
+            for code in set(codes):
+                cumulative[code] += count
+
+        lines = [
+            f"{total} samples over {self.seconds:.1f}s, one every "
+            f"{self.interval * 1000:.0f} ms, idle threads excluded",
+            "",
+            f"{'stage':<32} {'samples':>8} {'share':>7}",
+        ]
+        for name, count in per_stage.most_common():
+            lines.append(f"{name:<32} {count:>8} {count / total:>7.1%}")
+
+        lines.extend(["", f"{'own':>7} {'total':>7}  function"])
+        for code, count in own.most_common(self.top):
+            lines.append(
+                f"{count / total:>7.1%} {cumulative[code] / total:>7.1%}  "
+                f"{self._label(code)}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> tuple[str, str]:
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        collapsed_path = os.path.join(self.output_dir, f"{name}.collapsed")
+        report_path = os.path.join(self.output_dir, f"{name}.txt")
+
+        with open(collapsed_path, "w") as file:
+            file.write("\n".join(self.collapsed_stacks()) + "\n")
+        with open(report_path, "w") as file:
+            file.write(self.report())
+
+        logger.info(f"Profile written to {collapsed_path} and {report_path}")
+        return collapsed_path, report_path
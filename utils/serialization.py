@@ -0,0 +1,101 @@
+from datetime import date, datetime
+
+import msgpack
+import orjson
+
+from schemas import BaseDataClass
+
+# msgpack extension codes, datetimes keep their exact value and naivety
+_EXT_DATETIME = 1
+_EXT_DATE = 2
+
+# Schemas go through `_default` instead of orjson's own dataclass support, which
+# would follow back references such as Fundamental.stock
+_JSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATACLASS
+    | orjson.OPT_SERIALIZE_NUMPY
+    | orjson.OPT_NON_STR_KEYS
+)
+
+
+def _json_default(obj):
+    if isinstance(obj, BaseDataClass):
+        return obj.to_dict()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, BaseDataClass):
+        return obj.to_dict()
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(_EXT_DATETIME, obj.isoformat().encode())
+    if isinstance(obj, date):
+        return msgpack.ExtType(_EXT_DATE, obj.isoformat().encode())
+    if hasattr(obj, "item"):
+        # numpy scalars
+        return obj.item()
+    raise TypeError(f"Type is not msgpack serializable: {type(obj).__name__}")
+
+
+def _msgpack_ext_hook(code: int, data: bytes):
+    if code == _EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == _EXT_DATE:
+        return date.fromisoformat(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+def to_json(obj) -> bytes:
+    """
+    Encodes schemas, lists and dicts of them to JSON bytes with orjson.
+
+    Args:
+        obj: The object to encode. Schemas are encoded field by field through their
+            shallow `to_dict`, datetimes as ISO 8601 strings.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON document.
+    """
+    return orjson.dumps(obj, default=_json_default, option=_JSON_OPTIONS)
+
+
+def from_json(data: bytes | str):
+    """
+    Decodes a JSON document to plain Python objects.
+
+    Args:
+        data (bytes | str): The JSON document.
+
+    Returns:
+        The decoded object.
+    """
+    return orjson.loads(data)
+
+
+def to_msgpack(obj) -> bytes:
+    """
+    Encodes schemas, lists and dicts of them to msgpack bytes.
+
+    Args:
+        obj: The object to encode. Schemas become maps of their fields, datetimes and
+            dates are kept as extension types so they decode to the same value.
+
+    Returns:
+        bytes: The msgpack payload.
+    """
+    return msgpack.packb(obj, default=_msgpack_default, use_bin_type=True)
+
+
+def from_msgpack(data: bytes):
+    """
+    Decodes a msgpack payload written by `to_msgpack` to plain Python objects.
+
+    Args:
+        data (bytes): The msgpack payload.
+
+    Returns:
+        The decoded object, schemas as dicts.
+    """
+    return msgpack.unpackb(
+        data, ext_hook=_msgpack_ext_hook, raw=False, strict_map_key=False
+    )